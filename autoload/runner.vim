@@ -50,24 +50,89 @@ function! s:reset_virtualenv(old_path)
     let $PATH = a:old_path
 endfunction
 
+" Resolved virtualenv paths indexed by the folder of the edited file. An entry
+" holds the project configuration files found from that folder and is only
+" used while their modification times, and the ones of the folder and of the
+" project root, are unchanged. A configuration file created closer to the
+" edited file changes one of these folders.
+let s:virtualenv_cache = {}
+
 function! s:get_virtual_env_path()
+    let l:folder = expand("%:p:h")
+    let l:cached = get(s:virtualenv_cache, l:folder, {})
+    if empty(l:cached) || s:get_virtualenv_stamps(l:cached) != l:cached.stamps
+        let l:cached = s:find_virtualenv_config(l:folder)
+        let l:cached.stamps = s:get_virtualenv_stamps(l:cached)
+        let l:cached.path = s:resolve_virtual_env_path(
+                    \ l:cached.venv_config, l:cached.git_dir)
+        let s:virtualenv_cache[l:folder] = l:cached
+    endif
+    if empty(l:cached.path)
+        throw "No virtualenv configuration found"
+    endif
+    return l:cached.path
+endfunction
+
+" Search the configuration files of the project upward from `folder`.
+function! s:find_virtualenv_config(folder)
+    let l:venv_config = s:get_absolute_path(findfile(".venv", "./;"))
+    let l:git_dir = finddir(".git", "./;")
+    if empty(l:git_dir)
+        " Worktrees and submodules have a `.git` file instead.
+        let l:git_dir = findfile(".git", "./;")
+    endif
+    let l:git_dir = s:get_absolute_path(l:git_dir)
+    if !empty(l:git_dir)
+        let l:root = fnamemodify(l:git_dir, ":h")
+    elseif !empty(l:venv_config)
+        let l:root = fnamemodify(l:venv_config, ":h")
+    else
+        let l:root = a:folder
+    endif
+    return {
+                \ "folder": a:folder,
+                \ "root": l:root,
+                \ "venv_config": l:venv_config,
+                \ "git_dir": l:git_dir,
+                \ "git_config": isdirectory(l:git_dir) ? l:git_dir."/config" : l:git_dir,
+                \ }
+endfunction
+
+" Found files are cached: make their path independent of the working
+" directory.
+function! s:get_absolute_path(path)
+    if empty(a:path)
+        return ""
+    endif
+    return substitute(fnamemodify(a:path, ":p"), '[\/]$', "", "")
+endfunction
+
+function! s:get_virtualenv_stamps(config)
+    return map(
+                \ [a:config.venv_config, a:config.git_config,
+                \ expand("~/.gitconfig"), a:config.folder, a:config.root],
+                \ 'getftime(v:val)')
+endfunction
+
+" Returns an empty string if no virtualenv is configured.
+function! s:resolve_virtual_env_path(venv_config, git_dir)
     try
-        return s:read_virtualenv_config_from_file()
+        return s:read_virtualenv_config_from_file(a:venv_config)
     catch /^Configuration not found/
     endtry
     try
-        return s:read_virtualenv_config_from_git()
+        return s:read_virtualenv_config_from_git(a:git_dir)
     catch /^Configuration not found/
     endtry
-    throw "No virtualenv configuration found"
+    return ""
 endfunction
 
 " }}}
 
 " '.venv' config file {{{
 "
-function! s:read_virtualenv_config_from_file()
-    let venv_config = findfile(".venv", "./;")
+function! s:read_virtualenv_config_from_file(venv_config)
+    let venv_config = a:venv_config
     if !filereadable(venv_config)
         throw "Configuration not found.`.venv` file not found."
     endif
@@ -101,12 +166,16 @@ EOF
 
 " git {{{
 
-function! s:read_virtualenv_config_from_git()
+function! s:read_virtualenv_config_from_git(git_dir)
+    if empty(a:git_dir)
+        throw "Configuration not found. Not in a git repository."
+    endif
     let l:venv =  system('git config vim-python-tests-runner.venv')
     if v:shell_error
         throw "Configuration not found. Git not available or virtualenv configuration not set."
     endif
-    let l:root = s:get_git_repository_root()
+    " The repository root is the folder holding `.git`.
+    let l:root = fnamemodify(substitute(fnamemodify(a:git_dir, ":p"), '[\/]$', "", ""), ":h")
 python << EOF
 import vim
 import os
@@ -139,7 +208,8 @@ endfunction
 
 " Test finder functions {{{
 
-function! s:get_current_test()
+" Returns the id of the test at the cursor position.
+function! s:find_current_test()
 python << EOF
 import code_analyzer
 import vim
@@ -148,10 +218,14 @@ filename  = vim.current.buffer.name
 runner = vim.eval("g:python_tests_runner")
 separator = "::" if runner == 'pytest' else "."
 try:
+    # Analyze the buffer content. It is only parsed again once changed.
     test_function = code_analyzer.get_test_function_at(
         filename,
         position,
         separator,
+        # The buffer is only read on a cache miss.
+        source=lambda: "\n".join(vim.current.buffer),
+        version=vim.eval("b:changedtick"),
     )
 except:
     # No function found because there is an error in the parsed file. Let the
@@ -170,6 +244,11 @@ if test_function:
 test = test.replace("\\", "/")
 vim.command("let l:test=\"%s\"" % test)
 EOF
+    return l:test
+endfunction
+
+function! s:get_current_test()
+    let l:test = s:find_current_test()
     echo l:test
     let g:python#tests#runner#last_test=l:test
     return l:test
@@ -189,13 +268,17 @@ import code_analyzer
 import vim
 position = vim.current.window.cursor
 filename  = vim.current.buffer.name
-runner = vim.eval("g:runners_python")
+runner = vim.eval("g:python_tests_runner")
 separator = "::" if runner == 'pytest' else "."
 try:
+    # Analyze the buffer content. It is only parsed again once changed.
     test_case = code_analyzer.get_test_case_at(
         filename,
         position,
         separator,
+        # The buffer is only read on a cache miss.
+        source=lambda: "\n".join(vim.current.buffer),
+        version=vim.eval("b:changedtick"),
     )
 except:
     # No test case found because there is an error in the parsed file. Let the
@@ -233,6 +316,155 @@ endfunction
 
 " }}}
 
+" Test basket {{{
+
+" Tests queued to be run together, by a single runner process.
+let s:basket = []
+
+function! s:get_basket()
+    if empty(s:basket)
+        throw "Empty basket"
+    endif
+    return join(map(copy(s:basket), 'fnameescape(v:val)'), " ")
+endfunction
+
+function! runner#basket_add() abort
+    let l:test = s:find_current_test()
+    if index(s:basket, l:test) < 0
+        call add(s:basket, l:test)
+    endif
+    echo "vim-runners: ".len(s:basket)." test(s) in basket."
+endfunction
+
+function! runner#basket_list() abort
+    if empty(s:basket)
+        echo "vim-runners: Basket is empty."
+        return
+    endif
+    echo join(s:basket, "\n")
+endfunction
+
+function! runner#basket_clear() abort
+    let s:basket = []
+    echo "vim-runners: Basket cleared."
+endfunction
+
+" }}}
+
+" Project indexes {{{
+
+" Number of processes parsing the project modules when they are indexed.
+" Processes are forked from Vim, which Windows does not support.
+function! s:get_scan_processes()
+    if has('win32')
+        return 1
+    endif
+    return max([1, get(g:, "python_tests_runner_scan_processes", 1)])
+endfunction
+
+" }}}
+
+" Impacted tests finder functions {{{
+
+" The test modules importing the current module, directly or transitively, are
+" found in the project import index. It is updated before being used, along
+" with the test index so stale modules are parsed once for both.
+function! s:get_impacted_tests()
+    let l:root = s:get_git_repository_root()
+    let l:processes = s:get_scan_processes()
+python << EOF
+import code_analyzer
+import json
+import vim
+root = vim.eval("l:root")
+index, _ = code_analyzer.refresh_indexes(
+    root,
+    processes=int(vim.eval("l:processes")),
+)
+tests = code_analyzer.get_impacted_tests(root, index, vim.current.buffer.name)
+# Always use Posix path (even on Windows)
+tests = [test.replace("\\", "/") for test in tests]
+vim.command("let l:tests=%s" % json.dumps(tests))
+EOF
+    if empty(l:tests)
+        throw "No impacted tests"
+    endif
+    return join(map(l:tests, 'fnameescape(v:val)'), " ")
+endfunction
+
+" Keep the project import and test indexes up to date as its modules are saved.
+" The indexes are only created by the first command using them.
+function! runner#update_indexes(file) abort
+    let l:git_dir = finddir(".git", fnamemodify(a:file, ":p:h").";")
+    if empty(l:git_dir)
+        return
+    endif
+    let l:root = fnamemodify(l:git_dir, ":p:h:h")
+python << EOF
+import code_analyzer
+import vim
+root = vim.eval("l:root")
+files = [vim.eval("a:file")]
+code_analyzer.refresh_indexes(root, files, create=False)
+EOF
+endfunction
+
+" }}}
+
+" Matching tests finder functions {{{
+
+" Pattern the tests to run are matched against. Set by `runner#run_matching`.
+let s:matching_pattern = ""
+
+" The project tests are found in its test index. It is updated before being
+" used, along with the import index so stale modules are parsed once for both.
+function! s:get_matching_tests()
+    let l:root = s:get_git_repository_root()
+    let l:processes = s:get_scan_processes()
+python << EOF
+import code_analyzer
+import json
+import vim
+root = vim.eval("l:root")
+runner = vim.eval("g:python_tests_runner")
+_, index = code_analyzer.refresh_indexes(
+    root,
+    processes=int(vim.eval("l:processes")),
+)
+tests = []
+for file_, name, line in code_analyzer.find_tests(
+        root,
+        index,
+        vim.eval("s:matching_pattern")):
+    if runner == 'pytest':
+        test = "::".join([file_] + name.split("."))
+    else:
+        test = ":".join([file_, name])
+    # Always use Posix path (even on Windows)
+    tests.append(test.replace("\\", "/"))
+vim.command("let l:tests=%s" % json.dumps(tests))
+EOF
+    if empty(l:tests)
+        throw "No matching tests"
+    endif
+    return join(map(l:tests, 'fnameescape(v:val)'), " ")
+endfunction
+
+" }}}
+
+" Failed tests finder functions {{{
+
+" The failed tests are recorded by the compiler script on each run.
+function! s:get_failed_tests()
+    return "--runner-failed"
+endfunction
+
+function! s:get_failed_tests_first()
+    return "--runner-failed-first"
+endfunction
+
+" }}}
+
 " Commands selection {{{
 
 function! s:make_interactive_command()
@@ -267,6 +499,202 @@ function! s:make_foreground_command()
     endif
 endfunction
 
+" Read errors from a structured report written by the runner when configured
+" to.
+function! s:make_report_option()
+    let l:report = get(g:, "python_tests_runner_report", "")
+    if empty(l:report)
+        return ""
+    endif
+    return "--runner-report=".l:report." "
+endfunction
+
+" Run tests in a child of the long-lived runner process when configured to.
+function! s:make_daemon_option()
+    if !get(g:, "python_tests_runner_daemon", 0)
+        return ""
+    endif
+    let l:option = "--runner-daemon "
+    let l:preload = get(g:, "python_tests_runner_daemon_preload", [])
+    if !empty(l:preload)
+        let l:option .= "--runner-preload=".join(l:preload, ",")." "
+    endif
+    return l:option
+endfunction
+
+" Parse the runner output from temporary files once it exits when configured
+" to.
+function! s:make_spool_option()
+    if !get(g:, "python_tests_runner_spool", 0)
+        return ""
+    endif
+    return "--runner-spool "
+endfunction
+
+" Merge the runner standard error with its standard output when configured
+" to.
+function! s:make_merge_option()
+    if !get(g:, "python_tests_runner_merge", 0)
+        return ""
+    endif
+    return "--runner-merge "
+endfunction
+
+" Forward only errors and a few lines before each when configured to.
+function! s:make_compact_option()
+    if get(g:, "python_tests_runner_compact", 0) > 0
+        return "--runner-compact=".g:python_tests_runner_compact." "
+    endif
+    return ""
+endfunction
+
+" Limit the output forwarded to the quickfix list when configured to.
+function! s:make_limit_options()
+    let l:options = ""
+    if get(g:, "python_tests_runner_max_lines", 0) > 0
+        let l:options .= "--runner-max-lines="
+                    \ .g:python_tests_runner_max_lines." "
+    endif
+    if get(g:, "python_tests_runner_max_bytes", 0) > 0
+        let l:options .= "--runner-max-bytes="
+                    \ .g:python_tests_runner_max_bytes." "
+    endif
+    return l:options
+endfunction
+
+" Run in a background job when enabled and the editor supports it.
+function! s:use_job()
+    if !get(g:, "python_tests_runner_async", 0)
+        return 0
+    endif
+    return has('nvim') || (exists('*job_start') && has('channel'))
+endfunction
+
+" Split the tests across parallel runner processes when configured to.
+function! s:make_shards_option()
+    if get(g:, "python_tests_runner_shards", 1) > 1
+        return "--runner-shards=".g:python_tests_runner_shards." "
+    endif
+    return ""
+endfunction
+
+" }}}
+
+" Background job {{{
+
+" Only one job runs at a time. Each job gets a new id so the callbacks of a
+" cancelled job cannot touch the quickfix list of the next one.
+let s:job = 0
+let s:job_id = 0
+let s:job_errorformat = ""
+" Start of the last line read from each output stream of a Neovim job, indexed
+" by stream name.
+let s:job_pending = {}
+
+function! s:is_current_job(id)
+    return a:id == s:job_id && !empty(s:job)
+endfunction
+
+function! s:add_to_quickfix(id, lines)
+    if !s:is_current_job(a:id) || empty(a:lines)
+        return
+    endif
+    call setqflist([], 'a', {'lines': a:lines, 'efm': s:job_errorformat})
+endfunction
+
+function! s:on_job_output(id, channel, message)
+    call s:add_to_quickfix(a:id, [a:message])
+endfunction
+
+function! s:on_job_close(id, channel)
+    call s:finish_job(a:id)
+endfunction
+
+" Neovim hands output chunks which may end in the middle of a line. The last
+" item of `data` is the start of the next line of the same stream.
+function! s:on_nvim_job_output(id, job, data, event)
+    if !s:is_current_job(a:id)
+        return
+    endif
+    let l:lines = copy(a:data)
+    let l:lines[0] = get(s:job_pending, a:event, "").l:lines[0]
+    let s:job_pending[a:event] = remove(l:lines, -1)
+    call s:add_to_quickfix(a:id, l:lines)
+endfunction
+
+function! s:on_nvim_job_exit(id, job, status, event)
+    if s:is_current_job(a:id)
+        for l:event in ['stdout', 'stderr']
+            if !empty(get(s:job_pending, l:event, ""))
+                call s:add_to_quickfix(a:id, [s:job_pending[l:event]])
+            endif
+        endfor
+    endif
+    call s:finish_job(a:id)
+endfunction
+
+function! s:finish_job(id)
+    if !s:is_current_job(a:id)
+        return
+    endif
+    let s:job = 0
+    let l:errors = len(filter(getqflist(), 'v:val.valid'))
+    " Do not steal the focus from the window being edited.
+    let l:window = win_getid()
+    cwindow
+    call win_gotoid(l:window)
+    echo "vim-runners: Tests done (".l:errors." error(s))."
+endfunction
+
+function! s:start_job(args)
+    call s:stop_job()
+    " Like :make, save the modified buffers first.
+    if &autowrite || &autowriteall
+        silent! wall
+    endif
+    let l:cmd = &makeprg." ".a:args
+    " The arguments are escaped for the shell: run the command through it.
+    " `exec` so stopping the job signals the runner script, not the shell.
+    if has('win32')
+        let l:job_cmd = l:cmd
+    else
+        let l:job_cmd = [&shell, &shellcmdflag, "exec ".l:cmd]
+    endif
+    let s:job_id += 1
+    let s:job_errorformat = &errorformat
+    let s:job_pending = {}
+    call setqflist([], 'r', {'title': l:cmd, 'items': []})
+    if has('nvim')
+        let s:job = jobstart(l:job_cmd, {
+                    \ 'on_stdout': function('s:on_nvim_job_output', [s:job_id]),
+                    \ 'on_stderr': function('s:on_nvim_job_output', [s:job_id]),
+                    \ 'on_exit': function('s:on_nvim_job_exit', [s:job_id]),
+                    \ })
+    else
+        let s:job = job_start(l:job_cmd, {
+                    \ 'in_io': 'null',
+                    \ 'out_cb': function('s:on_job_output', [s:job_id]),
+                    \ 'err_cb': function('s:on_job_output', [s:job_id]),
+                    \ 'close_cb': function('s:on_job_close', [s:job_id]),
+                    \ })
+    endif
+    echo "vim-runners: Running tests..."
+endfunction
+
+" Returns 1 if a running job was stopped.
+function! s:stop_job()
+    if empty(s:job)
+        return 0
+    endif
+    if has('nvim')
+        call jobstop(s:job)
+    else
+        call job_stop(s:job)
+    endif
+    let s:job = 0
+    return 1
+endfunction
+
 " }}}
 
 " Generic run method {{{
@@ -286,11 +714,29 @@ function! s:run(interactive, get_test_method) abort
                 let l:args = l:args." || read -p ".l:msg
             endif
         else
+            if a:get_test_method == "git_repository_root"
+                let l:args = s:make_shards_option().l:args
+            endif
+            let l:args = s:make_report_option().s:make_daemon_option()
+                        \ .s:make_spool_option().s:make_merge_option()
+                        \ .s:make_compact_option().s:make_limit_options()
+                        \ .l:args
+            if s:use_job()
+                " The job inherits the virtualenv $PATH when it starts.
+                call s:start_job(l:args)
+                return
+            endif
             let l:cmd = s:make_foreground_command()
         endif
         exec l:cmd.l:args
     catch /^Vim\%((\a\+)\)\=:E121/	" catch error E121
         echo "vim-runners: No previous run test history."
+    catch /^Empty basket/
+        echo "vim-runners: Basket is empty. Add tests with :RunBasketAdd."
+    catch /^No matching tests/
+        echo "vim-runners: No tests match '".s:matching_pattern."'."
+    catch /^No impacted tests/
+        echo "vim-runners: No tests import this module."
     catch /^Git not available/
         echo "vim-runners: Cannot run test command (".v:exception.")"
     finally
@@ -330,4 +776,33 @@ function! runner#run_all(bang) abort
     call s:run(a:bang, "git_repository_root")
 endfunction
 
+function! runner#run_basket(bang) abort
+    call s:run(a:bang, "basket")
+endfunction
+
+function! runner#run_matching(bang, pattern) abort
+    let s:matching_pattern = a:pattern
+    call s:run(a:bang, "matching_tests")
+endfunction
+
+function! runner#run_impacted(bang) abort
+    call s:run(a:bang, "impacted_tests")
+endfunction
+
+function! runner#run_failed() abort
+    call s:run(0, "failed_tests")
+endfunction
+
+function! runner#run_failed_first() abort
+    call s:run(0, "failed_tests_first")
+endfunction
+
+function! runner#cancel() abort
+    if s:stop_job()
+        echo "vim-runners: Tests run cancelled."
+    else
+        echo "vim-runners: No tests running."
+    endif
+endfunction
+
 " }}}
@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Long-lived test runner process. It imports the test runner once and forks a
+child per run so a run does not pay for the interpreter start and the runner
+import anymore.
+
+The daemon listens on a unix socket. A client sends one JSON line describing
+the run (`args`, `cwd` and `env`). It reads the process id of the child running
+it on a first line, then the runner output until the socket is closed.
+
+Only the runner and the modules it is asked to preload are imported before
+forking. The project modules are imported by each child so edited sources are
+always tested.
+"""
+
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import runpy
+import signal
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+
+from runners import (
+    RUNNERS,
+    get_command,
+)
+
+IDLE_TIMEOUT = 30 * 60
+"""
+Seconds without any run after which the daemon exits.
+"""
+
+START_TIMEOUT = 10
+"""
+Seconds a client waits for a daemon it started to accept runs.
+"""
+
+REQUEST_TIMEOUT = 10
+"""
+Seconds a run child waits for the client to send its run description.
+"""
+
+
+def get_private_directory():
+    """
+    Return the directory of the daemon sockets and of the last run records. It
+    is private to the user: a socket of another user could collect the
+    environment sent along with each run and a record planted by another user
+    could select the tests to run. It is in `$XDG_RUNTIME_DIR` if set,
+    otherwise in the temporary directory.
+
+    :returns: A directory path. It may not exist yet. See
+        `check_private_directory`.
+    """
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return os.path.join(runtime, "vim-python-tests-runner")
+    if not hasattr(os, "getuid"):
+        # The temporary directory of a Windows user is already private.
+        return os.path.join(tempfile.gettempdir(), "vim-python-tests-runner")
+    return os.path.join(
+        tempfile.gettempdir(),
+        "vim-python-tests-runner-{uid}".format(uid=os.getuid()),
+    )
+
+
+def check_private_directory(path):
+    """
+    Create the private directory if missing and make sure only the user can
+    access it. See `get_private_directory`.
+
+    :param path: The directory path.
+
+    :raises SystemExit: If the directory is not a directory owned by the user
+        with no access for anyone else.
+    """
+    try:
+        os.mkdir(path, 0o700)
+    except OSError:
+        pass
+    try:
+        status = os.lstat(path)
+    except OSError:
+        status = None
+    if status is None or not stat.S_ISDIR(status.st_mode) or (
+            hasattr(os, "getuid") and
+            (status.st_uid != os.getuid() or status.st_mode & 0o077)):
+        raise SystemExit(
+            "vim-runners: Directory {path} is not private to the "
+            "user.".format(path=path),
+        )
+
+
+def get_socket_path(runner):
+    """
+    Return the path of the socket the daemon of the working directory listens
+    on. There is one daemon per working directory, runner and python
+    interpreter (i.e. per virtualenv).
+
+    :param runner: Name of the runner.
+
+    :returns: A file path in the private directory. See
+        `get_private_directory`.
+    """
+    key = "\n".join([os.getcwd(), runner, sys.executable])
+    digest = hashlib.md5(key.encode("utf-8")).hexdigest()
+    return os.path.join(
+        get_private_directory(),
+        "{digest}.sock".format(digest=digest),
+    )
+
+
+def is_supported():
+    """
+    Tell if the daemon can run on this platform. It requires `fork` and unix
+    sockets.
+    """
+    return hasattr(os, "fork") and hasattr(socket, "AF_UNIX")
+
+
+def preload(runner, modules):
+    """
+    Import the runner and the specified modules in the daemon process.
+
+    :param runner: Name of the runner.
+    :param modules: List of extra module names to import.
+    """
+    __import__(RUNNERS.attribute(runner, "MODULE"))
+    for module in modules:
+        __import__(module)
+
+
+def run_child(runner, connection):
+    """
+    Read the run description sent by the client and run the runner in the
+    forked child process. Output goes to the client connection. Never
+    returns.
+
+    :param runner: Name of the runner.
+    :param connection: The client socket.
+    """
+    exit_code = 1
+    try:
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        # A client which never sends its run only holds up this child.
+        connection.settimeout(REQUEST_TIMEOUT)
+        request = json.loads(
+            connection.makefile("rb").readline().decode("utf-8"),
+        )
+        connection.settimeout(None)
+        connection.sendall("{pid}\n".format(pid=os.getpid()).encode("utf-8"))
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+        with open(os.devnull) as devnull:
+            os.dup2(devnull.fileno(), 0)
+        os.dup2(connection.fileno(), 1)
+        os.dup2(connection.fileno(), 2)
+        cmd = get_command(runner).split()
+        module = RUNNERS.attribute(runner, "MODULE")
+        # Do not let the daemon own modules shadow the project ones.
+        daemon_path = os.path.dirname(os.path.abspath(__file__))
+        sys.path[:] = [path for path in sys.path if path != daemon_path]
+        for name in list(sys.modules):
+            if name == "runners" or name.startswith("runners."):
+                del sys.modules[name]
+        sys.argv = cmd + request['args']
+        try:
+            runpy.run_module(
+                module,
+                run_name="__main__",
+                alter_sys=True,
+            )
+            exit_code = 0
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(exit_code)
+
+
+def serve(runner, path, modules):
+    """
+    Preload the runner and accept runs until idle for `IDLE_TIMEOUT` seconds.
+
+    :param runner: Name of the runner.
+    :param path: Path of the socket to listen on.
+    :param modules: List of extra module names to preload.
+    """
+    check_private_directory(os.path.dirname(path))
+    preload(runner, modules)
+    # Children are reaped automatically.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    if os.path.exists(path):
+        os.remove(path)
+    server.bind(path)
+    server.listen(8)
+    server.settimeout(IDLE_TIMEOUT)
+    try:
+        while True:
+            try:
+                connection, _ = server.accept()
+            except socket.timeout:
+                return
+            try:
+                if os.fork() == 0:
+                    server.close()
+                    run_child(runner, connection)
+            finally:
+                connection.close()
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def start(runner, path, modules):
+    """
+    Start a detached daemon.
+
+    :param runner: Name of the runner.
+    :param path: Path of the socket the daemon listens on.
+    :param modules: List of extra module names to preload.
+    """
+    cmd = [sys.executable, os.path.abspath(__file__), runner, path]
+    cmd.extend(modules)
+    with open(os.devnull, "r+") as devnull:
+        subprocess.Popen(
+            cmd,
+            stdin=devnull,
+            stdout=devnull,
+            stderr=devnull,
+            close_fds=True,
+            preexec_fn=os.setsid,
+        )
+
+
+def connect(runner, modules):
+    """
+    Connect to the daemon of the working directory. It is started first if not
+    running.
+
+    :param runner: Name of the runner.
+    :param modules: List of extra module names the daemon preloads when it has
+        to be started.
+
+    :returns: A connected socket.
+    """
+    path = get_socket_path(runner)
+    check_private_directory(os.path.dirname(path))
+    deadline = None
+    while True:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.connect(path)
+            return client
+        except socket.error:
+            client.close()
+        if deadline is None:
+            start(runner, path, modules)
+            deadline = time.time() + START_TIMEOUT
+        elif time.time() > deadline:
+            raise SystemExit("vim-runners: Runner daemon did not start.")
+        time.sleep(0.01)
+
+
+class Child(object):
+
+    """
+    Child of the daemon running tests for a client. It has the `poll` and
+    `terminate` methods of `subprocess.Popen`.
+    """
+
+    def __init__(self, pid):
+        """
+        :param pid: The process id of the child.
+        """
+        self.pid = pid
+        # Set by the client once the child closed the connection.
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self):
+        try:
+            os.kill(self.pid, signal.SIGTERM)
+        except OSError:
+            pass
+
+
+def read_child(output):
+    """
+    Read the child running tests from the daemon output. See `request`.
+
+    :param output: File object on the connection to the daemon.
+
+    :returns: A `Child` or `None` if the daemon closed the connection first.
+    """
+    line = output.readline()
+    if not line:
+        return None
+    return Child(int(line))
+
+
+def request(runner, args, modules=()):
+    """
+    Ask the daemon to run tests.
+
+    :param runner: Name of the runner.
+    :param args: List of command arguments for the test runner.
+    :param modules: List of extra module names the daemon preloads when it has
+        to be started.
+
+    :returns: The connected socket the runner output is read from, after the
+        child process id (see `read_child`).
+    """
+    client = connect(runner, modules)
+    client.sendall((json.dumps({
+        'args': args,
+        'cwd': os.getcwd(),
+        'env': dict(os.environ),
+    }) + "\n").encode("utf-8"))
+    client.shutdown(socket.SHUT_WR)
+    return client
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1], sys.argv[2], sys.argv[3:])
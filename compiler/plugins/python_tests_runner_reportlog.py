@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""
+*pytest* plugin writing test reports to a file as JSON lines while tests run.
+
+Reports are serialized by *pytest* itself (`pytest_report_to_serializable`), in
+the same format as the `pytest-reportlog` plugin, so the plugin does not need
+to be installed. The file is set with the `--python-tests-runner-report-log`
+option.
+"""
+
+import json
+
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--python-tests-runner-report-log",
+        dest="python_tests_runner_report_log",
+        default=None,
+        help="Path of the file test reports are written to as JSON lines.",
+    )
+
+
+class ReportLog(object):
+
+    """Write serialized reports to a file, one per line."""
+
+    def __init__(self, config, path):
+        self.config = config
+        self.file = open(path, "w")
+
+    def write(self, report):
+        data = self.config.hook.pytest_report_to_serializable(
+            config=self.config,
+            report=report,
+        )
+        self.file.write(json.dumps(data) + "\n")
+        # Let the report be read while tests are still running.
+        self.file.flush()
+
+    def pytest_runtest_logreport(self, report):
+        self.write(report)
+
+    def pytest_collectreport(self, report):
+        self.write(report)
+
+    def pytest_unconfigure(self, config):
+        self.file.close()
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_configure(config):
+    path = config.getoption("python_tests_runner_report_log")
+    if path and not hasattr(config, "workerinput"):
+        config.pluginmanager.register(
+            ReportLog(config, path),
+            "python_tests_runner_report_log",
+        )
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""
+*pytest* plugin restricting a session to one shard of the collected tests.
+
+The shard is read from the `PYTHON_TESTS_RUNNER_SHARD` environment variable as
+`<index>/<count>`. Collected tests are split in `count` contiguous slices so
+tests of a same module or test case stay in the same shard.
+"""
+
+import os
+
+import pytest
+
+ENVIRONMENT = "PYTHON_TESTS_RUNNER_SHARD"
+"""
+Environment variable holding the shard to run.
+"""
+
+
+def get_shard():
+    """
+    Return the shard to run.
+
+    :returns: A `(index, count)` tuple or `None` if no shard is set.
+    """
+    shard = os.environ.get(ENVIRONMENT)
+    if not shard:
+        return None
+    index, count = shard.split("/")
+    return int(index), int(count)
+
+
+def select_shard(items, index, count):
+    """
+    Split `items` in `count` contiguous slices of even size.
+
+    :param items: List of collected tests.
+    :param index: Index of the slice to select.
+    :param count: Number of slices.
+
+    :returns: A `(selected, deselected)` tuple of lists.
+    """
+    start = len(items) * index // count
+    end = len(items) * (index + 1) // count
+    return items[start:end], items[:start] + items[end:]
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_collection_modifyitems(config, items):
+    shard = get_shard()
+    if shard is None:
+        return
+    selected, deselected = select_shard(items, *shard)
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+    items[:] = selected
@@ -8,49 +8,1019 @@ understand through its pre-configured Vim 'errorformat'.
 
 from __future__ import print_function
 
+import hashlib
+import json
+import mmap
+import os
+import signal
 import subprocess
 import sys
+import tempfile
+from collections import deque
+from itertools import chain
 
+import daemon
 from runners import (
-    get_parse_function,
+    RUNNERS,
+    Failure,
+    decode,
+    get_block_start,
+    get_iter_parse_function,
     get_command,
+    get_report_arguments,
+    get_report_parser,
+    is_error_format,
 )
 
+OPTION_PREFIX = "--runner-"
+"""
+Prefix of the options handled by this script rather than by the test runner.
+"""
+
+PLUGINS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "plugins",
+)
+"""
+Folder of the plugins loaded by the test runner itself.
+"""
+
+SHARD_ENVIRONMENT = "PYTHON_TESTS_RUNNER_SHARD"
+"""
+Environment variable telling the shard plugin which shard to run.
+"""
+
+UNBUFFERED_ENVIRONMENT = {"PYTHONUNBUFFERED": "1"}
+"""
+Environment variables making a python runner write its standard output as
+soon as it prints, so it stays in order with its standard error.
+"""
+
+RAW_CHUNK_SIZE = 64 * 1024
+"""
+Maximum size of the chunks the runner output is read by when it is not
+decoded.
+"""
+
+REPORT_CHUNK_SIZE = 64 * 1024
+"""
+Size of the chunks structured reports are read by.
+"""
+
+COMPACT_CONTEXT = 3
+"""
+Default number of lines kept before each error marker in compact mode.
+"""
+
+STATE_VERSION = 2
+"""
+Version of the last run record format. A record of another version is
+ignored. Failed tests are recorded by node id since version 2.
+"""
+
+PROCESSES = []
+"""
+Runner processes started by this script. The running ones are terminated along
+with it. See `terminate`.
+"""
+
+MAX_ERROR_FORMAT_LENGTH = 1024
+"""
+Length error markers are cut to when the output is limited. An assertion
+message can be as long as the values it compares.
+"""
+
+
+def get_state_path(extension="json"):
+    """
+    Return the path of the file the last run is recorded to. There is one per
+    working directory (i.e. per project).
+
+    :param extension: Extension of the file. The last run full output is
+        written next to its record, to a `log` file.
+
+    :returns: A file path in the directory private to the user. See
+        `daemon.get_private_directory`.
+    """
+    directory = daemon.get_private_directory()
+    daemon.check_private_directory(directory)
+    digest = hashlib.md5(os.getcwd().encode("utf-8")).hexdigest()
+    return os.path.join(
+        directory,
+        "{digest}.{extension}".format(
+            digest=digest,
+            extension=extension,
+        ),
+    )
+
+
+def open_private_file(path):
+    """
+    Open a file for writing in binary mode, readable by the user only. A
+    symlink in its place is not followed.
+
+    :param path: The file path, in the private directory. See
+        `get_state_path`.
+
+    :returns: A file object.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | \
+        getattr(os, "O_NOFOLLOW", 0) | getattr(os, "O_BINARY", 0)
+    return os.fdopen(os.open(path, flags, 0o600), "wb")
+
+
+def load_state(runner):
+    """
+    Load the last run recorded for the working directory.
+
+    :param runner: Name of the runner to be used.
+
+    :returns: A dictionary where the key `args` holds the last run arguments
+        and the key `failed` the names of its failed tests. `None` if the last
+        run is unknown, used another runner or was recorded in another format.
+    """
+    try:
+        with open(get_state_path()) as f:
+            state = json.load(f)
+    except (IOError, ValueError):
+        return None
+    if state.get('runner') != runner or \
+            state.get('version') != STATE_VERSION:
+        return None
+    return state
+
+
+def save_state(runner, args, failed):
+    """
+    Record the last run for the working directory.
+
+    :param runner: Name of the runner used.
+    :param args: List of command arguments of the run.
+    :param failed: List of the names of the failed tests.
+    """
+    with open(get_state_path(), "w") as f:
+        json.dump(
+            {
+                'version': STATE_VERSION,
+                'runner': runner,
+                'args': args,
+                'failed': failed,
+            },
+            f,
+        )
+
+
+def get_plugins_environment():
+    """
+    Return a copy of the current environment where the plugins loaded by the
+    test runner itself can be imported.
+
+    :returns: A dictionary.
+    """
+    pythonpath = [PLUGINS_PATH]
+    if os.environ.get("PYTHONPATH"):
+        pythonpath.append(os.environ["PYTHONPATH"])
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(pythonpath)
+    return env
+
+
+def read_lines(stream):
+    """
+    Iterate on the lines of a binary stream as soon as they are written.
+
+    :param stream: A file object opened in binary mode.
+
+    :returns: A generator on lines stripped from their line ending.
+    """
+    for data in iter(stream.readline, b""):
+        # In python3, the byte array needs to be decoded back to a string
+        if (sys.version_info > (3, 0)):
+            data = decode(data)
+        for line in data.splitlines():
+            yield line
+
+
+def read_raw_lines(stream, size=RAW_CHUNK_SIZE):
+    """
+    Iterate on the lines of a binary stream as soon as they are written,
+    without decoding nor copying them: lines are `memoryview` slices of the
+    chunks read. Only a line spanning two chunks is copied.
+
+    :param stream: A buffered file object opened in binary mode.
+    :param size: Maximum size of the chunks read.
+
+    :returns: A generator on `memoryview` objects of lines stripped from their
+        line ending.
+    """
+    pending = b""
+    # `read1` returns what is available instead of waiting for `size` bytes.
+    for chunk in iter(lambda: stream.read1(size), b""):
+        view = memoryview(chunk)
+        start = 0
+        end = chunk.find(b"\n")
+        if end >= 0 and pending:
+            line = pending + chunk[:end]
+            yield memoryview(line[:-1] if line.endswith(b"\r") else line)
+            pending = b""
+            start = end + 1
+            end = chunk.find(b"\n", start)
+        while end >= 0:
+            stop = end
+            if stop > start and chunk[stop - 1:stop] == b"\r":
+                stop -= 1
+            yield view[start:stop]
+            start = end + 1
+            end = chunk.find(b"\n", start)
+        pending += chunk[start:]
+    if pending:
+        yield memoryview(pending)
+
+
+def read_spooled(process, spool):
+    """
+    Iterate on the lines the runner wrote to a temporary file once it exited.
+
+    :param process: The runner process.
+    :param spool: The temporary file the runner output is spooled to.
+
+    :returns: A generator on lines stripped from their line ending.
+    """
+    process.wait()
+    spool.seek(0)
+    for line in read_lines(spool):
+        yield line
+
+
+def read_mapped_lines(spool):
+    """
+    Iterate on the lines of a file through a memory map. Lines are found by
+    offset in the mapped file and only the current one is copied, so memory
+    use does not grow with the file size.
+
+    :param spool: A file object opened in binary mode.
+
+    :returns: A generator on lines stripped from their line ending.
+    """
+    spool.flush()
+    size = os.fstat(spool.fileno()).st_size
+    # An empty file cannot be mapped.
+    if not size:
+        return
+    mapped = mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        start = 0
+        while start < size:
+            end = mapped.find(b"\n", start)
+            if end < 0:
+                end = size
+            line = mapped[start:end]
+            start = end + 1
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            # In python3, the byte array needs to be decoded back to a string
+            if (sys.version_info > (3, 0)):
+                line = decode(line)
+            yield line
+    finally:
+        mapped.close()
+
+
+def spawn(cmd, stdout, stderr, env=None):
+    """
+    Start the test runner.
+
+    :param cmd: List of the command arguments.
+    :param stdout: Where the runner standard output goes. Either
+        `subprocess.PIPE` or a temporary file.
+    :param stderr: Temporary file the runner standard error is spooled to so a
+        full pipe cannot block the runner while its standard output is
+        consumed, or `subprocess.STDOUT` to merge it with the standard output.
+    :param env: Environment of the runner. Defaults to the current one.
+
+    :returns: The runner process.
+    """
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE,
+        stdout=stdout,
+        stderr=stderr,
+        env=env,
+    )
+    process.stdin.close()
+    PROCESSES.append(process)
+    return process
+
+
+def terminate(signum, frame):
+    """
+    Signal handler terminating the running runner processes, then this script.
+    Stopping this script (e.g. cancelling an asynchronous run in Vim) would
+    otherwise leave the runner running.
+
+    :param signum: The received signal number.
+    :param frame: The interrupted stack frame.
+    """
+    for process in PROCESSES:
+        if process.poll() is None:
+            process.terminate()
+    raise SystemExit(128 + signum)
+
+
+def read_output(process, stdout, stderr):
+    """
+    Iterate on the runner output lines. Standard error lines come after all the
+    standard output ones.
+
+    :param process: The runner process.
+    :param stdout: Temporary file the runner standard output is spooled to or
+        `None` if it is read from a pipe while the runner runs.
+    :param stderr: Temporary file the runner standard error is spooled to or
+        `None` if it is merged with the standard output.
+
+    :returns: A generator on lines stripped from their line ending.
+    """
+    if stdout is None:
+        stdout_lines = read_lines(process.stdout)
+    else:
+        stdout_lines = read_spooled(process, stdout)
+    if stderr is None:
+        return stdout_lines
+    return chain(stdout_lines, read_spooled(process, stderr))
+
+
+def read_raw_output(process, stderr):
+    """
+    Same as `read_output` for a runner whose standard output is read from a
+    pipe, without decoding lines.
+
+    :param process: The runner process.
+    :param stderr: Temporary file the runner standard error is spooled to or
+        `None` if it is merged with the standard output.
+
+    :returns: A generator on `memoryview` objects of lines.
+    """
+    if stderr is None:
+        return read_raw_lines(process.stdout)
+
+    def read_spooled_stderr():
+        process.wait()
+        stderr.seek(0)
+        for line in read_raw_lines(stderr):
+            yield line
+
+    return chain(read_raw_lines(process.stdout), read_spooled_stderr())
+
+
+def read_report(report_file, parser):
+    """
+    Parse what was written to a report file since it was last read. The file is
+    read by chunks so a large report is never held in memory.
+
+    :param report_file: The report file opened in binary mode.
+    :param parser: The incremental parser of the report format.
+
+    :returns: A generator on `Failure` records.
+    """
+    for data in iter(lambda: report_file.read(REPORT_CHUNK_SIZE), b""):
+        for line in parser.feed(data):
+            yield line
+
+
+def get_size(line):
+    """
+    Return the size of an output line once written.
+
+    :param line: A string, a bytes-like object or a `Failure`.
+
+    :returns: A number of bytes, line ending excluded.
+    """
+    if isinstance(line, Failure):
+        line = line.render()
+    if isinstance(line, memoryview):
+        return line.nbytes
+    if isinstance(line, bytes):
+        return len(line)
+    return len(line.encode("utf-8", "replace"))
+
+
+class OutputLimiter(object):
 
-def run(runner, args):
     """
-    Run test tests and prints out parsed output result in stdout.
+    Limit the runner output forwarded to the editor. Error markers are always
+    forwarded, cut to `MAX_ERROR_FORMAT_LENGTH` characters. Other lines are
+    dropped past `max_lines` lines of a failure block or once `max_bytes`
+    bytes were forwarded. A summary of the dropped lines takes their place.
+    """
+
+    def __init__(self, max_lines=0, max_bytes=0, block_start=None,
+                 strings=False):
+        """
+        :param max_lines: Maximum number of lines forwarded per failure block,
+            counted from the line starting the block or from the last error
+            marker. `0` for no limit.
+        :param max_bytes: Maximum number of bytes of the lines forwarded in
+            total, error markers excluded. `0` for no limit.
+        :param block_start: Optional compiled pattern of the lines starting a
+            failure block. See `runners.get_block_start`.
+        :param strings: Whether strings matching the error format are error
+            markers. See `runners.is_error_format`.
+        """
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.block_start = block_start
+        self.strings = strings
+        # Lines forwarded in the current block.
+        self.lines = 0
+        # Bytes forwarded in total.
+        self.size = 0
+        # Lines dropped since the last error marker and their size.
+        self.elided = 0
+        self.elided_size = 0
+        self.exhausted = False
+
+    def feed(self, line):
+        """
+        Filter the next output line.
+
+        :param line: An output line.
+
+        :returns: A list of the lines to forward.
+        """
+        if is_error_format(line, self.strings):
+            if isinstance(line, Failure):
+                line = line.render()
+            if len(line) > MAX_ERROR_FORMAT_LENGTH:
+                line = line[:MAX_ERROR_FORMAT_LENGTH - 4] + "...>"
+            output = self._summarize()
+            output.append(line)
+            self.lines = 0
+            return output
+        output = []
+        if self._starts_block(line):
+            output = self._summarize()
+            self.lines = 0
+        size = get_size(line)
+        if self.max_bytes and self.size + size > self.max_bytes:
+            if not self.exhausted:
+                self.exhausted = True
+                output.append(
+                    "vim-runners: Output limit of {max_bytes} bytes reached, "
+                    "only errors are reported from now on.".format(
+                        max_bytes=self.max_bytes,
+                    ),
+                )
+            self._elide(size)
+            return output
+        if self.max_lines and self.lines >= self.max_lines:
+            self._elide(size)
+            return output
+        self.lines += 1
+        self.size += size
+        output.append(line)
+        return output
+
+    def close(self):
+        """
+        Signal the end of the output.
+
+        :returns: A list of the lines left to forward.
+        """
+        return self._summarize()
+
+    def _starts_block(self, line):
+        # Undecoded lines are never looked at by the parsers: they cannot
+        # start a block.
+        if self.block_start is None or \
+                not isinstance(line, (str, type(u""))):
+            return False
+        return self.block_start.match(line) is not None
+
+    def _elide(self, size):
+        self.elided += 1
+        self.elided_size += size
+
+    def _summarize(self):
+        if not self.elided:
+            return []
+        summary = "vim-runners: {lines} lines ({size} bytes) elided.".format(
+            lines=self.elided,
+            size=self.elided_size,
+        )
+        self.elided = 0
+        self.elided_size = 0
+        return [summary]
+
+
+class CompactOutput(object):
+
+    """
+    Forward only the error markers, each preceded by the last lines output
+    before it, so the editor has few lines to match against its
+    'errorformat'. Every line is written to a log file.
+    """
+
+    def __init__(self, log, context=COMPACT_CONTEXT, strings=False):
+        """
+        :param log: File object opened in binary mode the full output is
+            written to.
+        :param context: Number of lines forwarded before each error marker.
+        :param strings: Whether strings matching the error format are error
+            markers. See `runners.is_error_format`.
+        """
+        self.log = log
+        self.strings = strings
+        self.lines = deque(maxlen=context)
+
+    def feed(self, line):
+        """
+        Filter the next output line.
+
+        :param line: An output line.
+
+        :returns: A list of the lines to forward.
+        """
+        if isinstance(line, (bytes, memoryview)):
+            self.log.write(line)
+        else:
+            self.log.write(str(line).encode("utf-8", "replace"))
+        self.log.write(b"\n")
+        if is_error_format(line, self.strings):
+            output = list(self.lines)
+            self.lines.clear()
+            output.append(line)
+            return output
+        self.lines.append(line)
+        return []
+
+    def close(self):
+        """
+        Signal the end of the output.
+
+        :returns: A list of the lines left to forward.
+        """
+        self.log.flush()
+        return []
+
+
+class OutputFilters(object):
+
+    """
+    Chain output filters (e.g. `CompactOutput` and `OutputLimiter`): the lines
+    forwarded by a filter are fed to the next one.
+    """
+
+    def __init__(self, filters):
+        """
+        :param filters: Ordered list of filters. A filter has the `feed(line)`
+            and `close()` methods of `OutputLimiter`.
+        """
+        self.filters = filters
+
+    def feed(self, line):
+        """
+        Filter the next output line.
+
+        :param line: An output line.
+
+        :returns: A list of the lines to forward.
+        """
+        lines = [line]
+        for output_filter in self.filters:
+            lines = [
+                line_ for line in lines for line_ in output_filter.feed(line)
+            ]
+        return lines
+
+    def close(self):
+        """
+        Signal the end of the output.
+
+        :returns: A list of the lines left to forward.
+        """
+        lines = []
+        for output_filter in self.filters:
+            lines = [
+                line_ for line in lines for line_ in output_filter.feed(line)
+            ]
+            lines.extend(output_filter.close())
+        return lines
+
+
+def emit(lines, output_filter=None):
+    """
+    Print out lines as soon as they are available.
+
+    :param lines: An iterable on the lines to print.
+    :param output_filter: Optional filter of the lines (e.g.
+        `OutputLimiter`).
+    """
+    if output_filter is not None:
+        lines = (
+            line_ for line in lines for line_ in output_filter.feed(line)
+        )
+    for line in lines:
+        if isinstance(line, (bytes, memoryview)):
+            # Undecoded lines are written as they are.
+            sys.stdout.buffer.write(line)
+            sys.stdout.buffer.write(b"\n")
+            sys.stdout.buffer.flush()
+        else:
+            print(line)
+            sys.stdout.flush()
+
+
+def get_merge_arguments(merge, stderr):
+    """
+    Return how the runner standard error is captured.
+
+    :param merge: Whether the standard error is merged with the standard
+        output.
+    :param stderr: Temporary file the standard error is spooled to when it is
+        not merged.
+
+    :returns: A `(capture, spooled, env)` tuple where `capture` and `env` are
+        the `stderr` and `env` arguments of `spawn` and `spooled` is the file
+        the standard error is read from (`None` when merged).
+    """
+    if not merge:
+        return stderr, stderr, None
+    env = dict(os.environ)
+    env.update(UNBUFFERED_ENVIRONMENT)
+    return subprocess.STDOUT, None, env
+
+
+def run(runner, args, merge=False, output_filter=None):
+    """
+    Run test tests and prints out parsed output result in stdout. The output is
+    parsed and printed while the runner is still running.
 
     :param runner: Name of the runner to be used.
     :param args: List of command arguments for the test runner.
+    :param merge: Whether the runner standard error is merged with its
+        standard output through a single pipe, so lines are parsed in the
+        order they were written.
+    :param output_filter: Optional filter of the printed lines. See `emit`.
+
+    :returns: List of the names of the failed tests.
     """
 
     cmd = get_command(runner).split()
     cmd.extend(args)
 
+    parse = get_iter_parse_function(runner)
+    # Runners able to parse undecoded lines only decode the lines they look at
+    parse_raw = None
+    if sys.version_info > (3, 0):
+        parse_raw = RUNNERS.attribute(runner, "iter_parse_raw", None)
+
+    failed = []
+
     # Call tests runner with the current args
-    p = subprocess.Popen(
-        cmd,
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-    )
-    stdout, stderr = p.communicate()
+    with tempfile.TemporaryFile() as stderr:
+        capture, spooled, env = get_merge_arguments(merge, stderr)
+        p = spawn(cmd, subprocess.PIPE, capture, env)
+        if parse_raw:
+            emit(parse_raw(read_raw_output(p, spooled), failed), output_filter)
+        else:
+            emit(parse(read_output(p, None, spooled), failed), output_filter)
+        p.stdout.close()
+    return failed
+
+
+def run_spooled(runner, args, merge=False, output_filter=None):
+    """
+    Run tests with their output written to temporary files and prints out
+    parsed output result in stdout once the runner exited. The files are read
+    through memory maps so a run logging gigabytes keeps a bounded memory use.
+
+    :param runner: Name of the runner to be used.
+    :param args: List of command arguments for the test runner.
+    :param merge: Whether the runner standard error is written to the same
+        file as its standard output.
+    :param output_filter: Optional filter of the printed lines. See `emit`.
+
+    :returns: List of the names of the failed tests.
+    """
+    cmd = get_command(runner).split()
+    cmd.extend(args)
+
+    parse = get_iter_parse_function(runner)
 
-    # In python3, the byte array needs to be decoded back to a string
-    if (sys.version_info > (3, 0)):
-        stdout = stdout.decode()
-        stderr = stderr.decode()
+    failed = []
 
-    output = "".join([stdout, stderr])
+    with tempfile.TemporaryFile() as stdout, \
+            tempfile.TemporaryFile() as stderr:
+        capture, spooled, env = get_merge_arguments(merge, stderr)
+        p = spawn(cmd, stdout, capture, env)
+        p.wait()
+        lines = read_mapped_lines(stdout)
+        if spooled is not None:
+            lines = chain(lines, read_mapped_lines(spooled))
+        emit(parse(lines, failed), output_filter)
+    return failed
 
-    parse = get_parse_function(runner)
 
-    result = parse(output.splitlines())
-    print("\n".join(result))
+def run_report(runner, args, report, output_filter=None):
+    """
+    Run tests and prints out their output followed by the errors read from the
+    structured report the runner writes to a temporary file. The report is
+    read and parsed while the runner is still running: errors are printed as
+    soon as they are written.
+
+    :param runner: Name of the runner to be used.
+    :param args: List of command arguments for the test runner.
+    :param report: Name of the structured report format.
+    :param output_filter: Optional filter of the printed lines. See `emit`.
+
+    :returns: List of the names of the failed tests.
+    """
+    fd, path = tempfile.mkstemp(suffix="." + report)
+    os.close(fd)
+
+    report_arguments = get_report_arguments(runner, report, path)
+    if report_arguments is None:
+        os.remove(path)
+        raise SystemExit(
+            "vim-runners: Runner '{runner}' cannot write '{report}' "
+            "reports.".format(runner=runner, report=report),
+        )
+
+    cmd = get_command(runner).split()
+    cmd.extend(report_arguments)
+    cmd.extend(args)
+
+    failed = []
+    parser = get_report_parser(report)(failed)
+
+    try:
+        with open(path, "rb") as report_file, \
+                tempfile.TemporaryFile() as stderr:
+            p = spawn(cmd, subprocess.PIPE, stderr, get_plugins_environment())
+            for line in read_output(p, None, stderr):
+                emit([line], output_filter)
+                emit(read_report(report_file, parser), output_filter)
+            p.stdout.close()
+            emit(read_report(report_file, parser), output_filter)
+            emit(parser.close(), output_filter)
+    finally:
+        os.remove(path)
+    return failed
+
+
+def run_daemon(runner, args, modules, output_filter=None):
+    """
+    Run tests in a child of the runner daemon and prints out parsed output
+    result in stdout. The daemon is started first if not running.
+
+    :param runner: Name of the runner to be used.
+    :param args: List of command arguments for the test runner.
+    :param modules: List of extra module names the daemon preloads when it has
+        to be started.
+    :param output_filter: Optional filter of the printed lines. See `emit`.
+
+    :returns: List of the names of the failed tests.
+    """
+    if not daemon.is_supported():
+        raise SystemExit(
+            "vim-runners: Runner daemon is not supported on this platform.",
+        )
+
+    parse = get_iter_parse_function(runner)
+
+    failed = []
+
+    client = daemon.request(runner, args, modules)
+    try:
+        with client.makefile("rb") as output:
+            child = daemon.read_child(output)
+            if child is not None:
+                PROCESSES.append(child)
+            try:
+                emit(parse(read_lines(output), failed), output_filter)
+            finally:
+                if child is not None:
+                    child.returncode = 0
+    finally:
+        client.close()
+    return failed
+
+
+def drop_seen_failures(lines, seen, found):
+    """
+    Drop the error markers a previous shard already output. Every shard
+    collects the whole suite, so each collection error is reported by all of
+    them.
+
+    :param lines: An iterable on the parsed output lines of a shard.
+    :param seen: Set of the `Failure` records output by the previous shards.
+    :param found: Set the `Failure` records output by this shard are added to.
+
+    :returns: A generator on the lines to output.
+    """
+    for line in lines:
+        if isinstance(line, Failure):
+            if line in seen:
+                continue
+            found.add(line)
+        yield line
+
+
+def run_sharded(runner, args, shards, output_filter=None):
+    """
+    Run tests split across `shards` runner processes running in parallel and
+    prints out their parsed output one shard after the other, in shard order.
+    Failures reported by several shards (i.e. collection errors) are only
+    output and listed once.
+
+    The first shard output is parsed while it runs. The other shards output is
+    spooled to temporary files until their turn comes.
+
+    :param runner: Name of the runner to be used.
+    :param args: List of command arguments for the test runner.
+    :param shards: Number of runner processes.
+    :param output_filter: Optional filter of the printed lines. See `emit`.
+
+    :returns: List of the names of the failed tests.
+    """
+    shard_arguments = RUNNERS.attribute(runner, "SHARD_ARGUMENTS", None)
+    if shard_arguments is None:
+        raise SystemExit(
+            "vim-runners: Runner '{runner}' cannot run sharded.".format(
+                runner=runner,
+            ),
+        )
+
+    cmd = get_command(runner).split()
+    cmd.extend(shard_arguments)
+    cmd.extend(args)
+
+    parse = get_iter_parse_function(runner)
+
+    failed = []
+    shards_ = []
+    try:
+        for index in range(shards):
+            env = get_plugins_environment()
+            env[SHARD_ENVIRONMENT] = "{index}/{shards}".format(
+                index=index,
+                shards=shards,
+            )
+            stdout = None if index == 0 else tempfile.TemporaryFile()
+            stderr = tempfile.TemporaryFile()
+            shards_.append((
+                spawn(
+                    cmd,
+                    subprocess.PIPE if stdout is None else stdout,
+                    stderr,
+                    env,
+                ),
+                stdout,
+                stderr,
+            ))
+
+        seen = set()
+        for p, stdout, stderr in shards_:
+            shard_failed = []
+            found = set()
+            emit(
+                drop_seen_failures(
+                    parse(read_output(p, stdout, stderr), shard_failed),
+                    seen,
+                    found,
+                ),
+                output_filter,
+            )
+            seen |= found
+            names = set(failed)
+            failed.extend(name for name in shard_failed if name not in names)
+    finally:
+        for p, stdout, stderr in shards_:
+            if stdout is None:
+                p.stdout.close()
+            else:
+                stdout.close()
+            stderr.close()
+    return failed
+
+
+def parse_arguments(argv):
+    """
+    Split this script options from the runner name and arguments. Options are
+    `--runner-<name>[=<value>]` arguments and can be anywhere on the command
+    line.
+
+    :param argv: List of command arguments (without the script name).
+
+    :returns: A `(runner, args, options)` tuple where `options` maps option
+        names to their value. Options without value are set to `True`.
+    """
+    options = {}
+    arguments = []
+    for arg in argv:
+        if arg.startswith(OPTION_PREFIX):
+            name, separator, value = arg[len(OPTION_PREFIX):].partition("=")
+            options[name] = value if separator else True
+        else:
+            arguments.append(arg)
+    return arguments[0], arguments[1:], options
+
+
+def main(argv):
+    """
+    Run tests as requested on the command line and record the run.
+
+    With the `report` option, errors are read from a structured report of
+    that format instead of the runner output. With the `daemon` option, tests
+    run in a child of the runner daemon which preloads the runner and the comma
+    separated modules of the `preload` option. With the `spool` option, the
+    runner output is written to temporary files and parsed once it exited.
+    With the `merge` option, the runner standard error is merged with its
+    standard output, by default or with the `spool` option. With the `failed`
+    option, only the failed tests of the last run are run again. With the
+    `failed-first` option, they are run first and the last run is repeated in
+    full only if they all pass. With the `compact` option, only error markers
+    and the given number of lines before each are printed and the full output
+    is written to a log file (see `CompactOutput`). The `max-lines` and
+    `max-bytes` options limit the output lines forwarded per failure and in
+    total (see `OutputLimiter`).
+
+    :param argv: List of command arguments (without the script name).
+    """
+    runner, args, options = parse_arguments(argv)
+    shards = int(options.get('shards', 1))
+    preload = [m for m in str(options.get('preload', "")).split(",") if m]
+    merge = bool(options.get('merge'))
+    # Built-in parsers and report parsers output `Failure` records. Only the
+    # parsers of third party runners may output error format strings.
+    strings = not options.get('report') and not RUNNERS.is_builtin(runner)
+
+    filters = []
+    log = None
+    if options.get('compact'):
+        context = options['compact']
+        log = open_private_file(get_state_path("log"))
+        filters.append(CompactOutput(
+            log,
+            COMPACT_CONTEXT if context is True else int(context),
+            strings,
+        ))
+    if options.get('max-lines') or options.get('max-bytes'):
+        filters.append(OutputLimiter(
+            int(options.get('max-lines') or 0),
+            int(options.get('max-bytes') or 0),
+            get_block_start(runner),
+            strings,
+        ))
+    output_filter = OutputFilters(filters) if filters else None
+
+    def run_(args):
+        if shards > 1:
+            return run_sharded(runner, args, shards, output_filter)
+        if options.get('report'):
+            return run_report(runner, args, options['report'], output_filter)
+        if options.get('daemon'):
+            return run_daemon(runner, args, preload, output_filter)
+        if options.get('spool'):
+            return run_spooled(runner, args, merge, output_filter)
+        return run(runner, args, merge, output_filter)
+
+    try:
+        if options.get('failed') or options.get('failed-first'):
+            state = load_state(runner)
+            if state:
+                args = state['args']
+            if state and state['failed']:
+                select_tests = RUNNERS.attribute(runner, "select_tests", None)
+                if select_tests is None:
+                    raise SystemExit(
+                        "vim-runners: Runner '{runner}' cannot select "
+                        "tests.".format(runner=runner),
+                    )
+                failed = run_(args + select_tests(state['failed']))
+                if not failed and options.get('failed-first'):
+                    failed = run_(args)
+            elif options.get('failed-first'):
+                failed = run_(args)
+            else:
+                print("vim-runners: No failed tests to run.")
+                return
+        else:
+            failed = run_(args)
+
+        if output_filter is not None:
+            emit(output_filter.close())
+    finally:
+        if log is not None:
+            log.close()
+
+    if log is not None:
+        print("vim-runners: Full output written to {path}".format(
+            path=log.name,
+        ))
+
+    save_state(runner, args, failed)
 
 if __name__ == "__main__":
-    run(
-        runner=sys.argv[1],
-        args=sys.argv[2:],
-    )
+    signal.signal(signal.SIGTERM, terminate)
+    main(sys.argv[1:])
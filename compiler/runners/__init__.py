@@ -4,6 +4,164 @@
 import re
 from importlib import import_module
 
+ENTRY_POINT_GROUP = "vim_python_tests_runner.runners"
+"""
+Entry point group third party packages register their runner modules in. The
+entry point name is the runner name.
+"""
+
+MISSING = object()
+"""
+Marker of a missing default value.
+"""
+
+
+def iter_entry_points(group):
+    """
+    Iterate on the entry points installed for `group` without loading them.
+
+    :param group: The entry point group name.
+
+    :returns: An iterable on objects with a `name` attribute and a `load()`
+        method. Empty if entry points cannot be discovered.
+    """
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:  # python < 3.8
+        try:
+            from pkg_resources import iter_entry_points as entry_points_
+        except ImportError:
+            return []
+        return entry_points_(group)
+    try:
+        return entry_points(group=group)
+    except TypeError:  # python < 3.10
+        return entry_points().get(group, [])
+
+
+class RunnerRegistry(object):
+
+    """
+    Resolve runner modules by name, once. Runners are the modules of the
+    `runners` package and the modules registered by third party packages under
+    the `ENTRY_POINT_GROUP` entry point group. Modules are only imported when
+    first requested and entry points are only searched for runners which are
+    not part of the package.
+    """
+
+    def __init__(self, package="runners", group=ENTRY_POINT_GROUP,
+                 entry_points=iter_entry_points):
+        """
+        :param package: Name of the package holding the built-in runners.
+        :param group: Entry point group of the third party runners.
+        :param entry_points: Callable returning the entry points of a group.
+        """
+        self.package = package
+        self.group = group
+        self.entry_points = entry_points
+        self.runners = {}
+        self.attributes = {}
+
+    def register(self, name, runner):
+        """
+        Register a runner under `name`, replacing any runner of that name.
+
+        :param name: The name of the runner.
+        :param runner: The module (or any object) implementing the runner.
+        """
+        self.runners[name] = runner
+        for key in [key for key in self.attributes if key[0] == name]:
+            del self.attributes[key]
+
+    def get(self, name):
+        """
+        Return the module implementing the runner `name`.
+
+        :param name: The name of the runner.
+
+        :returns: A module object.
+
+        :raises ImportError: If no runner of that name exists.
+        """
+        runner = self.runners.get(name)
+        if runner is None:
+            runner = self._load(name)
+            self.runners[name] = runner
+        return runner
+
+    def attribute(self, name, attribute, default=MISSING):
+        """
+        Return an attribute (e.g. `COMMAND` or `parse`) of a runner module.
+
+        :param name: The name of the runner.
+        :param attribute: The name of the attribute.
+        :param default: Value returned if the runner has no such attribute.
+            Without default, `AttributeError` is raised.
+
+        :returns: The attribute value.
+        """
+        key = (name, attribute)
+        try:
+            return self.attributes[key]
+        except KeyError:
+            pass
+        value = getattr(self.get(name), attribute, MISSING)
+        if value is MISSING:
+            if default is MISSING:
+                raise AttributeError(
+                    "Runner '{name}' has no attribute '{attribute}'".format(
+                        name=name,
+                        attribute=attribute,
+                    ),
+                )
+            return default
+        self.attributes[key] = value
+        return value
+
+    def is_builtin(self, name):
+        """
+        Tell whether the runner `name` is a module of the runners package
+        rather than a third party runner.
+
+        :param name: The name of the runner.
+
+        :returns: A boolean.
+        """
+        module = getattr(self.get(name), "__name__", "")
+        return module.startswith(self.package + ".")
+
+    def _load(self, name):
+        module = ".".join([self.package, name])
+        try:
+            return import_module(module)
+        except ImportError as e:
+            # Only a missing runner module is looked for in entry points. An
+            # import error inside the module is a real error.
+            missing = getattr(e, "name", None) or str(e).split()[-1]
+            if missing not in (module, name):
+                raise
+        for entry_point in self.entry_points(self.group):
+            if entry_point.name == name:
+                return entry_point.load()
+        raise ImportError("No runner named '{name}'".format(name=name))
+
+
+RUNNERS = RunnerRegistry()
+"""
+Registry of the available runners.
+"""
+
+
+def get_runner(runner):
+    """
+    Return the module implementing the specified runner.
+
+    :param runner: The name of the runner.
+
+    :returns: A module object.
+    """
+    return RUNNERS.get(runner)
+
 
 def get_parse_function(runner):
     """
@@ -13,10 +171,32 @@ def get_parse_function(runner):
 
     :returns: A callable object.
     """
-    return getattr(
-        import_module(".".join(["runners", runner])),
-        "parse",
-    )
+    return RUNNERS.attribute(runner, "parse")
+
+
+def get_iter_parse_function(runner):
+    """
+    Return the output parse generator function for specified runner. It parses
+    lines as they are produced instead of waiting for the whole output.
+
+    A runner providing only a `parse` function gets a generator parsing the
+    whole output once read. It does not report the failed tests.
+
+    :param runner: The name of the runner.
+
+    :returns: A callable object taking the lines and an optional list the
+        names of the failed tests are appended to.
+    """
+    iter_parse = RUNNERS.attribute(runner, "iter_parse", None)
+    if iter_parse is not None:
+        return iter_parse
+    parse = get_parse_function(runner)
+
+    def iter_parse_all(lines, failed=None):
+        for line in parse(list(lines)):
+            yield line
+
+    return iter_parse_all
 
 
 def get_command(runner):
@@ -27,10 +207,65 @@ def get_command(runner):
 
     :returns: Terminal command to start test runner.
     """
-    return getattr(
-        import_module(".".join(["runners", runner])),
-        "COMMAND",
-    )
+    return RUNNERS.attribute(runner, "COMMAND")
+
+
+def get_block_start(runner):
+    """
+    Return the pattern of the output lines starting a failure block for
+    specified runner.
+
+    :param runner: The name of the runner.
+
+    :returns: A compiled regular expression or `None` if the runner output has
+        no known block delimiter.
+    """
+    return RUNNERS.attribute(runner, "BLOCK_START", None)
+
+
+def get_report_parser(report):
+    """
+    Return the incremental parser class of a structured report format. The
+    format is implemented by the runner module of the same name.
+
+    :param report: The name of the report format.
+
+    :returns: A class whose instances have a `feed(data)` and a `close()`
+        method returning `Failure` records.
+    """
+    return RUNNERS.attribute(report, "ReportParser")
+
+
+def get_report_arguments(runner, report, path):
+    """
+    Return the command arguments making the test runner write a structured
+    report.
+
+    :param runner: The name of the runner.
+    :param report: The name of the report format.
+    :param path: Path of the report file.
+
+    :returns: A list of command arguments or `None` if the runner cannot write
+        this report format.
+    """
+    options = RUNNERS.attribute(runner, "REPORT_OPTIONS", {})
+    if report not in options:
+        return None
+    return [arg.format(path=path) for arg in options[report]]
+
+
+def decode(line):
+    """
+    Decode a line read from the runner output. Invalid UTF-8 sequences are
+    replaced instead of failing the whole run.
+
+    :param line: A bytes-like object (e.g. a `memoryview`).
+
+    :returns: A string.
+    """
+    if isinstance(line, memoryview):
+        line = line.tobytes()
+    return line.decode("utf-8", "replace")
 
 
 def make_error_format(file_path, line_no, error):
@@ -51,18 +286,177 @@ def make_error_format(file_path, line_no, error):
     )
 
 
+class Failure(object):
+
+    """
+    Failure found by a parser: its location, its description and the output
+    lines reporting it. Parsers output it in place of its error format string,
+    which is only built when the failure is printed (see `render`). Failures
+    are equal if they have the same location and description.
+    """
+
+    __slots__ = ('file_path', 'line_no', 'message', 'span')
+
+    def __init__(self, file_path, line_no, message, span=None):
+        """
+        :param file_path: The file path from where the error occurred.
+        :param line_no: The line number pointing to the erroneous code.
+        :param message: The error description.
+        :param span: Optional `(first, last)` tuple of the indexes of the
+            output lines reporting the failure. Indexes count the lines given
+            to the parser, error markers excluded. `None` if the failure was
+            not read from the runner output (e.g. a structured report).
+        """
+        self.file_path = file_path
+        self.line_no = line_no
+        self.message = message
+        self.span = span
+
+    def render(self):
+        """
+        Return the error format string of the failure. See
+        `make_error_format`.
+
+        :returns: A string.
+        """
+        return make_error_format(self.file_path, self.line_no, self.message)
+
+    __str__ = render
+
+    def __repr__(self):
+        return "Failure({0!r}, {1!r}, {2!r}, {3!r})".format(
+            self.file_path,
+            self.line_no,
+            self.message,
+            self.span,
+        )
+
+    def _key(self):
+        return (self.file_path, self.line_no, self.message)
+
+    def __eq__(self, other):
+        if not isinstance(other, Failure):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __ne__(self, other):
+        if not isinstance(other, Failure):
+            return NotImplemented
+        return self._key() != other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+
+ERROR_FORMAT = re.compile(r"\S.*:\S+ <.*>$")
+"""
+Pattern of the lines generated by `make_error_format`.
+"""
+
+
+def is_error_format(line, strings=False):
+    """
+    Tell whether `line` is an error marker. Markers are the `Failure` records
+    output by the parsers. Ordinary output lines can match `ERROR_FORMAT` too,
+    so strings generated by `make_error_format` are only markers as a fallback
+    for third party runners which output them.
+
+    :param line: An output line. Undecoded lines are lines of the runner
+        output left as they are and never error markers.
+    :param strings: Whether strings matching `ERROR_FORMAT` are markers.
+
+    :returns: A boolean.
+    """
+    if isinstance(line, Failure):
+        return True
+    if not strings or not isinstance(line, (str, type(u""))):
+        return False
+    return ERROR_FORMAT.match(line) is not None
+
+
+PATTERNS = {}
+"""
+Registry of compiled regular expressions indexed by their pattern string.
+"""
+
+
+def compile_pattern(pattern):
+    """
+    Return the compiled regular expression for `pattern`. Each pattern is
+    compiled once and kept in the `PATTERNS` registry.
+
+    :param pattern: A regex pattern string.
+
+    :returns: A compiled regular expression object.
+    """
+    try:
+        return PATTERNS[pattern]
+    except KeyError:
+        regex = PATTERNS[pattern] = re.compile(pattern)
+        return regex
+
+
 def match_pattern(pattern, line):
     """
     Wrapper on `re` module `compile` and `match` methods.
 
     :param pattern: A regex pattern with defined  group. If no groups are
-        defined, the function will always return an empty dictionary.
+        defined, the function will always return an empty dictionary. An
+        already compiled regular expression is also accepted.
 
     :returns: Return matches found in `line` as a dictionary. If no match, an
         empty dictionary is returned.
     """
-    pattern = re.compile(pattern)
+    if not hasattr(pattern, 'match'):
+        pattern = compile_pattern(pattern)
     m = pattern.match(line)
     if not m:
         return {}
     return m.groupdict()
+
+
+class LineClassifier(object):
+
+    """
+    Tell which kind of line, among a set of known kinds, a line is with a single
+    regular expression evaluation.
+
+    All kind patterns are combined into one alternation where each pattern is
+    wrapped in a group named after its kind. When a line matches more than one
+    pattern, the kind declared first wins.
+    """
+
+    def __init__(self, kinds, encoding=None):
+        """
+        :param kinds: Ordered sequence of `(kind, pattern)` tuples. Kinds must
+            be valid regex group names.
+        :param encoding: If set, the combined pattern is encoded with it to
+            classify byte strings (or any bytes-like object) instead of text.
+        """
+        self.kinds = tuple(kind for kind, _ in kinds)
+        pattern = "|".join(
+            "(?P<{kind}>{pattern})".format(
+                kind=kind,
+                # Named groups of the kind patterns would clash with each
+                # other once combined.
+                pattern=re.sub(r"\(\?P<\w+>", "(?:", pattern),
+            )
+            for kind, pattern in kinds
+        )
+        if encoding:
+            pattern = pattern.encode(encoding)
+        self.regex = re.compile(pattern)
+
+    def classify(self, line):
+        """
+        Return the kind of `line`.
+
+        :param line: A string to classify.
+
+        :returns: The matching kind name or `None` if `line` is of no known
+            kind.
+        """
+        m = self.regex.match(line)
+        if not m:
+            return None
+        return m.lastgroup
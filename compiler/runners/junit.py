@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+
+"""
+Parse a JUnit XML report and output a formatted line this plugin understand
+for each failed or erroneous test case. *pytest* (`--junitxml`) and *nose*
+(`--with-xunit`) both write this format.
+
+The report is parsed as a stream of XML events: no element tree is built and
+only the location and message of the current failure are kept, so memory does
+not grow with the report size.
+"""
+
+from __future__ import print_function
+
+import os
+import re
+from xml.etree.ElementTree import XMLParser
+
+from . import (
+    Failure,
+    LineClassifier,
+    compile_pattern,
+    match_pattern,
+)
+from .pytest import (
+    ERROR,
+    FILE_LOCATION,
+    FIXTURE_NOT_FOUND_FILE_LOCATION,
+)
+from .python import FILE_LOCATION as TRACEBACK_FILE_LOCATION
+
+TRACEBACK_ENTRY = compile_pattern(
+    r"(?P<file_path>\S+):(?P<line_no>\d+): in .*$",
+)
+"""
+Entry of a *pytest* short traceback.
+"""
+
+LINE_KINDS = LineClassifier([
+    ('traceback_entry', TRACEBACK_ENTRY.pattern),
+    ('traceback_file_location', TRACEBACK_FILE_LOCATION.pattern),
+    ('error', ERROR.pattern),
+    (
+        'fixture_not_found_file_location',
+        FIXTURE_NOT_FOUND_FILE_LOCATION.pattern,
+    ),
+    ('file_location', FILE_LOCATION.pattern),
+])
+"""
+Kinds of the failure text lines carrying a location or an error description.
+Most lines are none of them and are skipped after a single regex evaluation.
+"""
+
+FAILURE_TAGS = ("failure", "error")
+"""
+Tags of the test case children reporting a failure.
+"""
+
+TEXT_BUFFER_SIZE = 64 * 1024
+"""
+Number of characters of a failure text buffered before being parsed.
+"""
+
+MAX_LINE_LENGTH = 1024
+"""
+Number of characters a failure text line is cut to. The rest of a longer line
+(e.g. the repr of a huge assertion) is dropped as it is read.
+"""
+
+SETUP_MESSAGE = re.compile(r'failed on \w+ with "(?P<message>.*)')
+"""
+Prefix *pytest* adds to the message of setup and teardown errors.
+"""
+
+
+def get_test_location(test_case):
+    """
+    Return the location of a test case given by its attributes. *pytest*
+    writes the `file` and `line` attributes, the line being 0-based.
+
+    :param test_case: The attributes of the test case.
+
+    :returns: A `(file_path, line_no)` tuple. The line number is `None` if
+        unknown. The file path is `None` if the test case has no location.
+    """
+    file_path = test_case.get('file')
+    if not file_path:
+        return None, None
+    line = test_case.get('line', "")
+    return file_path, str(int(line) + 1) if line.isdigit() else None
+
+
+def get_failed_test(classname, name):
+    """
+    Return the node id of a test case of the report, as
+    `runners.pytest.match_failed_test` does, so it can be selected again. The
+    module is the longest dotted prefix of `classname` naming a module file
+    of the working directory. Without such a file, the module is the prefix
+    up to the first capitalized (i.e. class) name.
+
+    :param classname: The `classname` attribute of the test case, e.g.
+        `tests.test_a.TestA`. Empty for a module that failed to be collected.
+    :param name: The `name` attribute of the test case.
+
+    :returns: The test node id (e.g. `tests/test_a.py::TestA::test_a`), the
+        path of the module that failed to be collected or `None` if the test
+        case has no name.
+    """
+    if not name:
+        return None
+    if not classname:
+        # Collection errors are named after the module.
+        return "/".join(name.split(".")) + ".py"
+    parts = classname.split(".")
+    for index in range(len(parts), 0, -1):
+        if os.path.isfile(os.path.join(*parts[:index]) + ".py"):
+            break
+    else:
+        index = next(
+            (
+                index for index, part in enumerate(parts)
+                if index and part[:1].isupper()
+            ),
+            len(parts),
+        )
+    return "::".join(
+        ["/".join(parts[:index]) + ".py"] + parts[index:] + [name],
+    )
+
+
+class FailureText(object):
+
+    """
+    Location and message of a failure, collected line by line from its text.
+    """
+
+    def __init__(self, message):
+        """
+        :param message: The `message` attribute of the failure.
+        """
+        message = (message or "").strip()
+        message = message.splitlines()[0] if message else ""
+        match = SETUP_MESSAGE.match(message)
+        if match:
+            message = match.group('message')
+        self.message = message
+        self.error = None
+        # Last traceback entry
+        self.location = None
+        # First location found outside a traceback (fixture errors)
+        self.fallback = None
+        # Text not parsed yet. The XML parser hands it by small pieces.
+        self.chunks = []
+        self.size = 0
+        # Whether the text is dropped up to the end of the current line.
+        self.cut = False
+
+    def feed(self, text):
+        """
+        Parse the next chunk of the failure text. Chunks are parsed once
+        `TEXT_BUFFER_SIZE` characters are buffered.
+
+        :param text: A string, possibly ending in the middle of a line.
+        """
+        if self.cut:
+            end = text.find("\n")
+            if end < 0:
+                return
+            text = text[end:]
+            self.cut = False
+        self.chunks.append(text)
+        self.size += len(text)
+        if self.size >= TEXT_BUFFER_SIZE:
+            self._parse_chunks()
+
+    def _parse_chunks(self):
+        lines = "".join(self.chunks).split("\n")
+        partial = lines.pop()
+        if len(partial) > MAX_LINE_LENGTH:
+            partial = partial[:MAX_LINE_LENGTH]
+            self.cut = True
+        self.chunks = [partial]
+        self.size = len(partial)
+        for line in lines:
+            self._parse_line(line[:MAX_LINE_LENGTH])
+
+    def close(self, file_path=None, line_no=None):
+        """
+        Parse the end of the failure text.
+
+        :param file_path: The file of the test case, used if the text has no
+            location.
+        :param line_no: The line of the test case in `file_path`.
+
+        :returns: A `Failure`. Its location is `Unknown` if neither the text
+            nor the test case have one.
+        """
+        self._parse_chunks()
+        self._parse_line(self.chunks.pop()[:MAX_LINE_LENGTH])
+        location = self.location or self.fallback or {
+            'file_path': file_path or 'Unknown',
+            'line_no': line_no or 'Unknown',
+        }
+        return Failure(
+            location['file_path'],
+            location['line_no'],
+            self.error or self.message,
+        )
+
+    def _parse_line(self, line):
+        kind = LINE_KINDS.classify(line)
+        if kind is None:
+            return
+        if kind == 'traceback_entry':
+            self.location = match_pattern(TRACEBACK_ENTRY, line)
+        elif kind == 'traceback_file_location':
+            self.location = match_pattern(TRACEBACK_FILE_LOCATION, line)
+        elif kind == 'error':
+            self.error = match_pattern(ERROR, line)['error']
+        elif self.fallback is None:
+            self.fallback = match_pattern(
+                FIXTURE_NOT_FOUND_FILE_LOCATION
+                if kind == 'fixture_not_found_file_location' else
+                FILE_LOCATION,
+                line,
+            )
+
+
+class ReportTarget(object):
+
+    """
+    Target of the XML parser receiving the report elements as they are read.
+    """
+
+    def __init__(self, failed=None):
+        """
+        :param failed: Optional list the names of the failed tests are appended
+            to.
+        """
+        self.failed = failed
+        self.output = []
+        self.test_case = None
+        self.failure = None
+
+    def start(self, tag, attrib):
+        if tag == "testcase":
+            self.test_case = attrib
+        elif tag in FAILURE_TAGS and self.test_case is not None:
+            self.failure = FailureText(attrib.get('message'))
+
+    def end(self, tag):
+        if tag in FAILURE_TAGS and self.failure is not None:
+            error = self.failure.close(*get_test_location(self.test_case))
+            self.failure = None
+            if self.failed is not None:
+                name = get_failed_test(
+                    self.test_case.get('classname'),
+                    self.test_case.get('name'),
+                )
+                # A test can both fail and error out (e.g. in teardown).
+                if name and self.failed[-1:] != [name]:
+                    self.failed.append(name)
+            self.output.append(error)
+        elif tag == "testcase":
+            self.test_case = None
+
+    def data(self, data):
+        if self.failure is not None:
+            self.failure.feed(data)
+
+    def close(self):
+        pass
+
+
+class ReportParser(object):
+
+    """
+    Incremental parser of a JUnit XML report. Data is fed as it is read from
+    the report file.
+    """
+
+    def __init__(self, failed=None):
+        """
+        :param failed: Optional list the node ids of the failed tests are
+            appended to. See `get_failed_test`.
+        """
+        self.target = ReportTarget(failed)
+        self.parser = XMLParser(target=self.target)
+        self.empty = True
+
+    def _flush(self):
+        output = self.target.output
+        self.target.output = []
+        return output
+
+    def feed(self, data):
+        """
+        Parse the next chunk of the report.
+
+        :param data: A byte string.
+
+        :returns: A list of `Failure` records.
+        """
+        if data:
+            self.empty = False
+            self.parser.feed(data)
+        return self._flush()
+
+    def close(self):
+        """
+        Parse the end of the report. A runner which did not write its report
+        (e.g. it crashed) is not an error: its output tells why.
+
+        :returns: A list of `Failure` records.
+        """
+        if self.empty:
+            return []
+        self.parser.close()
+        return self._flush()
+
+
+def iter_parse(stream, failed=None, size=64 * 1024):
+    """
+    Parse a JUnit XML report.
+
+    :param stream: A file object opened in binary mode on the report.
+    :param failed: Optional list the names of the failed tests are appended to.
+    :param size: Size of the chunks read from `stream`.
+
+    :returns: A generator on `Failure` records.
+    """
+    parser = ReportParser(failed)
+    for data in iter(lambda: stream.read(size), b""):
+        for line in parser.feed(data):
+            yield line
+    for line in parser.close():
+        yield line
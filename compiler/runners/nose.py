@@ -9,8 +9,13 @@ error is found.
 
 from __future__ import print_function
 
-import re
+from itertools import chain
 
+from . import (
+    Failure,
+    compile_pattern,
+    match_pattern,
+)
 from .python import parse_traceback
 
 COMMAND = "nosetests"
@@ -18,6 +23,107 @@ COMMAND = "nosetests"
 Terminal command to start nosetests.
 """
 
+MODULE = "nose"
+"""
+Python module started in-process by the runner daemon. See `daemon.py`.
+"""
+
+REPORT_OPTIONS = {
+    'junit': ["--with-xunit", "--xunit-file={path}"],
+}
+"""
+Extra command arguments writing a structured report to `{path}`, indexed by
+report format.
+"""
+
+TEST_TITLE = compile_pattern(
+    r"(FAIL|ERROR): (?P<name>\S+)( \((?P<case>\S+)\))?$",
+)
+BLOCK_START = compile_pattern(r"={2,}$")
+"""
+Pattern of the lines starting a failure block. The output line limit counts
+the lines of each block from one of them. See `run.OutputLimiter`.
+"""
+
+
+def match_failed_test(line):
+    """
+    Extract the name of the failed test from a failure title line.
+
+    :param line: A string to pattern match against.
+
+    :returns: The test name as nose expects it on its command line (i.e.
+        `package.module:Case.test`) or `None` if no test name is found. Tests
+        described by their docstring have none.
+    """
+    title = match_pattern(TEST_TITLE, line)
+    if not title:
+        return None
+    if title['case']:
+        module, _, case = title['case'].rpartition(".")
+        return "{module}:{case}.{name}".format(
+            module=module,
+            case=case,
+            name=title['name'],
+        )
+    module, _, name = title['name'].rpartition(".")
+    if not module:
+        return None
+    return "{module}:{name}".format(module=module, name=name)
+
+
+def select_tests(names):
+    """
+    Return the command arguments selecting tests by name.
+
+    :param names: List of names as returned by `match_failed_test` or node ids
+        read from a JUnit report (i.e. `path/to/module.py::Case::test`).
+
+    :returns: A list of command arguments.
+    """
+    arguments = []
+    for name in names:
+        if "::" in name:
+            path, _, test = name.partition("::")
+            name = "{path}:{test}".format(
+                path=path,
+                test=test.replace("::", "."),
+            )
+        arguments.append(name)
+    return arguments
+
+
+def iter_parse(lines, failed=None):
+    """
+    Parse nose output as it is produced.
+
+    :param lines: An iterable on nose error output lines.
+    :param failed: Optional list the names of the failed tests are appended to.
+
+    :returns: A generator on nose output augmented with specially formatted
+        lines adapted to this plugin errorformat. A traceback is yielded as soon
+        as its error description is found.
+    """
+    lines = iter(lines)
+    # Number of lines read, error markers excluded.
+    count = 0
+
+    for line in lines:
+        count += 1
+        yield line
+        if BLOCK_START.match(line):
+            title = next(lines, None)
+            if title is None:
+                break
+            if failed is not None:
+                name = match_failed_test(title)
+                if name:
+                    failed.append(name)
+            for line in parse_traceback(chain([title], lines), count):
+                if not isinstance(line, Failure):
+                    count += 1
+                yield line
+
 
 def parse(lines):
     """
@@ -28,15 +134,4 @@ def parse(lines):
     :returns: nose output augmented with specially formatted lines adapted to
         this plugin errorformat which will populate Vim clist.
     """
-    results = []
-    lines = iter(lines)
-
-    failure = re.compile(r"^=*$")
-
-    for line in lines:
-        results.append(line)
-        if failure.match(line):
-            results.extend(
-                parse_traceback(lines),
-            )
-    return results
+    return list(iter_parse(lines))
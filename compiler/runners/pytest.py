@@ -11,28 +11,139 @@ parse python standard traceback.
 from __future__ import print_function
 
 import os
-import re
 from itertools import (
     chain,
 )
 from platform import system
 
 from . import (
-    make_error_format,
+    Failure,
+    LineClassifier,
+    compile_pattern,
+    decode,
     match_pattern,
 )
 from .python import (
+    CODE as TRACEBACK_CODE,
+    FILE_LOCATION as TRACEBACK_FILE_LOCATION,
     parse_traceback,
 )
 
 
-COMMAND = "py.test --tb=short"
+COMMAND = "py.test --tb=short -rfE"
 """
-Terminal command to start nosetests.
+Terminal command to start nosetests. The short test summary (`-rfE`) reports
+the node ids of the failed tests.
 """
 
 if system().lower() == 'windows':
-    COMMAND = "py.test.exe --tb=short"
+    COMMAND = "py.test.exe --tb=short -rfE"
+
+MODULE = "pytest"
+"""
+Python module started in-process by the runner daemon. See `daemon.py`.
+"""
+
+SHARD_ARGUMENTS = ["-p", "python_tests_runner_shard"]
+"""
+Extra command arguments loading the plugin restricting a session to a shard of
+the collected tests. See `plugins/python_tests_runner_shard.py`.
+"""
+
+REPORT_OPTIONS = {
+    'reportlog': [
+        "-p",
+        "python_tests_runner_reportlog",
+        "--python-tests-runner-report-log={path}",
+    ],
+    'junit': ["--junitxml={path}"],
+}
+"""
+Extra command arguments writing a structured report to `{path}`, indexed by
+report format. See `plugins/python_tests_runner_reportlog.py`.
+"""
+
+# Patterns of the lines carrying an error location or description.
+FIXTURE_SCOPE_MISMATCH = compile_pattern(r"ScopeMismatch: (?P<error>.*)$")
+FILE_LOCATION = compile_pattern(
+    r"(?P<file_path>\S+):(?P<line_no>\d+)(:| in)\s.*$",
+)
+ERROR = compile_pattern(r"E\s+(?P<error>.*)$")
+CONFTEST_ERROR = compile_pattern(
+    r"^E\s+.*ConftestImportFailure: "
+    r"\(local\('(?P<file_path>.*)'\), \((?P<error>.*)\)\)$",
+)
+FIXTURE_NOT_FOUND_FILE_LOCATION = compile_pattern(
+    r"file (?P<file_path>.*), line (?P<line_no>.*)$",
+)
+FIXTURE_NOT_FOUND_ERROR = compile_pattern(
+    r"^\s+(?P<error>fixture '.*' not found)$",
+)
+
+# Patterns delimiting the report sections and blocks.
+SECTION_DELIMITER = compile_pattern(r"={2,} .* ={2,}")
+BLOCK_DELIMITER = compile_pattern(r"_{2,} (?<!Captured stder call).* _{2,}")
+FIXTURE_ERROR_BLOCK = compile_pattern(r"_{2,} ERROR at setup of .{2,}")
+CONFTEST_ERROR_BLOCK = compile_pattern(r"_{2,} ERROR collecting _{2,}")
+CAPTURED_STDERR_SETUP = compile_pattern(r"-{2,} Captured stderr setup -{2,}")
+CAPTURED_STDERR_CALL = compile_pattern(r"-{2,} Captured stderr call -{2,}")
+ROOT_DIR = compile_pattern(r"rootdir: (?P<root>.*), inifile: (?P<ini>.*)$")
+BLOCK_START = compile_pattern(
+    "|".join([SECTION_DELIMITER.pattern, BLOCK_DELIMITER.pattern]),
+)
+"""
+Pattern of the lines starting a failure block or a section. The output line
+limit counts the lines of each block from one of them. See
+`run.OutputLimiter`.
+"""
+SHORT_SUMMARY = compile_pattern(r"={2,} short test summary info ={2,}")
+SHORT_SUMMARY_TEST = compile_pattern(
+    r"(FAIL|FAILED|ERROR) (?P<nodeid>[^\s\[]+(\[.*?\])?)( - .*)?$",
+)
+
+LINE_KIND_PATTERNS = [
+    ('section', SECTION_DELIMITER.pattern),
+    ('block', BLOCK_DELIMITER.pattern),
+    ('captured_stderr_setup', CAPTURED_STDERR_SETUP.pattern),
+    ('captured_stderr_call', CAPTURED_STDERR_CALL.pattern),
+    # A conftest error is also an error line. Keep it first to tell them apart.
+    ('conftest_error', CONFTEST_ERROR.pattern),
+    ('error', ERROR.pattern),
+    ('fixture_scope_mismatch', FIXTURE_SCOPE_MISMATCH.pattern),
+    ('file_location', FILE_LOCATION.pattern),
+    (
+        'fixture_not_found_file_location',
+        FIXTURE_NOT_FOUND_FILE_LOCATION.pattern,
+    ),
+    # Both are also traceback source code lines. Keep them before it.
+    ('traceback_file_location', TRACEBACK_FILE_LOCATION.pattern),
+    ('fixture_not_found_error', FIXTURE_NOT_FOUND_ERROR.pattern),
+    ('traceback_code', TRACEBACK_CODE.pattern),
+]
+"""
+Patterns of all the *pytest* report lines the parser acts upon, by kind.
+"""
+
+LINE_KINDS = LineClassifier(LINE_KIND_PATTERNS)
+"""
+Classifier of all the *pytest* report lines the parser acts upon.
+"""
+
+RAW_LINE_KINDS = LineClassifier(LINE_KIND_PATTERNS, encoding="utf-8")
+"""
+Same as `LINE_KINDS` for undecoded lines.
+"""
+
+
+def classify_line(line):
+    """
+    Tell which kind of report line a line is in a single regex evaluation.
+
+    :param line: A string to classify.
+
+    :returns: One of `LINE_KINDS.kinds` or `None` if the line is none of them.
+    """
+    return LINE_KINDS.classify(line)
 
 
 def match_fixture_scope_mismatch(line):
@@ -45,7 +156,7 @@ def match_fixture_scope_mismatch(line):
     :returns: A dictionary where the key `error` holds the error description. If
         not matched, the dictionary is empty.
     """
-    return match_pattern(r"ScopeMismatch: (?P<error>.*)$", line).get('error')
+    return match_pattern(FIXTURE_SCOPE_MISMATCH, line).get('error')
 
 
 def match_file_location(line):
@@ -58,7 +169,7 @@ def match_file_location(line):
     :returns: A dictionary where the key `file_path` holds the file path and the
         key `line_no` the line number. If not matched, the dictionary is empty.
     """
-    return match_pattern(r"(?P<file_path>\S+):(?P<line_no>\d+)(:| in)\s.*$", line)
+    return match_pattern(FILE_LOCATION, line)
 
 
 def match_error(line):
@@ -70,7 +181,7 @@ def match_error(line):
     :returns: A dictionary where the key `error` holds the error description. If
         not matched, the dictionary is empty.
     """
-    return match_pattern(r"E\s+(?P<error>.*)$", line).get('error')
+    return match_pattern(ERROR, line).get('error')
 
 
 match_failure = match_error
@@ -89,11 +200,7 @@ def match_conftest_error(line):
         key `error` the error description. If not matched, the dictionary is
         empty.
     """
-    return match_pattern(
-        r"^E\s+.*ConftestImportFailure: "
-        "\(local\('(?P<file_path>.*)'\), \((?P<error>.*)\)\)$",
-        line,
-    )
+    return match_pattern(CONFTEST_ERROR, line)
 
 
 def match_fixture_not_found_file_location(line):
@@ -105,10 +212,7 @@ def match_fixture_not_found_file_location(line):
     :returns: A dictionary where the key `file_path` holds the file path and the
         key `line_no` the line number. If not matched, the dictionary is empty.
     """
-    return match_pattern(
-        r'file (?P<file_path>.*), line (?P<line_no>.*)$',
-        line,
-    )
+    return match_pattern(FIXTURE_NOT_FOUND_FILE_LOCATION, line)
 
 
 def match_fixture_not_found_error(line):
@@ -119,7 +223,32 @@ def match_fixture_not_found_error(line):
 
     :returns: A dictionary where the key `error` holds the error description.
     """
-    return match_pattern(r"^\s+(?P<error>fixture '.*' not found)$", line)
+    return match_pattern(FIXTURE_NOT_FOUND_ERROR, line)
+
+
+def match_failed_test(line):
+    """
+    Extract the node id of the failed test from a line of the short test
+    summary.
+
+    :param line: A string to pattern match against.
+
+    :returns: The test node id (e.g. `tests/test_a.py::TestA::test_a`), the
+        path of the module that failed to be collected or `None` if no test is
+        found.
+    """
+    return match_pattern(SHORT_SUMMARY_TEST, line).get('nodeid')
+
+
+def select_tests(names):
+    """
+    Return the command arguments selecting tests by name.
+
+    :param names: List of node ids as returned by `match_failed_test`.
+
+    :returns: A list of command arguments.
+    """
+    return list(names)
 
 
 def parse_fixture_error(root_dir, lines):
@@ -134,7 +263,6 @@ def parse_fixture_error(root_dir, lines):
     """
     result = []
     file_location = None
-    stderr_call = re.compile("-{2,} Captured stderr setup -{2,}")
 
     lines_ = iter(lines)
     for line in lines_:
@@ -152,10 +280,11 @@ def parse_fixture_error(root_dir, lines):
         error = match_fixture_not_found_error(line)
         if error:
             result.append(
-                make_error_format(
+                Failure(
                     file_location.get('file_path', ""),
                     file_location.get('line_no', ""),
                     error['error'],
+                    (0, len(result) - 1),
                 ),
             )
             break
@@ -169,15 +298,16 @@ def parse_fixture_error(root_dir, lines):
                 if root_dir:
                     file_path = os.path.join(root_dir, file_path)
                 result.append(
-                    make_error_format(
+                    Failure(
                         file_path,
                         location['line_no'],
                         error,
+                        (0, len(result) - 1),
                     ),
                 )
             break
-        if stderr_call.match(line):
-            result.extend(parse_traceback(lines_))
+        if CAPTURED_STDERR_SETUP.match(line):
+            result.extend(parse_traceback(lines_, len(result)))
             break
 
     # Consume left over prior returning
@@ -203,10 +333,11 @@ def parse_conftest_error(lines):
         error = match_conftest_error(line)
         if error:
             result.append(
-                make_error_format(
+                Failure(
                     error.get('file_path', ""),
                     1,
                     error['error'],
+                    (0, len(result) - 1),
                 ),
             )
             break
@@ -230,10 +361,11 @@ def parse_test_error(lines):
         failure = match_error(line)
         if failure and location['file_path']:
             result.append(
-                make_error_format(
+                Failure(
                     location['file_path'],
                     location['line_no'],
                     failure,
+                    (0, len(result) - 1),
                 ),
             )
             break
@@ -253,23 +385,21 @@ def parse_error(root_dir, lines):
 
     :returns: The original lines augmented with an additional error *marker*.
     """
-    FIXTURE_ERROR = re.compile("_{2,} ERROR at setup of .{2,}")
-    CONFTEST_IMPORT_ERROR = re.compile("_{2,} ERROR collecting _{2,}")
-
-    if FIXTURE_ERROR.match(lines[0]):
+    if FIXTURE_ERROR_BLOCK.match(lines[0]):
         result = parse_fixture_error(root_dir, lines)
-    elif CONFTEST_IMPORT_ERROR.match(lines[0]):
+    elif CONFTEST_ERROR_BLOCK.match(lines[0]):
         result = parse_conftest_error(lines)
     else:
         result = parse_test_error(lines)
 
     if len(lines) == len(result):
         result.append(
-            make_error_format(
+            Failure(
                 'Unknown',
                 'Unknown',
                 "An error was found but could not be parsed. This is probably "
                 "a missing error pattern. Please post an issue on GitHub.",
+                (0, len(lines) - 1),
             ),
         )
 
@@ -287,17 +417,17 @@ def parse_failure(lines):
     lines_ = iter(lines)
     result = [next(lines_)]
     location = {'file_path': 'Unknown', 'line_no': 'Unknown'}
-    stderr_call = re.compile("-{2,} Captured stderr call -{2,}")
 
     for line in lines_:
         result.append(line)
         failure = match_failure(line)
         if failure and location['file_path'] != 'Unknown':
             result.append(
-                make_error_format(
+                Failure(
                     location['file_path'],
                     location['line_no'],
                     failure,
+                    (0, len(result) - 1),
                 ),
             )
             break
@@ -308,19 +438,21 @@ def parse_failure(lines):
 
     for line in lines_:
         result.append(line)
-        if stderr_call.match(line):
-            result.extend(parse_traceback(lines_))
+        if CAPTURED_STDERR_CALL.match(line):
+            # The failure marker is not an output line.
+            result.extend(parse_traceback(lines_, len(result) - 1))
             break
 
     result.extend(lines_)
     if len(lines) == len(result):
         # Nothing was found! This is probably because of
         result.append(
-            make_error_format(
+            Failure(
                 location['file_path'],
                 location['line_no'],
                 "An error was found but could not be parsed. This is probably "
                 "a missing error pattern. Please post an issue on GitHub.",
+                (0, len(lines) - 1),
             ),
         )
 
@@ -358,12 +490,38 @@ def parse_session_failure(lines):
     return list(
         chain(
             chain(*tracebacks[:-1]),
-            parse_traceback(last_traceback),
+            parse_traceback(
+                last_traceback,
+                sum(len(traceback) for traceback in tracebacks[:-1]),
+            ),
             last_traceback,  # Note: `parse_traceback` may have not fully consumed the iterator
         ),
     )
 
 
+def iter_groups(lines, delimiter, start=0):
+    """
+    Iterate on the groups of a list of lines without copying them. The list is
+    split at line matching the `delimiter` pattern.
+
+    :param lines: Lines of string.
+    :param delimiter: Regex matching the delimiting line pattern.
+    :param start: Index of the first line grouped. Preceding lines are
+        skipped.
+
+    :returns: A generator on the `(start, end)` indexes of each group in
+        `lines`, `end` excluded.
+    """
+    delimiter_ = compile_pattern(delimiter)
+    first = start
+    for index in range(start + 1, len(lines)):
+        if delimiter_.match(lines[index]):
+            yield first, index
+            first = index
+    if first < len(lines):
+        yield first, len(lines)
+
+
 def group_lines(lines, delimiter):
     """
     Group a list of lines into sub-lists. The list is split at line matching the
@@ -374,17 +532,34 @@ def group_lines(lines, delimiter):
 
     :returns: A list of lists.
     """
-    if not lines:
-        return []
-    lines_ = iter(lines)
-    delimiter_ = re.compile(delimiter)
-    result = []
-    result.append([next(lines_)])
-    for line in lines_:
-        if delimiter_.match(line):
-            result.append([])
-        result[-1].append(line)
-    return result
+    return [lines[start:end] for start, end in iter_groups(lines, delimiter)]
+
+
+SECTION_TYPES = {
+    'session': compile_pattern(r"={2,} test session starts ={2,}"),
+    'errors': compile_pattern(r"={2,} ERRORS ={2,}"),
+    'failures': compile_pattern(r"={2,} FAILURES ={2,}"),
+    'summary': compile_pattern(r"={2,} .* failed in .* seconds ={2,}"),
+}
+"""
+Patterns matching the first line of the pytest report sections this plugin
+parses.
+"""
+
+
+def get_section_type(line):
+    """
+    Return the type of the section starting at `line`.
+
+    :param line: A section delimiting line.
+
+    :returns: A key of `SECTION_TYPES` or `None` if the section is not one this
+        plugin parses.
+    """
+    for section_type, regex in SECTION_TYPES.items():
+        if regex.match(line):
+            return section_type
+    return None
 
 
 def parse_sections(lines):
@@ -397,18 +572,12 @@ def parse_sections(lines):
     :returns: A dictionary where keys are section names and values are the
         grouped line for the section.
     """
-    section_types = {
-        'session': re.compile(r"={2,} test session starts ={2,}"),
-        'errors': re.compile(r"={2,} ERRORS ={2,}"),
-        'failures': re.compile(r"={2,} FAILURES ={2,}"),
-        'summary': re.compile(r"={2,} .* failed in .* seconds ={2,}"),
-    }
     sections = {}
-    for lines in group_lines(lines, r"={2,} .* ={2,}"):
-        for section_type, regex in section_types.items():
-            if regex.match(lines[0]):
-                sections[section_type] = lines
-                break
+    for start, end in iter_groups(lines, SECTION_DELIMITER.pattern):
+        # Only the sections this plugin parses are copied.
+        section_type = get_section_type(lines[start])
+        if section_type:
+            sections[section_type] = lines[start:end]
     return sections
 
 
@@ -422,9 +591,9 @@ def parse_errors(root_dir, lines):
     :returns: The original input list augmented with special markers where
         errors were found
     """
-    result = [lines.pop(0)]
-    for error in group_lines(lines, r"_{2,} (?<!Captured stder call).* _{2,}"):
-        result.extend(parse_error(root_dir, error))
+    result = lines[:1]
+    for start, end in iter_groups(lines, BLOCK_DELIMITER.pattern, 1):
+        result.extend(parse_error(root_dir, lines[start:end]))
     return result
 
 
@@ -439,9 +608,9 @@ def parse_failures(lines):
     :returns: The original input list augmented with special markers where
         errors were found
     """
-    result = [lines.pop(0)]
-    for failure in group_lines(lines, r"_{2,} (?<!Captured stder call).* _{2,}"):
-        result.extend(parse_failure(failure))
+    result = lines[:1]
+    for start, end in iter_groups(lines, BLOCK_DELIMITER.pattern, 1):
+        result.extend(parse_failure(lines[start:end]))
     return result
 
 
@@ -455,20 +624,20 @@ def parse_session(lines):
 
     :returns: The test session root path.
     """
-    session = re.compile(r"={2,} test session starts ={2,}")
-
-    if not session.match(lines[0]):
+    if not SECTION_TYPES['session'].match(lines[0]):
         return None
 
-    m = re.match(r"rootdir: (?P<root>.*), inifile: (?P<ini>.*)$", lines[2])
+    m = ROOT_DIR.match(lines[2])
     if not m:
         return None
     return m.group('root')
 
 
-def parse(lines):
+def parse_by_sections(lines):
     """
-    Parse the pytest report.
+    Parse the pytest report by grouping its lines per section and block first.
+
+    This is the reference implementation `parse` must stay equivalent to.
 
     :param lines: List of lines from the pytest report
 
@@ -496,3 +665,358 @@ def parse(lines):
         result.extend(sections['summary'])
 
     return result
+
+
+class ReportParser(object):
+
+    """
+    Single pass finite state parser of a *pytest* report.
+
+    Each line is classified once with `LINE_KINDS` and fed to the handler of the
+    current parsing phase. It produces the same output as `parse_by_sections`
+    except that sections are output in the order they are found in the report.
+    """
+
+    UNKNOWN_ERROR = (
+        "An error was found but could not be parsed. This is probably a "
+        "missing error pattern. Please post an issue on GitHub."
+    )
+
+    def __init__(self, failed=None):
+        """
+        :param failed: Optional list the node ids of the tests reported by the
+            short test summary are appended to.
+        """
+        self.failed = failed
+        self.failed_names = set()
+        # Whether the current section is the short test summary. It is not
+        # output.
+        self.summary = False
+        # Number of lines fed. Spans of the failures are counted with it.
+        self.count = 0
+        # Lines preceding the session. Only parsed if the session never starts.
+        self.preamble = []
+        self.started = False
+        # Type of the current section. `None` if the section is not parsed.
+        self.section = None
+        self.session = []
+        self.root_dir = None
+        # Current error or failure block state.
+        self.block = None
+        # Index of the current block first line.
+        self.start = None
+        self.phase = None
+        self.location = None
+        self.traceback_location = None
+        self.scope_mismatch = None
+        self.marked = False
+
+    def feed(self, line):
+        """
+        Parse the next report line.
+
+        :param line: A report line.
+
+        :returns: A list of lines to output. It holds the input line followed by
+            an error marker if one was found.
+        """
+        self.count += 1
+        return self._feed(line, LINE_KINDS.classify(line))
+
+    def _feed(self, line, kind):
+        output = []
+
+        if kind == 'section':
+            section = get_section_type(line)
+            if not self.started and section != 'session':
+                self.preamble.append(line)
+                return output
+            self.started = True
+            self.summary = SHORT_SUMMARY.match(line) is not None
+            self._close_block(output, self.count - 2)
+            self.section = section
+            if section == 'session':
+                self.session = [line]
+            if section:
+                output.append(line)
+            return output
+
+        if not self.started:
+            self.preamble.append(line)
+        elif self.section == 'session':
+            # The root dir is reported on the session third line
+            self.session.append(line)
+            if len(self.session) == 3:
+                self.root_dir = parse_session(self.session)
+            output.append(line)
+        elif self.section == 'summary':
+            output.append(line)
+        elif self.summary:
+            self._match_failed(line)
+        elif self.section in ('errors', 'failures'):
+            if self.block is None or kind == 'block':
+                self._close_block(output, self.count - 2)
+                self._open_block(line, output)
+            else:
+                output.append(line)
+                getattr(self, '_' + self.phase)(line, kind, output)
+        return output
+
+    def feed_raw(self, line):
+        """
+        Parse the next report line before it is decoded. Most lines of a report
+        are only output as they are: they are classified as bytes and returned
+        undecoded. Only the lines the parser has to look at are decoded.
+
+        :param line: A report line as a bytes-like object (e.g. a
+            `memoryview`).
+
+        :returns: A list of lines to output. Lines output as they are keep
+            their type. Other lines are strings.
+        """
+        self.count += 1
+        kind = RAW_LINE_KINDS.classify(line)
+        if kind is not None:
+            # Kinds are told apart by ASCII markers: the kind found on bytes holds.
+            return self._feed(decode(line), kind)
+        if self.started:
+            if self.section is None:
+                if self.summary:
+                    self._match_failed(decode(line))
+                return []
+            if self.section == 'summary':
+                return [line]
+            if self.section in ('errors', 'failures') and \
+                    self.block is not None:
+                if self.phase == 'scope_mismatch':
+                    # Any line ends the search of the fixture location.
+                    self.phase = 'rest'
+                    return [line]
+                if self.phase != 'traceback' or not self.traceback_location:
+                    return [line]
+        line = decode(line)
+        return self._feed(line, LINE_KINDS.classify(line))
+
+    def close(self):
+        """
+        Signal the end of the report.
+
+        :returns: A list of the lines left to output.
+        """
+        if not self.started:
+            return parse_session_failure(self.preamble)
+        output = []
+        self._close_block(output, self.count - 1)
+        return output
+
+    def _mark(self, output, file_path, line_no, error, end=None):
+        # The failure spans its block up to the current line or `end`.
+        output.append(
+            Failure(
+                file_path,
+                line_no,
+                error,
+                (self.start, self.count - 1 if end is None else end),
+            ),
+        )
+        self.marked = True
+
+    def _match_failed(self, line):
+        if self.failed is None:
+            return
+        name = match_failed_test(line)
+        # A test can both fail and error out (e.g. in teardown).
+        if name and name not in self.failed_names:
+            self.failed_names.add(name)
+            self.failed.append(name)
+
+    def _open_block(self, line, output):
+        self.marked = False
+        self.start = self.count - 1
+        self.traceback_location = None
+        self.scope_mismatch = None
+        self.phase = 'search'
+        output.append(line)
+        if self.section == 'failures':
+            # The failure block header is never parsed
+            self.block = 'failure'
+            self.location = {'file_path': 'Unknown', 'line_no': 'Unknown'}
+            return
+        if FIXTURE_ERROR_BLOCK.match(line):
+            self.block = 'fixture_error'
+            self.location = {}
+        elif CONFTEST_ERROR_BLOCK.match(line):
+            self.block = 'conftest_error'
+        else:
+            self.block = 'test_error'
+            self.location = {'file_path': '', 'line_no': 1}
+        self._search(line, LINE_KINDS.classify(line), output)
+
+    def _close_block(self, output, end):
+        if self.block is None:
+            return
+        if not self.marked:
+            if self.block == 'failure':
+                self._mark(
+                    output,
+                    self.location['file_path'],
+                    self.location['line_no'],
+                    self.UNKNOWN_ERROR,
+                    end,
+                )
+            else:
+                self._mark(
+                    output,
+                    'Unknown',
+                    'Unknown',
+                    self.UNKNOWN_ERROR,
+                    end,
+                )
+        self.block = None
+
+    def _search(self, line, kind, output):
+        # Look for the block error description and location.
+        if self.block == 'fixture_error':
+            if kind == 'fixture_not_found_file_location':
+                self.location = FIXTURE_NOT_FOUND_FILE_LOCATION.match(
+                    line,
+                ).groupdict()
+            elif kind == 'file_location':
+                self.location = FILE_LOCATION.match(line).groupdict()
+            elif kind == 'fixture_not_found_error':
+                self._mark(
+                    output,
+                    self.location.get('file_path', ""),
+                    self.location.get('line_no', ""),
+                    FIXTURE_NOT_FOUND_ERROR.match(line).group('error'),
+                )
+                self.phase = 'rest'
+            elif kind == 'fixture_scope_mismatch':
+                self.scope_mismatch = FIXTURE_SCOPE_MISMATCH.match(
+                    line,
+                ).group('error')
+                self.phase = 'scope_mismatch'
+            elif kind == 'captured_stderr_setup':
+                self.phase = 'traceback'
+        elif self.block == 'conftest_error':
+            if kind == 'conftest_error':
+                error = CONFTEST_ERROR.match(line)
+                self._mark(
+                    output,
+                    error.group('file_path'),
+                    1,
+                    error.group('error'),
+                )
+                self.phase = 'rest'
+        else:
+            error = None
+            if kind in ('error', 'conftest_error'):
+                error = ERROR.match(line).group('error')
+            if self.block == 'failure':
+                located = self.location['file_path'] != 'Unknown'
+            else:
+                located = bool(self.location['file_path'])
+            if error and located:
+                self._mark(
+                    output,
+                    self.location['file_path'],
+                    self.location['line_no'],
+                    error,
+                )
+                self.phase = 'stderr' if self.block == 'failure' else 'rest'
+            elif kind == 'file_location':
+                self.location = FILE_LOCATION.match(line).groupdict()
+
+    def _scope_mismatch(self, line, kind, output):
+        # The fixture location follows the `ScopeMismatch` description.
+        if kind == 'file_location':
+            location = FILE_LOCATION.match(line).groupdict()
+            file_path = location['file_path']
+            if self.root_dir:
+                file_path = os.path.join(self.root_dir, file_path)
+            self._mark(
+                output,
+                file_path,
+                location['line_no'],
+                self.scope_mismatch,
+            )
+        self.phase = 'rest'
+
+    def _stderr(self, line, kind, output):
+        # Look for the captured standard error of a failed test.
+        if kind == 'captured_stderr_call':
+            self.phase = 'traceback'
+
+    def _traceback(self, line, kind, output):
+        # Same as `runners.python.parse_traceback`.
+        if kind == 'traceback_file_location':
+            self.traceback_location = TRACEBACK_FILE_LOCATION.match(
+                line,
+            ).groupdict()
+        elif kind in ('traceback_code', 'fixture_not_found_error'):
+            pass
+        elif self.traceback_location:
+            self._mark(
+                output,
+                self.traceback_location['file_path'],
+                self.traceback_location['line_no'],
+                line,
+            )
+            self.phase = 'rest'
+
+    def _rest(self, line, kind, output):
+        pass
+
+
+def iter_parse(lines, failed=None):
+    """
+    Parse the pytest report as it is produced.
+
+    Lines are yielded as soon as they are read, followed by an error marker when
+    one is found. Failures that could not be parsed are only reported once their
+    block ends. Sections are yielded in the order they are found in the report.
+
+    :param lines: An iterable on the pytest report lines.
+    :param failed: Optional list the names of the failed tests are appended to.
+
+    :returns: A generator on the input lines augmented with special error
+        markers the *Vim* plugin will understand through a custom `errorformat`
+        setting.
+    """
+    parser = ReportParser(failed)
+    for line in lines:
+        for line_ in parser.feed(line):
+            yield line_
+    for line in parser.close():
+        yield line
+
+
+def iter_parse_raw(lines, failed=None):
+    """
+    Same as `iter_parse` for undecoded lines. Lines output as they are are not
+    decoded. See `ReportParser.feed_raw`.
+
+    :param lines: An iterable on the pytest report lines as bytes-like objects.
+    :param failed: Optional list the names of the failed tests are appended to.
+
+    :returns: A generator on the input lines, as bytes-like objects or strings,
+        augmented with special error markers.
+    """
+    parser = ReportParser(failed)
+    for line in lines:
+        for line_ in parser.feed_raw(line):
+            yield line_
+    for line in parser.close():
+        yield line
+
+
+def parse(lines):
+    """
+    Parse the pytest report.
+
+    :param lines: List of lines from the pytest report
+
+    :returns: The input lines augmented with special error markers the *Vim*
+        plugin will understand through a custom `errorformat` setting.
+    """
+    return list(iter_parse(lines))
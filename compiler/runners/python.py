@@ -9,13 +9,17 @@ understand.
 
 from __future__ import print_function
 
-import re
-
 from . import (
-    make_error_format,
+    Failure,
+    compile_pattern,
     match_pattern,
 )
 
+FILE_LOCATION = compile_pattern(
+    r'\s+File "(?P<file_path>.*)", line (?P<line_no>.*), in .*$',
+)
+CODE = compile_pattern(r"\s+.*")
+
 
 def match_file_location(line):
     """
@@ -26,10 +30,7 @@ def match_file_location(line):
     :returns: A dictionary where the key `file_path` holds the file path and the
         key `line_no` the line number. If not matched, the dictionary is empty.
     """
-    return match_pattern(
-        r'\s+File "(?P<file_path>.*)", line (?P<line_no>.*), in .*$',
-        line,
-    )
+    return match_pattern(FILE_LOCATION, line)
 
 
 def match_code_pattern(line):
@@ -40,17 +41,18 @@ def match_code_pattern(line):
 
     :returns: `True` if the line match the source code pattern.
     """
-    return re.compile(r"\s+.*").match(line) is not None
+    return CODE.match(line) is not None
 
 
-def parse_traceback(lines):
+def parse_traceback(lines, start=0):
     """
     Parse a standard *Python* traceback.
 
     :param lines: An iterator on a list of strings to pattern match against.
+    :param start: Index of the first line of `lines` in the parsed output. The
+        span of the failure is counted from it.
 
-    :returns: A list of line where the last one is the added *error format*
-        string.
+    :returns: A list of line where the last one is the added `Failure`.
     """
     file_location = None
     result = []
@@ -67,10 +69,11 @@ def parse_traceback(lines):
             # source code pattern. *That* list line holds the error description.
             if file_location:
                 result.append(
-                    make_error_format(
+                    Failure(
                         file_location['file_path'],
                         file_location['line_no'],
                         line,
+                        (start, start + len(result) - 1),
                     ),
                 )
                 break
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+
+"""
+Parse a *pytest* report log and output a formatted line this plugin understand
+for each failed test.
+
+A report log holds one JSON serialized test or collect report per line. It is
+written while tests run by the `python_tests_runner_reportlog` plugin (see
+`plugins/python_tests_runner_reportlog.py`) or by the `pytest-reportlog`
+plugin. Locations are read from the reports instead of being scraped from the
+terminal output.
+"""
+
+from __future__ import print_function
+
+import json
+
+from . import Failure
+from .pytest import FILE_LOCATION
+
+REPORT_TYPES = ("TestReport", "CollectReport")
+"""
+Types of the reports holding a test outcome.
+"""
+
+
+def get_failed_test(report):
+    """
+    Return the node id of a failed test, as `runners.pytest.match_failed_test`
+    does, so it can be selected again.
+
+    :param report: A deserialized report.
+
+    :returns: The test node id or the path of the module that failed to be
+        collected.
+    """
+    return report['nodeid']
+
+
+def get_message(longrepr):
+    """
+    Return the error message of a failure representation.
+
+    :param longrepr: The `longrepr` of a deserialized report.
+
+    :returns: A string.
+    """
+    if isinstance(longrepr, dict):
+        crash = longrepr.get('reprcrash') or {}
+        message = crash.get('message') or ""
+        return message.splitlines()[0] if message else ""
+    if not longrepr:
+        return ""
+    lines = [line.strip() for line in str(longrepr).splitlines()]
+    errors = [line[1:].strip() for line in lines if line.startswith("E ")]
+    if errors:
+        return errors[-1]
+    lines = [line for line in lines if line]
+    return lines[-1] if lines else ""
+
+
+def get_location(report):
+    """
+    Return the location of a failure. It is the last traceback entry if any,
+    otherwise the test location.
+
+    :param report: A deserialized report.
+
+    :returns: A `(file_path, line_no)` tuple or `None` if the failure has no
+        location.
+    """
+    longrepr = report.get('longrepr')
+    if isinstance(longrepr, dict):
+        entries = (longrepr.get('reprtraceback') or {}).get('reprentries', [])
+        for entry in reversed(entries):
+            location = (entry.get('data') or {}).get('reprfileloc')
+            if location:
+                return location['path'], location['lineno']
+    elif longrepr:
+        # Collect errors only have a textual representation.
+        for line in reversed(str(longrepr).splitlines()):
+            match = FILE_LOCATION.match(line)
+            if match:
+                return match.group('file_path'), match.group('line_no')
+    location = report.get('location')
+    if location and location[1] is not None:
+        # Report locations line numbers are 0-based.
+        return location[0], location[1] + 1
+    if isinstance(longrepr, dict):
+        crash = longrepr.get('reprcrash') or {}
+        if crash.get('path'):
+            return crash['path'], crash['lineno']
+    return None
+
+
+def parse_report(report):
+    """
+    Parse a deserialized report.
+
+    :param report: A deserialized report.
+
+    :returns: The `Failure` of the report or `None` if the report is not a
+        failure. A failure without location is reported at an `Unknown`
+        location, as the output parser does.
+    """
+    if report.get('$report_type') not in REPORT_TYPES:
+        return None
+    if report.get('outcome') != 'failed':
+        return None
+    location = get_location(report) or ('Unknown', 'Unknown')
+    return Failure(
+        location[0],
+        location[1],
+        get_message(report.get('longrepr')) or report.get('nodeid', ""),
+    )
+
+
+class ReportParser(object):
+
+    """
+    Incremental parser of a report log. Data is fed as it is written to the
+    report log file, possibly ending in the middle of a line.
+    """
+
+    def __init__(self, failed=None):
+        """
+        :param failed: Optional list the names of the failed tests are appended
+            to.
+        """
+        self.failed = failed
+        self.pending = b""
+
+    def feed(self, data):
+        """
+        Parse the next chunk of the report log.
+
+        :param data: A byte string.
+
+        :returns: A list of `Failure` records.
+        """
+        lines = (self.pending + data).split(b"\n")
+        self.pending = lines.pop()
+        output = []
+        for line in lines:
+            self._parse_line(line, output)
+        return output
+
+    def close(self):
+        """
+        Parse the end of the report log.
+
+        :returns: A list of `Failure` records.
+        """
+        output = []
+        self._parse_line(self.pending, output)
+        self.pending = b""
+        return output
+
+    def _parse_line(self, line, output):
+        line = line.strip()
+        if not line:
+            return
+        report = json.loads(line.decode("utf-8"))
+        error = parse_report(report)
+        if error is None:
+            return
+        if self.failed is not None:
+            name = get_failed_test(report)
+            # A test can both fail and error out (e.g. in teardown).
+            if self.failed[-1:] != [name]:
+                self.failed.append(name)
+        output.append(error)
+
+
+def iter_parse(stream, failed=None, size=64 * 1024):
+    """
+    Parse a report log.
+
+    :param stream: A file object opened in binary mode on the report log.
+    :param failed: Optional list the names of the failed tests are appended to.
+    :param size: Size of the chunks read from `stream`.
+
+    :returns: A generator on `Failure` records.
+    """
+    parser = ReportParser(failed)
+    for data in iter(lambda: stream.read(size), b""):
+        for line in parser.feed(data):
+            yield line
+    for line in parser.close():
+        yield line
@@ -0,0 +1,379 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""
+Benchmark the output parsers on synthetic runner outputs.
+
+The *pytest* output mixes test failures with captured stderr tracebacks,
+fixture not found errors, `ScopeMismatch` errors, captured stderr setup
+tracebacks and conftest import failures. The *nose* output mixes failures and
+errors. Each parser is timed on outputs of 1k, 10k and 100k failures and its
+throughput (lines/sec) and peak memory are reported.
+
+Usage (from the `compiler` folder)::
+
+    python -m tests.benchmark
+    python -m tests.benchmark --sizes 1000,10000 --parsers pytest --json
+
+Peak memory is measured with `tracemalloc` (python 3.4+) in a separate run so
+it does not slow down the timed one.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import sys
+import time
+
+from runners import nose, pytest, python
+
+try:
+    import tracemalloc
+except ImportError:  # python 2
+    tracemalloc = None
+
+try:
+    clock = time.perf_counter
+except AttributeError:  # python 2
+    clock = time.time
+
+SIZES = [1000, 10000, 100000]
+"""
+Default numbers of failures of the generated outputs.
+"""
+
+
+def generate_pytest_output(failures):
+    """
+    Generate a `py.test --tb=short` output.
+
+    :param failures: Number of failures and errors reported.
+
+    :returns: A list of lines.
+    """
+    errors = []
+    tests = []
+    for i in range(failures):
+        kind = i % 5
+        if kind == 0:
+            errors.extend([
+                "___ ERROR at setup of TestCase{i}.test_{i} ___".format(i=i),
+                "file /project/tests/test_{i}.py, line {i}".format(i=i),
+                "      def test_{i}(".format(i=i),
+                "        fixture 'fixture_{i}' not found".format(i=i),
+                "        available fixtures: pytestconfig, capfd, capsys",
+            ])
+        elif kind == 1:
+            errors.extend([
+                "___ ERROR at setup of test_scope_{i} ___".format(i=i),
+                "ScopeMismatch: You tried to access the 'function' scoped "
+                "fixture 'function_{i}' with a 'session' scoped request "
+                "object, involved factories".format(i=i),
+                "tests/conftest.py:{i}:  def session_{i}(function_{i})".format(
+                    i=i,
+                ),
+            ])
+        elif kind == 2:
+            errors.extend([
+                "___ ERROR at setup of test_stderr_{i} ___".format(i=i),
+                "--- Captured stderr setup ---",
+                "Traceback (most recent call last):",
+                '  File "/project/tests/conftest.py", line {i}, in '
+                'fixture'.format(i=i),
+                "    raise ValueError()",
+                "ValueError",
+            ])
+        elif kind == 3:
+            errors.extend([
+                "___ ERROR collecting ___",
+                "E   _pytest.config.ConftestImportFailure: "
+                "(local('/project/tests/conftest_{i}.py'), "
+                "(<class 'ImportError'>,))".format(i=i),
+            ])
+        else:
+            tests.extend([
+                "___ TestCase{i}.test_{i} ___".format(i=i),
+                "",
+                "    def test_{i}(self):".format(i=i),
+                ">       self.assertEqual(response.code, 200)",
+                "",
+                "tests/test_{i}.py:{i}: in test_{i}".format(i=i),
+                "    self.assertEqual(response.code, 200)",
+                "E   AssertionError: 500 != 200",
+                "--- Captured stderr call ---",
+                "Traceback (most recent call last):",
+                '  File "/venv/lib/site-packages/tornado/web.py", line 1332, '
+                'in _execute',
+                "    result = method(*self.path_args, **self.path_kwargs)",
+                '  File "/project/application/dal.py", line {i}, in '
+                'create_user'.format(i=i),
+                "    blarg",
+                "NameError: name 'blarg' is not defined",
+            ])
+    return [
+        "=================== test session starts ===================",
+        "platform linux -- Python 3.4.2 -- py-1.4.30 -- pytest-2.7.2",
+        "rootdir: /project, inifile: setup.cfg",
+        "collected {n} items / {n} errors".format(n=failures),
+        "",
+        "=================== ERRORS ===================",
+    ] + errors + [
+        "=================== FAILURES ===================",
+    ] + tests + [
+        "=================== {n} failed in 0.21 seconds ===================".
+        format(n=failures),
+    ]
+
+
+def generate_traceback(i):
+    """
+    Generate a standard python traceback.
+
+    :param i: Index used to make the traceback unique.
+
+    :returns: A list of lines.
+    """
+    return [
+        "Traceback (most recent call last):",
+        '  File "/venv/lib/site-packages/nose/case.py", line 198, in runTest',
+        "    self.test(*self.arg)",
+        '  File "/project/tests/test_{i}.py", line {i}, in test_{i}'.format(
+            i=i,
+        ),
+        "    assert False",
+        "AssertionError",
+    ]
+
+
+def generate_nose_output(failures):
+    """
+    Generate a `nosetests` output.
+
+    :param failures: Number of failures and errors reported.
+
+    :returns: A list of lines.
+    """
+    lines = ["F" * failures]
+    for i in range(failures):
+        if i % 2:
+            title = "FAIL: test_{i} (project.tests.test_{i}.TestCase)".format(
+                i=i,
+            )
+        else:
+            title = "ERROR: project.tests.test_{i}.test_{i}".format(i=i)
+        lines.extend([
+            "=" * 70,
+            title,
+            "-" * 70,
+        ])
+        lines.extend(generate_traceback(i))
+        lines.extend([
+            "-------------------- >> begin captured logging << -----------",
+            "tornado.access: INFO: 200 PUT /private/reset_db 2.43ms",
+            "--------------------- >> end captured logging << ------------",
+            "",
+        ])
+    lines.extend([
+        "-" * 70,
+        "Ran {n} tests in 1.684s".format(n=failures),
+        "",
+        "FAILED (failures={n})".format(n=failures),
+    ])
+    return lines
+
+
+def generate_tracebacks(failures):
+    """
+    Generate python tracebacks one after the other.
+
+    :param failures: Number of tracebacks.
+
+    :returns: A list of lines.
+    """
+    lines = []
+    for i in range(failures):
+        lines.extend(generate_traceback(i))
+    return lines
+
+
+def parse_tracebacks(lines):
+    """
+    Parse tracebacks one after the other with `runners.python.parse_traceback`.
+
+    :param lines: An iterable on the tracebacks lines.
+
+    :returns: A list of the parsed lines.
+    """
+    lines = iter(lines)
+    result = []
+    while True:
+        parsed = python.parse_traceback(lines)
+        if not parsed:
+            return result
+        result.extend(parsed)
+
+
+def generate_raw_pytest_output(failures):
+    """
+    Generate a `py.test --tb=short` output of undecoded lines, as read by
+    `run.py`.
+
+    :param failures: Number of failures and errors reported.
+
+    :returns: A list of `memoryview` objects.
+    """
+    return [
+        memoryview(line.encode("utf-8"))
+        for line in generate_pytest_output(failures)
+    ]
+
+
+def parse_raw_pytest_output(lines):
+    """
+    Parse undecoded lines with `runners.pytest.iter_parse_raw`.
+
+    :param lines: An iterable on undecoded lines.
+
+    :returns: A list of the parsed lines.
+    """
+    return list(pytest.iter_parse_raw(lines))
+
+
+PARSERS = {
+    'pytest': (generate_pytest_output, pytest.parse),
+    'pytest-raw': (generate_raw_pytest_output, parse_raw_pytest_output),
+    'nose': (generate_nose_output, nose.parse),
+    'python': (generate_tracebacks, parse_tracebacks),
+}
+"""
+Benchmarked parsers indexed by name. Values are `(generate, parse)` tuples.
+"""
+
+
+def measure(parse, lines, repeat=3):
+    """
+    Measure a parser.
+
+    :param parse: The parse function.
+    :param lines: The list of lines to parse.
+    :param repeat: Number of timed runs. The fastest one is kept.
+
+    :returns: A `(seconds, peak)` tuple where `peak` is the peak memory
+        allocated while parsing, in bytes, or `None` if it cannot be measured.
+    """
+    seconds = None
+    for _ in range(repeat):
+        start = clock()
+        parse(lines)
+        elapsed = clock() - start
+        if seconds is None or elapsed < seconds:
+            seconds = elapsed
+
+    peak = None
+    if tracemalloc is not None:
+        tracemalloc.start()
+        try:
+            parse(lines)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return seconds, peak
+
+
+def run_benchmark(parsers, sizes, repeat=3):
+    """
+    Benchmark parsers on generated outputs of each size.
+
+    :param parsers: List of the names of the parsers to benchmark.
+    :param sizes: List of numbers of failures of the generated outputs.
+    :param repeat: Number of timed runs per parser and size.
+
+    :returns: A list of dictionaries, one per parser and size, with the keys
+        `parser`, `failures`, `lines`, `seconds`, `lines_per_second` and
+        `peak_bytes`.
+    """
+    results = []
+    for name in parsers:
+        generate, parse = PARSERS[name]
+        for size in sizes:
+            lines = generate(size)
+            seconds, peak = measure(parse, lines, repeat)
+            results.append({
+                'parser': name,
+                'failures': size,
+                'lines': len(lines),
+                'seconds': seconds,
+                'lines_per_second': len(lines) / seconds if seconds else None,
+                'peak_bytes': peak,
+            })
+    return results
+
+
+def format_results(results):
+    """
+    Format benchmark results as a table.
+
+    :param results: List of results returned by `run_benchmark`.
+
+    :returns: A list of lines.
+    """
+    row = "{:<8} {:>9} {:>9} {:>10} {:>12} {:>10}"
+    lines = [row.format(
+        "parser", "failures", "lines", "seconds", "lines/sec", "peak MiB",
+    )]
+    for result in results:
+        peak = result['peak_bytes']
+        lines.append(row.format(
+            result['parser'],
+            result['failures'],
+            result['lines'],
+            "{:.4f}".format(result['seconds']),
+            "{:.0f}".format(result['lines_per_second'] or 0),
+            "-" if peak is None else "{:.2f}".format(peak / 1024.0 / 1024.0),
+        ))
+    return lines
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the output parsers on synthetic outputs.",
+    )
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in SIZES),
+        help="comma separated numbers of failures (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--parsers",
+        default=",".join(sorted(PARSERS)),
+        help="comma separated parser names (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="timed runs per measure, the fastest is kept "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="print results as JSON to compare runs",
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(
+        args.parsers.split(","),
+        [int(size) for size in args.sizes.split(",")],
+        args.repeat,
+    )
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for line in format_results(results):
+            print(line)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import unittest
+
+from runners import Failure
+from tests.benchmark import (
+    PARSERS,
+    format_results,
+    run_benchmark,
+)
+
+
+class TestBenchmark(unittest.TestCase):
+
+    """Smoke test case for tests/benchmark.py module"""
+
+    def test_generated_outputs_are_parsed(self):
+        # One error per failure plus the captured stderr traceback of the
+        # pytest test failures (one failure out of five).
+        expected = {'pytest': 12, 'pytest-raw': 12, 'nose': 10, 'python': 10}
+        for name, (generate, parse) in PARSERS.items():
+            result = parse(generate(10))
+            self.assertEqual(
+                len([line for line in result if isinstance(line, Failure)]),
+                expected[name],
+            )
+
+    def test_run_benchmark(self):
+        results = run_benchmark(sorted(PARSERS), [10], repeat=1)
+        self.assertEqual(
+            [result['parser'] for result in results],
+            ["nose", "pytest", "pytest-raw", "python"],
+        )
+        for result in results:
+            self.assertEqual(result['failures'], 10)
+            self.assertGreater(result['lines'], 10)
+        self.assertEqual(len(format_results(results)), 5)
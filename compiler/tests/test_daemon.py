@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import os
+import shutil
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+import daemon
+from run import read_lines
+
+
+class TestDaemon(unittest.TestCase):
+
+    """Test case for daemon.py module"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.project = tempfile.mkdtemp()
+        os.chdir(self.project)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.project)
+
+    def test_get_socket_path(self):
+        self.assertNotEqual(
+            daemon.get_socket_path("pytest"),
+            daemon.get_socket_path("nose"),
+        )
+        path = daemon.get_socket_path("pytest")
+        os.chdir(self.cwd)
+        self.assertNotEqual(daemon.get_socket_path("pytest"), path)
+
+    @unittest.skipUnless(daemon.is_supported(), "requires fork")
+    def test_check_private_directory(self):
+        path = os.path.join(self.project, "sockets")
+        daemon.check_private_directory(path)
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o700)
+        daemon.check_private_directory(path)
+        os.chmod(path, 0o755)
+        with self.assertRaises(SystemExit):
+            daemon.check_private_directory(path)
+        link = os.path.join(self.project, "link")
+        os.mkdir(os.path.join(self.project, "target"), 0o700)
+        os.symlink(os.path.join(self.project, "target"), link)
+        with self.assertRaises(SystemExit):
+            daemon.check_private_directory(link)
+
+    @unittest.skipUnless(daemon.is_supported(), "requires fork")
+    def test_request(self):
+        with open("test_one.py", "w") as f:
+            f.write("def test_one():\n    assert False\n")
+        path = daemon.get_socket_path("pytest")
+        server = subprocess.Popen(
+            [sys.executable, daemon.__file__, "pytest", path],
+        )
+        try:
+            while not os.path.exists(path):
+                time.sleep(0.01)
+            # A client which never sends its run does not hold up the others.
+            idle = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            idle.connect(path)
+            for run in range(2):
+                client = daemon.request("pytest", ["test_one.py"])
+                with client.makefile("rb") as output:
+                    child = daemon.read_child(output)
+                    lines = list(read_lines(output))
+                self.assertIsInstance(child.pid, int)
+                client.close()
+                self.assertIn("test_one.py:2: in test_one", lines)
+            idle.close()
+        finally:
+            server.terminate()
+            server.wait()
+            os.remove(path)
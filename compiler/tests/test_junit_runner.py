@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from runners import Failure
+from runners.junit import (
+    FailureText,
+    MAX_LINE_LENGTH,
+    ReportParser,
+    TEXT_BUFFER_SIZE,
+    get_failed_test,
+    iter_parse,
+)
+
+PYTEST_REPORT = b"""<?xml version="1.0" encoding="utf-8"?>
+<testsuites><testsuite name="pytest" errors="3" failures="1" tests="5">
+<testcase classname="" name="tests.test_import" time="0.000">
+<error message="collection failure">ImportError while importing test module.
+Traceback:
+tests/test_import.py:1: in &lt;module&gt;
+    import unknown
+E   ImportError: No module named 'unknown'</error></testcase>
+<testcase classname="tests.test_system.TestSystem" name="test_false">
+<failure message="assert 1 == 2">tests/test_system.py:7: in test_false
+    helper()
+tests/__init__.py:9: in helper
+    assert 1 == 2
+E   assert 1 == 2</failure></testcase>
+<testcase classname="tests.test_system" name="test_true" time="0.001"/>
+<testcase classname="tests.test_system" name="test_fixture">
+<error message="failed on setup with &quot;file /project/tests/test_system.py, line 13">file /project/tests/test_system.py, line 13
+  def test_fixture(missing):
+E       fixture 'missing' not found</error></testcase>
+<testcase classname="tests.test_system" name="test_scope">
+<error message="failed on setup with &quot;Failed: ScopeMismatch: You tried to access the function scoped fixture&#10;more">ScopeMismatch: You tried to access the function scoped fixture
+tests/conftest.py:26:  def session_fixture(function_fixture)
+</error></testcase>
+</testsuite></testsuites>
+"""
+
+NOSE_REPORT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<testsuite name="nosetests" tests="2" errors="1" failures="0" skip="0">
+<testcase classname="okbudget.tests.test_authentication.TestAuthentication" name="test_signout" time="0.004">
+<error type="NameError" message="name 'caca' is not defined"><![CDATA[Traceback (most recent call last):
+  File "/venv/lib/python3.4/site-packages/tornado/testing.py", line 118, in __call__
+    result = self.orig_method(*args, **kwargs)
+  File "/okbudget/tests/test_authentication.py", line 240, in test_signout
+    caca
+NameError: name 'caca' is not defined
+]]></error></testcase>
+<testcase classname="okbudget.tests.test_authentication" name="test_ok" time="0.001"></testcase>
+</testsuite>
+"""
+
+
+class TestJUnitRunner(unittest.TestCase):
+
+    """Test case for runners.junit.py module"""
+
+    def test_iter_parse_pytest_report(self):
+        failed = []
+        result = list(iter_parse(io.BytesIO(PYTEST_REPORT), failed))
+        self.assertEqual(result, [
+            Failure(
+                "tests/test_import.py",
+                "1",
+                "ImportError: No module named 'unknown'",
+            ),
+            Failure("tests/__init__.py", "9", "assert 1 == 2"),
+            Failure(
+                "/project/tests/test_system.py",
+                "13",
+                "fixture 'missing' not found",
+            ),
+            Failure(
+                "tests/conftest.py",
+                "26",
+                "Failed: ScopeMismatch: You tried to access the function "
+                "scoped fixture",
+            ),
+        ])
+        self.assertEqual(failed, [
+            "tests/test_import.py",
+            "tests/test_system.py::TestSystem::test_false",
+            "tests/test_system.py::test_fixture",
+            "tests/test_system.py::test_scope",
+        ])
+
+    def test_iter_parse_nose_report(self):
+        failed = []
+        result = list(iter_parse(io.BytesIO(NOSE_REPORT), failed))
+        self.assertEqual(result, [
+            Failure(
+                "/okbudget/tests/test_authentication.py",
+                "240",
+                "name 'caca' is not defined",
+            ),
+        ])
+        self.assertEqual(failed, [
+            "okbudget/tests/test_authentication.py::TestAuthentication::"
+            "test_signout",
+        ])
+
+    def test_get_failed_test_finds_module_file(self):
+        cwd = os.getcwd()
+        project = tempfile.mkdtemp()
+        try:
+            os.chdir(project)
+            os.makedirs(os.path.join("tests", "unit"))
+            open(os.path.join("tests", "unit", "case.py"), "w").close()
+            self.assertEqual(
+                get_failed_test("tests.unit.case.case", "test_a"),
+                "tests/unit/case.py::case::test_a",
+            )
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(project)
+
+    def test_get_failed_test_without_module_file(self):
+        self.assertEqual(
+            get_failed_test("tests.test_a.TestA.Nested", "test_a"),
+            "tests/test_a.py::TestA::Nested::test_a",
+        )
+        self.assertEqual(
+            get_failed_test("tests.test_a", "test_a[1]"),
+            "tests/test_a.py::test_a[1]",
+        )
+        self.assertEqual(
+            get_failed_test("", "tests.test_a"),
+            "tests/test_a.py",
+        )
+        self.assertIsNone(get_failed_test("tests.test_a", None))
+
+    def test_iter_parse_by_small_chunks(self):
+        self.assertEqual(
+            list(iter_parse(io.BytesIO(PYTEST_REPORT), size=3)),
+            list(iter_parse(io.BytesIO(PYTEST_REPORT))),
+        )
+
+    def test_failure_text_cuts_long_lines(self):
+        text = FailureText("assert")
+        text.feed("tests/test_system.py:7: in test_false\nE   assert ")
+        for _ in range(1000):
+            text.feed("x" * 1024)
+            self.assertLess(text.size, TEXT_BUFFER_SIZE + 1024)
+        text.feed(" == 1\ntests/test_system.py:9: in helper\n")
+        error = text.close()
+        self.assertEqual(
+            (error.file_path, error.line_no),
+            ("tests/test_system.py", "9"),
+        )
+        self.assertEqual(len(error.message), MAX_LINE_LENGTH - 4)
+
+    def test_feed_reports_failures_as_they_are_read(self):
+        parser = ReportParser()
+        end = PYTEST_REPORT.index(b"</testcase>") + len(b"</testcase>")
+        self.assertEqual(len(parser.feed(PYTEST_REPORT[:end])), 1)
+        self.assertEqual(len(parser.feed(PYTEST_REPORT[end:])), 3)
+        self.assertEqual(parser.close(), [])
+
+    def test_iter_parse_failure_without_location(self):
+        report = b"""<?xml version="1.0" encoding="utf-8"?>
+<testsuites><testsuite name="pytest" errors="0" failures="2" tests="2">
+<testcase classname="tests.test_a" name="test_a" file="tests/test_a.py"
+ line="4"><failure message="boom">boom</failure></testcase>
+<testcase classname="tests.test_a" name="test_b">
+<failure message="boom">boom</failure></testcase>
+</testsuite></testsuites>
+"""
+        failed = []
+        result = list(iter_parse(io.BytesIO(report), failed))
+        self.assertEqual(result, [
+            Failure("tests/test_a.py", "5", "boom"),
+            Failure("Unknown", "Unknown", "boom"),
+        ])
+        self.assertEqual(failed, [
+            "tests/test_a.py::test_a",
+            "tests/test_a.py::test_b",
+        ])
+
+    def test_close_when_no_report_was_written(self):
+        self.assertEqual(ReportParser().close(), [])
@@ -3,8 +3,12 @@
 
 import unittest
 
+from runners import Failure
 from runners.nose import (
+    iter_parse,
+    match_failed_test,
     parse,
+    select_tests,
 )
 
 
@@ -88,7 +92,11 @@ class TestNoseRunner(unittest.TestCase):
             "  File \"/Users/okcompute/Developer/Git/OkBudgetBackend/okbudget/tests/test_authentication.py\", line 240, in test_signout",
             "    caca",
             "nose.proxy.NameError: name 'caca' is not defined",
-            "/Users/okcompute/Developer/Git/OkBudgetBackend/okbudget/tests/test_authentication.py:240 <nose.proxy.NameError: name 'caca' is not defined>",
+            Failure(
+                "/Users/okcompute/Developer/Git/OkBudgetBackend/okbudget/tests/test_authentication.py",
+                "240",
+                "nose.proxy.NameError: name 'caca' is not defined",
+            ),
             "-------------------- >> begin captured logging << --------------------",
             "tornado.general: WARNING: tornado.autoreload started more than once in the same process",
             "tornado.access: INFO: 200 PUT /private/reset_db (127.0.0.1) 2.43ms",
@@ -105,7 +113,11 @@ class TestNoseRunner(unittest.TestCase):
             "  File \"/Users/okcompute/Developer/Git/OkBudgetBackend/okbudget/tests/test_authentication.py\", line 276, in test_false",
             "    assert False",
             "nose.proxy.AssertionError:",
-            "/Users/okcompute/Developer/Git/OkBudgetBackend/okbudget/tests/test_authentication.py:276 <nose.proxy.AssertionError:>",
+            Failure(
+                "/Users/okcompute/Developer/Git/OkBudgetBackend/okbudget/tests/test_authentication.py",
+                "276",
+                "nose.proxy.AssertionError:",
+            ),
             "-------------------- >> begin captured logging << --------------------",
             "tornado.access: INFO: 200 PUT /private/reset_db (127.0.0.1) 3.07ms",
             "tornado.access: INFO: 200 POST /api/signup (127.0.0.1) 3.15ms",
@@ -121,7 +133,11 @@ class TestNoseRunner(unittest.TestCase):
             "  File \"/Users/okcompute/Developer/Git/OkBudgetBackend/okbudget/tests/test_authentication.py\", line 279, in test_false2",
             "    assert False",
             "nose.proxy.AssertionError:",
-            "/Users/okcompute/Developer/Git/OkBudgetBackend/okbudget/tests/test_authentication.py:279 <nose.proxy.AssertionError:>",
+            Failure(
+                "/Users/okcompute/Developer/Git/OkBudgetBackend/okbudget/tests/test_authentication.py",
+                "279",
+                "nose.proxy.AssertionError:",
+            ),
             "-------------------- >> begin captured logging << --------------------",
             "tornado.general: WARNING: tornado.autoreload started more than once in the same process",
             "tornado.access: INFO: 200 PUT /private/reset_db (127.0.0.1) 2.33ms",
@@ -138,7 +154,11 @@ class TestNoseRunner(unittest.TestCase):
             "  File \"/Users/okcompute/Developer/Git/OkBudgetBackend/okbudget/tests/test_authentication.py\", line 283, in test_myfunc",
             "    assert False",
             "AssertionError",
-            "/Users/okcompute/Developer/Git/OkBudgetBackend/okbudget/tests/test_authentication.py:283 <AssertionError>",
+            Failure(
+                "/Users/okcompute/Developer/Git/OkBudgetBackend/okbudget/tests/test_authentication.py",
+                "283",
+                "AssertionError",
+            ),
             "",
             "----------------------------------------------------------------------",
             "Ran 50 tests in 1.684s",
@@ -147,3 +167,114 @@ class TestNoseRunner(unittest.TestCase):
         ]
         result = parse(input)
         self.assertEqual(expected, result)
+
+    def test_iter_parse_yields_marker_before_end_of_input(self):
+        def lines():
+            yield "======================================================================"
+            yield "FAIL: okbudget.tests.test_authentication.test_myfunc"
+            yield "----------------------------------------------------------------------"
+            yield "Traceback (most recent call last):"
+            yield "  File \"/okbudget/tests/test_authentication.py\", line 283, in test_myfunc"
+            yield "    assert False"
+            yield "AssertionError"
+            raise AssertionError("Output read past the traceback")
+
+        result = iter_parse(lines())
+        self.assertEqual(
+            [next(result) for _ in range(8)][-1],
+            Failure(
+                "/okbudget/tests/test_authentication.py",
+                "283",
+                "AssertionError",
+            ),
+        )
+
+    def test_match_failed_test(self):
+        self.assertEqual(
+            match_failed_test("FAIL: test_false (okbudget.tests.test_authentication.TestAuthentication)"),
+            "okbudget.tests.test_authentication:TestAuthentication.test_false",
+        )
+        self.assertEqual(
+            match_failed_test("FAIL: okbudget.tests.test_authentication.test_myfunc"),
+            "okbudget.tests.test_authentication:test_myfunc",
+        )
+        self.assertIsNone(
+            match_failed_test("ERROR: Test authentication handler cannot be accessed if user sign in and"),
+        )
+
+    def test_select_tests(self):
+        self.assertEqual(
+            select_tests(["okbudget.tests.test_authentication:test_myfunc"]),
+            ["okbudget.tests.test_authentication:test_myfunc"],
+        )
+
+    def test_select_tests_by_node_id(self):
+        self.assertEqual(
+            select_tests([
+                "okbudget/tests/test_authentication.py::TestAuth::test_a",
+                "okbudget/tests/test_authentication.py",
+            ]),
+            [
+                "okbudget/tests/test_authentication.py:TestAuth.test_a",
+                "okbudget/tests/test_authentication.py",
+            ],
+        )
+
+    def test_iter_parse_several_failed_tests(self):
+        input = [
+            "FF",
+            "======================================================================",
+            "FAIL: test_a (t.T)",
+            "----------------------------------------------------------------------",
+            "Traceback (most recent call last):",
+            "  File \"/t.py\", line 3, in test_a",
+            "    assert False",
+            "AssertionError",
+            "",
+            "======================================================================",
+            "FAIL: test_b (t.T)",
+            "----------------------------------------------------------------------",
+            "Traceback (most recent call last):",
+            "  File \"/t.py\", line 5, in test_b",
+            "    assert False",
+            "AssertionError",
+            "",
+            "----------------------------------------------------------------------",
+        ]
+        failed = []
+        failures = [
+            line for line in iter_parse(input, failed)
+            if isinstance(line, Failure)
+        ]
+        self.assertEqual(failed, ["t:T.test_a", "t:T.test_b"])
+        self.assertEqual(
+            [failure.span for failure in failures],
+            [(2, 7), (10, 15)],
+        )
+
+    def test_iter_parse_failed_tests(self):
+        input = [
+            "======================================================================",
+            "FAIL: okbudget.tests.test_authentication.test_myfunc",
+            "----------------------------------------------------------------------",
+            "Traceback (most recent call last):",
+            "  File \"/okbudget/tests/test_authentication.py\", line 283, in test_myfunc",
+            "    assert False",
+            "AssertionError",
+            "",
+            "----------------------------------------------------------------------",
+        ]
+        failed = []
+        result = list(iter_parse(input, failed))
+        self.assertEqual(
+            failed,
+            ["okbudget.tests.test_authentication:test_myfunc"],
+        )
+        self.assertEqual(
+            result[7],
+            Failure(
+                "/okbudget/tests/test_authentication.py",
+                "283",
+                "AssertionError",
+            ),
+        )
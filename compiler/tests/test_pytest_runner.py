@@ -1,15 +1,27 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
+import pytest
+
+from runners import (
+    Failure,
+    decode,
+)
 from runners.pytest import (
+    classify_line,
     group_lines,
+    iter_groups,
+    iter_parse,
+    iter_parse_raw,
     match_conftest_error,
     match_error,
+    match_failed_test,
     match_file_location,
     match_fixture_not_found_error,
     match_fixture_not_found_file_location,
     match_fixture_scope_mismatch,
     parse,
+    parse_by_sections,
     parse_conftest_error,
     parse_error,
     parse_errors,
@@ -20,9 +32,168 @@ from runners.pytest import (
     parse_session,
     parse_session_failure,
     parse_test_error,
+    select_tests,
 )
 
 
+REPORT = [
+    r"================================================================"
+    "============== test session starts =============================="
+    "=================================================",
+    r'platform darwin -- Python 3.4.2 -- py-1.4.30 -- pytest-2.7.2',
+    r'rootdir: /Users/user/project, inifile: setup.cfg',
+    r'collected 47 items / 1 errors',
+    r'',
+    r'tests/test_something.py F.',
+    r'',
+    r"================================================================"
+    "===================== ERRORS ===================================="
+    "=================================================",
+    r"________________________________________________________________"
+    "__ ERROR collecting tests/test_something.py _______________"
+    "____________________________________________________",
+    r"/tests/test_something.py:19: in <module>",
+    r"    unknown",
+    r"E   NameError: name 'unknown' is not defined",
+    r"================================================================"
+    "==================== FAILURES ==================================="
+    "=================================================",
+    r"________________________________________________________________"
+    "_________ TestSystem.test_false _________________________"
+    "_________________________________________________",
+    r"",
+    r"self = <tests.TestSystem "
+    "testMethod=test_false>",
+    r"",
+    r"    def setUp(self):",
+    r">       super(TestSystem, self).setUp()",
+    r"",
+    r"application/tests/test_system.py:56:",
+    r"_ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ "
+    "_ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ "
+    "_ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _",
+    r"application/tests/__init__.py:46: in setUp",
+    r"    self.user = self.create_user(\"test\", \"test\", "
+    "\"test@test.com\")",
+    r"application/tests/__init__.py:96: in create_user",
+    r"    self.assertEqual(response.code, 200)",
+    r"E   AssertionError: 500 != 200",
+    r"----------------------------------------------------------------"
+    "-------------- Captured stderr call -----------------------------"
+    "-------------------------------------------------",
+    r"ERROR:tornado.application:Uncaught exception POST /api/signup "
+    "(127.0.0.1)",
+    r"Traceback (most recent call last):",
+    r"  File \"/venv/lib/python3.4/site-packages/tornado/w"
+    "eb.py\", line 1332, in _execute",
+    r"    result = method(*self.path_args, **self.path_kwargs)",
+    r"  File \"/application/rest/__init__.py\", line 135, "
+    "in wrapper",
+    r"    return method(self, *args, **kwargs)",
+    r"  File \"/application/rest/__init__.py\", line 105, "
+    "in request_wrapper",
+    r"    response = request(self, arguments, *args, **kwargs)",
+    r"  File \"/application/rest/authentication.py\", line "
+    "105, in post",
+    r"    body['email']",
+    r"  File \"/application/dal.py\", line 257, in "
+    "create_user",
+    r"    return self._convert_to_user(user)",
+    r"  File \"/application/dal.py\", line 236, in "
+    "_convert_to_user",
+    r"    blarg",
+    r"NameError: name 'blarg' is not defined",
+    r"ERROR:tornado.access:500 POST /api/signup (127.0.0.1) 4.70ms",
+]
+
+REPORT_WITHOUT_ERRORS = [
+    r"================================================================"
+    "============== test session starts =============================="
+    "=================================================",
+    r'platform darwin -- Python 3.4.2 -- py-1.4.30 -- pytest-2.7.2',
+    r'rootdir: /Users/user/project, inifile: setup.cfg',
+    r'collected 47 items / 1 errors',
+    r'',
+    r'tests/test_something.py F.',
+    r'',
+    r"================================================================"
+    "==================== FAILURES ==================================="
+    "=================================================",
+    r"_________________________________ test_myfunc __________________",
+    "________________",
+    r"/tests/test_false.py:283: in test_myfunc",
+    r"assert False",
+    r"E   assert False",
+    r"=========================== 1 failed in 0.21 seconds ===========",
+]
+
+REPORT_WITH_SESSION_FAILURE = [
+    r'Traceback (most recent call last):',
+    r'  File "/venv/lib/python3.4/site-packages//config.py", line 513, '
+    'in getconftestmodules',
+    r'    return self._path2confmods[path]',
+    r'KeyError: local(\'/tests\')',
+    r'',
+    r'During handling of the above exception, another exception '
+    'occurred:',
+    r'Traceback (most recent call last):',
+    r'  File "/venv/lib/python3.4/site-packages//config.py", line 537, '
+    'in importconftest',
+    r'    return self._conftestpath2mod[conftestpath]',
+    r'KeyError: local(\'/tests/conftest.py\')',
+    r'',
+    r'During handling of the above exception, another exception '
+    'occurred:',
+    r'Traceback (most recent call last):',
+    r'  File "/venv/lib/python3.4/site-packages//config.py", line 543, '
+    'in importconftest',
+    r'    mod = conftestpath.pyimport()',
+    r'  File "/venv/lib/python3.4/site-packages/py/_path/local.py", '
+    'line 650, in pyimport',
+    r'    __import__(modname)',
+    r'  File "/tests/conftest.py", line 1, in <module>',
+    r'    adfasfdasdfasd',
+    r'NameError: name \'adfasfdasdfasd\' is not defined',
+    r'ERROR: could not load /tests/conftest.py',
+]
+
+REPORT_WITH_FIXTURE_ERRORS = [
+    r"=================== test session starts ===================",
+    r"platform darwin -- Python 3.4.2 -- py-1.4.30 -- pytest-2.7.2",
+    r"rootdir: /Users/user/project, inifile: setup.cfg",
+    r"collected 4 items / 3 errors",
+    r"=================== ERRORS ===================",
+    r"___ ERROR at setup of TestSomething.test_something ___",
+    r"file /Users/user/project/tests/test_something.py, line 12",
+    r"      def test_something(",
+    r"        fixture 'a_fixture' not found",
+    r"        available fixtures: pytestconfig, capfd, capsys",
+    r"___ ERROR at setup of test_fixtures ___",
+    r"ScopeMismatch: You tried to access the 'function' scoped fixture",
+    r"tests/conftest.py:26:  def session_fixture(function_fixture)",
+    r"___ ERROR at setup of test_stderr ___",
+    r"--- Captured stderr setup ---",
+    r"Traceback (most recent call last):",
+    r'  File "/Users/user/project/tests/conftest.py", line 3, in fixture',
+    r"    raise ValueError()",
+    r"ValueError",
+    r"___ ERROR collecting ___",
+    r"E   _pytest.config.ConftestImportFailure: "
+    "(local('/Users/user/project/tests/conftest.py'), (ImportError))",
+    r"___ ERROR collecting tests/test_unknown.py ___",
+    r"This error has no location",
+    r"=================== FAILURES ===================",
+    r"___ test_without_location ___",
+    r"E   assert False",
+    r"___ test_with_location ___",
+    r"tests/test_something.py:40: in test_with_location",
+    r"E   assert False",
+    r"=================== warnings summary ===================",
+    r"tests/test_something.py:3: DeprecationWarning: not parsed",
+    r"=================== 2 failed in 0.21 seconds ===================",
+]
+
+
 class TestPytestRunner():
 
     """Test case for runners.pytest.py module"""
@@ -99,6 +270,23 @@ class TestPytestRunner():
         result = match_fixture_not_found_error(input_)
         assert result == expected
 
+    def test_classify_line(self):
+        assert classify_line(
+            "E   _pytest.config.ConftestImportFailure: "
+            "(local('/test/conftest.py'), (<class 'ImportError'>,))"
+        ) == 'conftest_error'
+        assert classify_line(r"E   NameError: name 'a' is not defined") == \
+            'error'
+        assert classify_line(r"ScopeMismatch: Invalid something") == \
+            'fixture_scope_mismatch'
+        assert classify_line(r"application/tests/__init__.py:96: in create") \
+            == 'file_location'
+        assert classify_line(r"file F:\tests\test_something.py, line 1245") \
+            == 'fixture_not_found_file_location'
+        assert classify_line("        fixture 'populate' not found") == \
+            'fixture_not_found_error'
+        assert classify_line(r"platform darwin -- Python 3.4.2") is None
+
     def test_parse_fixture_error_when_fixture_not_found(self):
         input_ = [
             r"___ ERROR at setup of TestSomething.test_something ___",
@@ -115,8 +303,11 @@ class TestPytestRunner():
             "ine 1245",
             r"      def test_something(",
             r"        fixture 'a_fixture' not found",
-            r"F:\git\my_package\tests\test_something.py:1245 <fixture "
-            "'a_fixture' not found>",
+            Failure(
+                r"F:\git\my_package\tests\test_something.py",
+                "1245",
+                "fixture 'a_fixture' not found",
+            ),
             r"        available fixtures: pytestconfig, capfd, capsys",
             r"        use 'py.test --fixtures [testpath]' for help on them.",
         ]
@@ -143,9 +334,13 @@ class TestPytestRunner():
             "involved factories",
             r"tests/conftest.py:26:  def session_fixture"
             "(function_fixture)",
-            r"tests/conftest.py:26 <You tried to access the "
-            "'function' scoped fixture 'function_fixture' with a 'session' "
-            "scoped request object, involved factories>",
+            Failure(
+                "tests/conftest.py",
+                "26",
+                "You tried to access the 'function' scoped fixture "
+                "'function_fixture' with a 'session' scoped request "
+                "object, involved factories",
+            ),
         ]
         result = parse_fixture_error('', input_)
         assert expected == result
@@ -246,9 +441,12 @@ class TestPytestRunner():
             "(local('/Users/user/project/tests/conftest.py'), "
             "(<class 'ImportError'>, ImportError(\"No module named "
             "'unknown'\",), <traceback object at 0x104226f88>))",
-            r"/Users/user/project/tests/conftest.py:1 <<class 'ImportError'>, "
-            "ImportError(\"No module named 'unknown'\",), "
-            "<traceback object at 0x104226f88>>",
+            Failure(
+                "/Users/user/project/tests/conftest.py",
+                1,
+                "<class 'ImportError'>, ImportError(\"No module named "
+                "'unknown'\",), <traceback object at 0x104226f88>",
+            ),
         ]
         result = parse_conftest_error(input_)
         assert expected == result
@@ -269,8 +467,11 @@ class TestPytestRunner():
             "tests/test_something.py:19: in <module>",
             "    asdfasdf",
             "E   NameError: name 'asdfasdf' is not defined",
-            "tests/test_something.py:19 <NameError: name 'asdfasdf' is not "
-            "defined>"
+            Failure(
+                "tests/test_something.py",
+                "19",
+                "NameError: name 'asdfasdf' is not defined",
+            ),
         ]
         result = parse_test_error(input_)
         assert expected == result
@@ -291,8 +492,11 @@ class TestPytestRunner():
             "tests/test_something.py:19: in <module>",
             "    asdfasdf",
             "E   NameError: name 'asdfasdf' is not defined",
-            "tests/test_something.py:19 <NameError: name 'asdfasdf' is not "
-            "defined>"
+            Failure(
+                "tests/test_something.py",
+                "19",
+                "NameError: name 'asdfasdf' is not defined",
+            ),
         ]
         result = parse_error(r'C:\root', input_)
         assert expected == result
@@ -309,9 +513,13 @@ class TestPytestRunner():
             "_ ERROR collecting tests/test_something.py ______________________"
             "_____________________________________________",
             "This is not understood by the parser!",
-            "Unknown:Unknown <An error was found but could not be parsed. "
-            "This is probably a missing error pattern. Please post an issue "
-            "on GitHub.>",
+            Failure(
+                "Unknown",
+                "Unknown",
+                "An error was found but could not be parsed. This is "
+                "probably a missing error pattern. Please post an issue on "
+                "GitHub.",
+            ),
         ]
         result = parse_error(r'C:\root', input_)
         assert expected == result
@@ -330,7 +538,7 @@ class TestPytestRunner():
             r"tests/test_assertion.py:283: in test_assert_false",
             r"assert False",
             r"E   assert False",
-            r"tests/test_assertion.py:283 <assert False>",
+            Failure("tests/test_assertion.py", "283", "assert False"),
         ]
         result = parse_failure(input_)
         assert expected == result
@@ -347,9 +555,13 @@ class TestPytestRunner():
             "________________",
             "_____________________________________________",
             "This is not understood by the parser!",
-            "Unknown:Unknown <An error was found but could not be parsed. "
-            "This is probably a missing error pattern. Please post an issue "
-            "on GitHub.>",
+            Failure(
+                "Unknown",
+                "Unknown",
+                "An error was found but could not be parsed. This is "
+                "probably a missing error pattern. Please post an issue on "
+                "GitHub.",
+            ),
         ]
         result = parse_failure(input_)
         assert expected == result
@@ -375,7 +587,11 @@ class TestPytestRunner():
         ]
         expected = (
             input_ + [
-                "application/tests/__init__.py:96 <AssertionError: 500 != 200>"
+                Failure(
+                    "application/tests/__init__.py",
+                    "96",
+                    "AssertionError: 500 != 200",
+                ),
             ]
         )
         result = parse_failure(input_)
@@ -438,8 +654,11 @@ class TestPytestRunner():
             "  File \"/tests/conftest.py\", line 1, in <module>",
             "    adfasfdasdfasd",
             "NameError: name 'adfasfdasdfasd' is not defined",
-            "/tests/conftest.py:1 <NameError: name 'adfasfdasdfasd' is not "
-            "defined>",
+            Failure(
+                "/tests/conftest.py",
+                "1",
+                "NameError: name 'adfasfdasdfasd' is not defined",
+            ),
             "ERROR: could not load /tests/conftest.py",
         ]
         result = parse_session_failure(input_)
@@ -481,6 +700,16 @@ class TestPytestRunner():
         result = group_lines(input_, r"_{2,} .* _{2,}")
         assert expected == result
 
+    def test_iter_groups(self):
+        input_ = ["a", "__ b __", "b", "__ c __"]
+        assert list(iter_groups(input_, r"_{2,} .* _{2,}")) == [
+            (0, 1), (1, 3), (3, 4),
+        ]
+        assert list(iter_groups(input_, r"_{2,} .* _{2,}", 1)) == [
+            (1, 3), (3, 4),
+        ]
+        assert list(iter_groups([], r"_{2,} .* _{2,}")) == []
+
     def test_parse_sections(self):
         input_ = [
             r'==============================================================='
@@ -680,16 +909,22 @@ class TestPytestRunner():
             "tests/test_something.py:19: in <module>",
             "    asdfasdf",
             "E   NameError: name 'asdfasdf' is not defined",
-            "tests/test_something.py:19 <NameError: name 'asdfasdf' is not "
-            "defined>",
+            Failure(
+                "tests/test_something.py",
+                "19",
+                "NameError: name 'asdfasdf' is not defined",
+            ),
             "_________________________________________________________________"
             "_ ERROR collecting tests/test_something.py ______________________"
             "_____________________________________________",
             "tests/test_something.py:19: in <module>",
             "    asdfasdf",
             "E   NameError: name 'asdfasdf' is not defined",
-            "tests/test_something.py:19 <NameError: name 'asdfasdf' is not "
-            "defined>",
+            Failure(
+                "tests/test_something.py",
+                "19",
+                "NameError: name 'asdfasdf' is not defined",
+            ),
         ]
         result = parse_errors('/user/tests/', input_)
         assert expected == result
@@ -776,7 +1011,11 @@ class TestPytestRunner():
             r"application/tests/__init__.py:96: in create_user",
             r"    self.assertEqual(response.code, 200)",
             r"E   AssertionError: 500 != 200",
-            r"application/tests/__init__.py:96 <AssertionError: 500 != 200>",
+            Failure(
+                "application/tests/__init__.py",
+                "96",
+                "AssertionError: 500 != 200",
+            ),
             r"----------------------------------------------------------------"
             "-------------- Captured stderr call -----------------------------"
             "-------------------------------------------------",
@@ -808,7 +1047,7 @@ class TestPytestRunner():
             r"tests/test_assertion.py:283: in test_assert_false",
             r"assert False",
             r"E   assert False",
-            r"tests/test_assertion.py:283 <assert False>",
+            Failure("tests/test_assertion.py", "283", "assert False"),
         ]
         result = parse_failures(input_)
         assert expected == result
@@ -852,76 +1091,7 @@ class TestPytestRunner():
         assert '/Tests' == result
 
     def test_parse(self):
-        input_ = [
-            r"================================================================"
-            "============== test session starts =============================="
-            "=================================================",
-            r'platform darwin -- Python 3.4.2 -- py-1.4.30 -- pytest-2.7.2',
-            r'rootdir: /Users/user/project, inifile: setup.cfg',
-            r'collected 47 items / 1 errors',
-            r'',
-            r'tests/test_something.py F.',
-            r'',
-            r"================================================================"
-            "===================== ERRORS ===================================="
-            "=================================================",
-            r"________________________________________________________________"
-            "__ ERROR collecting tests/test_something.py _______________"
-            "____________________________________________________",
-            r"/tests/test_something.py:19: in <module>",
-            r"    unknown",
-            r"E   NameError: name 'unknown' is not defined",
-            r"================================================================"
-            "==================== FAILURES ==================================="
-            "=================================================",
-            r"________________________________________________________________"
-            "_________ TestSystem.test_false _________________________"
-            "_________________________________________________",
-            r"",
-            r"self = <tests.TestSystem "
-            "testMethod=test_false>",
-            r"",
-            r"    def setUp(self):",
-            r">       super(TestSystem, self).setUp()",
-            r"",
-            r"application/tests/test_system.py:56:",
-            r"_ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ "
-            "_ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ "
-            "_ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _",
-            r"application/tests/__init__.py:46: in setUp",
-            r"    self.user = self.create_user(\"test\", \"test\", "
-            "\"test@test.com\")",
-            r"application/tests/__init__.py:96: in create_user",
-            r"    self.assertEqual(response.code, 200)",
-            r"E   AssertionError: 500 != 200",
-            r"----------------------------------------------------------------"
-            "-------------- Captured stderr call -----------------------------"
-            "-------------------------------------------------",
-            r"ERROR:tornado.application:Uncaught exception POST /api/signup "
-            "(127.0.0.1)",
-            r"Traceback (most recent call last):",
-            r"  File \"/venv/lib/python3.4/site-packages/tornado/w"
-            "eb.py\", line 1332, in _execute",
-            r"    result = method(*self.path_args, **self.path_kwargs)",
-            r"  File \"/application/rest/__init__.py\", line 135, "
-            "in wrapper",
-            r"    return method(self, *args, **kwargs)",
-            r"  File \"/application/rest/__init__.py\", line 105, "
-            "in request_wrapper",
-            r"    response = request(self, arguments, *args, **kwargs)",
-            r"  File \"/application/rest/authentication.py\", line "
-            "105, in post",
-            r"    body['email']",
-            r"  File \"/application/dal.py\", line 257, in "
-            "create_user",
-            r"    return self._convert_to_user(user)",
-            r"  File \"/application/dal.py\", line 236, in "
-            "_convert_to_user",
-            r"    blarg",
-            r"NameError: name 'blarg' is not defined",
-            r"ERROR:tornado.access:500 POST /api/signup (127.0.0.1) 4.70ms",
-
-        ]
+        input_ = list(REPORT)
         expected = [
             r"================================================================"
             "============== test session starts =============================="
@@ -941,8 +1111,11 @@ class TestPytestRunner():
             r"/tests/test_something.py:19: in <module>",
             r"    unknown",
             r"E   NameError: name 'unknown' is not defined",
-            r"/tests/test_something.py:19 <NameError: name 'unknown' is not "
-            "defined>",
+            Failure(
+                "/tests/test_something.py",
+                "19",
+                "NameError: name 'unknown' is not defined",
+            ),
             r"================================================================"
             "==================== FAILURES ==================================="
             "=================================================",
@@ -966,7 +1139,11 @@ class TestPytestRunner():
             r"application/tests/__init__.py:96: in create_user",
             r"    self.assertEqual(response.code, 200)",
             r"E   AssertionError: 500 != 200",
-            r"application/tests/__init__.py:96 <AssertionError: 500 != 200>",
+            Failure(
+                "application/tests/__init__.py",
+                "96",
+                "AssertionError: 500 != 200",
+            ),
             r"----------------------------------------------------------------"
             "-------------- Captured stderr call -----------------------------"
             "-------------------------------------------------",
@@ -998,27 +1175,7 @@ class TestPytestRunner():
         assert expected == result
 
     def test_parse_without_errors(self):
-        input_ = [
-            r"================================================================"
-            "============== test session starts =============================="
-            "=================================================",
-            r'platform darwin -- Python 3.4.2 -- py-1.4.30 -- pytest-2.7.2',
-            r'rootdir: /Users/user/project, inifile: setup.cfg',
-            r'collected 47 items / 1 errors',
-            r'',
-            r'tests/test_something.py F.',
-            r'',
-            r"================================================================"
-            "==================== FAILURES ==================================="
-            "=================================================",
-            r"_________________________________ test_myfunc __________________",
-            "________________",
-            r"/tests/test_false.py:283: in test_myfunc",
-            r"assert False",
-            r"E   assert False",
-            r"=========================== 1 failed in 0.21 seconds ===========",
-
-        ]
+        input_ = list(REPORT_WITHOUT_ERRORS)
         expected = [
             r"================================================================"
             "============== test session starts =============================="
@@ -1037,14 +1194,15 @@ class TestPytestRunner():
             r"/tests/test_false.py:283: in test_myfunc",
             r"assert False",
             r"E   assert False",
-            r"/tests/test_false.py:283 <assert False>",
+            Failure("/tests/test_false.py", "283", "assert False"),
             r"=========================== 1 failed in 0.21 seconds ===========",
         ]
         result = parse(input_)
         assert expected == result
 
     def test_parse_with_session_failure(self):
-        input_ = [
+        input_ = list(REPORT_WITH_SESSION_FAILURE)
+        expected = [
             r'Traceback (most recent call last):',
             r'  File "/venv/lib/python3.4/site-packages//config.py", line 513, '
             'in getconftestmodules',
@@ -1071,41 +1229,176 @@ class TestPytestRunner():
             r'  File "/tests/conftest.py", line 1, in <module>',
             r'    adfasfdasdfasd',
             r'NameError: name \'adfasfdasdfasd\' is not defined',
+            Failure(
+                "/tests/conftest.py",
+                "1",
+                r"NameError: name \'adfasfdasdfasd\' is not defined",
+            ),
             r'ERROR: could not load /tests/conftest.py',
         ]
-        expected = [
-            r'Traceback (most recent call last):',
-            r'  File "/venv/lib/python3.4/site-packages//config.py", line 513, '
-            'in getconftestmodules',
-            r'    return self._path2confmods[path]',
-            r'KeyError: local(\'/tests\')',
-            r'',
-            r'During handling of the above exception, another exception '
-            'occurred:',
-            r'Traceback (most recent call last):',
-            r'  File "/venv/lib/python3.4/site-packages//config.py", line 537, '
-            'in importconftest',
-            r'    return self._conftestpath2mod[conftestpath]',
-            r'KeyError: local(\'/tests/conftest.py\')',
-            r'',
-            r'During handling of the above exception, another exception '
-            'occurred:',
+        result = parse(input_)
+        assert expected == result
+
+    def test_parse_empty_lines(self):
+        assert parse([]) == []
+
+    @pytest.mark.parametrize('report', [
+        REPORT,
+        REPORT_WITHOUT_ERRORS,
+        REPORT_WITH_SESSION_FAILURE,
+        REPORT_WITH_FIXTURE_ERRORS,
+        [],
+    ])
+    def test_parse_is_equivalent_to_parse_by_sections(self, report):
+        assert parse(list(report)) == parse_by_sections(list(report))
+
+    def test_parse_sections_keep_their_input(self):
+        sections = parse_sections(REPORT)
+        errors = list(sections['errors'])
+        failures = list(sections['failures'])
+        parse_errors('', errors)
+        parse_failures(failures)
+        assert errors == sections['errors']
+        assert failures == sections['failures']
+
+    @pytest.mark.parametrize('report', [
+        REPORT,
+        REPORT_WITHOUT_ERRORS,
+        REPORT_WITH_SESSION_FAILURE,
+        REPORT_WITH_FIXTURE_ERRORS,
+        [],
+    ])
+    def test_iter_parse_raw_is_equivalent_to_parse(self, report):
+        lines = [memoryview(line.encode("utf-8")) for line in report]
+        failed = []
+        result = [
+            line if isinstance(line, (str, Failure)) else decode(line)
+            for line in iter_parse_raw(lines, failed)
+        ]
+        expected_failed = []
+        expected = list(iter_parse(report, expected_failed))
+        assert result == expected
+        assert failed == expected_failed
+        assert [
+            line.span for line in result if isinstance(line, Failure)
+        ] == [line.span for line in expected if isinstance(line, Failure)]
+
+    def test_iter_parse_failure_spans(self):
+        failures = [
+            line for line in iter_parse(REPORT_WITH_FIXTURE_ERRORS)
+            if isinstance(line, Failure)
+        ]
+        assert [failure.span for failure in failures] == [
+            (5, 8), (10, 12), (13, 18), (19, 20), (21, 22), (24, 25), (26, 28),
+        ]
+        assert failures[0].file_path == \
+            "/Users/user/project/tests/test_something.py"
+        assert failures[0].line_no == "12"
+        assert failures[0].message == "fixture 'a_fixture' not found"
+
+    def test_parse_failure_span(self):
+        failures = [
+            line for line in parse_failure([
+                "___ test_with_location ___",
+                "tests/test_a.py:3: in test_with_location",
+                "E   assert False",
+                "--- Captured stderr call ---",
+            ])
+            if isinstance(line, Failure)
+        ]
+        assert [(failure.line_no, failure.span) for failure in failures] == [
+            ("3", (0, 2)),
+        ]
+
+    def test_iter_parse_yields_session_before_end_of_input(self):
+        def lines():
+            yield r"=================== test session starts ==================="
+            yield r"platform darwin -- Python 3.4.2 -- pytest-2.7.2"
+            raise AssertionError("Report read past the yielded line")
+
+        result = iter_parse(lines())
+        assert next(result) == \
+            r"=================== test session starts ==================="
+
+    def test_iter_parse_yields_failure_when_next_block_starts(self):
+        def lines():
+            yield r"=================== test session starts ==================="
+            yield r"platform darwin -- Python 3.4.2 -- pytest-2.7.2"
+            yield r"rootdir: /Users/user/project, inifile: setup.cfg"
+            yield r"=================== FAILURES ==================="
+            yield r"___________________ test_one ___________________"
+            yield r"/tests/test_one.py:3: in test_one"
+            yield r"E   assert False"
+            yield r"___________________ test_two ___________________"
+            raise AssertionError("Report read past the failure block")
+
+        result = iter_parse(lines())
+        assert [next(result) for _ in range(8)] == [
+            r"=================== test session starts ===================",
+            r"platform darwin -- Python 3.4.2 -- pytest-2.7.2",
+            r"rootdir: /Users/user/project, inifile: setup.cfg",
+            r"=================== FAILURES ===================",
+            r"___________________ test_one ___________________",
+            r"/tests/test_one.py:3: in test_one",
+            r"E   assert False",
+            Failure("/tests/test_one.py", "3", "assert False"),
+        ]
+
+    def test_iter_parse_with_session_failure(self):
+        input_ = [
             r'Traceback (most recent call last):',
-            r'  File "/venv/lib/python3.4/site-packages//config.py", line 543, '
-            'in importconftest',
-            r'    mod = conftestpath.pyimport()',
-            r'  File "/venv/lib/python3.4/site-packages/py/_path/local.py", '
-            'line 650, in pyimport',
-            r'    __import__(modname)',
             r'  File "/tests/conftest.py", line 1, in <module>',
             r'    adfasfdasdfasd',
             r'NameError: name \'adfasfdasdfasd\' is not defined',
-            r'/tests/conftest.py:1 <NameError: name \'adfasfdasdfasd\' is not '
-            'defined>',
             r'ERROR: could not load /tests/conftest.py',
         ]
-        result = parse(input_)
-        assert expected == result
+        assert list(iter_parse(input_)) == parse(input_)
 
-    def test_parse_empty_lines(self):
-        assert parse([]) == []
+    def test_iter_parse_empty_lines(self):
+        assert list(iter_parse([])) == []
+
+    def test_match_failed_test(self):
+        assert match_failed_test(
+            r"FAILED tests/test_a.py::TestA::test_false - assert False",
+        ) == "tests/test_a.py::TestA::test_false"
+        assert match_failed_test(
+            r"ERROR tests/test_a.py::test_b[a - b] - fixture 'f' not found",
+        ) == "tests/test_a.py::test_b[a - b]"
+        assert match_failed_test(r"ERROR tests/test_something.py") == \
+            "tests/test_something.py"
+        assert match_failed_test(r"FAIL tests/test_a.py::test_a") == \
+            "tests/test_a.py::test_a"
+        assert match_failed_test(r"_____ TestSystem.test_false _____") is None
+        assert match_failed_test(r"E   assert False") is None
+
+    def test_select_tests(self):
+        assert select_tests([
+            "tests/test_a.py::TestA::test_false",
+            "tests/test_something.py",
+        ]) == [
+            "tests/test_a.py::TestA::test_false",
+            "tests/test_something.py",
+        ]
+
+    @pytest.mark.parametrize('raw', [False, True])
+    def test_iter_parse_failed_tests(self, raw):
+        report = REPORT + [
+            r"=================== short test summary info ===================",
+            r"ERROR tests/test_something.py",
+            r"FAILED tests/test_a.py::TestSystem::test_false - AssertionError",
+            r"ERROR tests/test_a.py::TestSystem::test_false - ValueError",
+        ]
+        failed = []
+        if raw:
+            lines = [memoryview(line.encode("utf-8")) for line in report]
+            output = [
+                line if isinstance(line, (str, Failure)) else decode(line)
+                for line in iter_parse_raw(lines, failed)
+            ]
+        else:
+            output = list(iter_parse(report, failed))
+        assert failed == [
+            "tests/test_something.py",
+            "tests/test_a.py::TestSystem::test_false",
+        ]
+        assert output == parse(REPORT)
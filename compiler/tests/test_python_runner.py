@@ -3,6 +3,7 @@
 
 import unittest
 
+from runners import Failure
 from runners.python import (
     match_file_location,
     match_code_pattern,
@@ -65,7 +66,25 @@ class TestPythonRunner(unittest.TestCase):
             "  File \"/Git/Backend/application/dal.py\", line 236, in _convert_to_user",
             "    blarg",
             "NameError: name 'blarg' is not defined",
-            "/Git/Backend/application/dal.py:236 <NameError: name 'blarg' is not defined>",
+            Failure(
+                "/Git/Backend/application/dal.py",
+                "236",
+                "NameError: name 'blarg' is not defined",
+            ),
         ]
         result = parse_traceback(input)
         self.assertEqual(expected, result)
+
+    def test_parse_traceback_failure_span(self):
+        input = [
+            "Traceback (most recent call last):",
+            "  File \"/project/tests/test_a.py\", line 3, in test_a",
+            "    assert False",
+            "AssertionError",
+            "more output",
+        ]
+        failure = parse_traceback(iter(input), 10)[-1]
+        self.assertEqual(failure.file_path, "/project/tests/test_a.py")
+        self.assertEqual(failure.line_no, "3")
+        self.assertEqual(failure.message, "AssertionError")
+        self.assertEqual(failure.span, (10, 13))
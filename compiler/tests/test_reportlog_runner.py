@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import io
+import json
+import unittest
+
+from runners import Failure
+from runners.reportlog import (
+    ReportParser,
+    get_failed_test,
+    iter_parse,
+    parse_report,
+)
+
+REPORTS = [
+    {
+        "$report_type": "CollectReport",
+        "nodeid": "tests/test_import.py",
+        "outcome": "failed",
+        "longrepr": "tests/test_import.py:1: in <module>\n"
+                    "    import unknown\n"
+                    "E   ImportError: No module named 'unknown'",
+    },
+    {
+        "$report_type": "TestReport",
+        "nodeid": "tests/test_system.py::TestSystem::test_false",
+        "location": ["tests/test_system.py", 4, "TestSystem.test_false"],
+        "when": "call",
+        "outcome": "failed",
+        "longrepr": {
+            "reprcrash": {
+                "path": "/project/tests/test_system.py",
+                "lineno": 9,
+                "message": "assert 1 == 2\n +  where 1 = one()",
+            },
+            "reprtraceback": {
+                "reprentries": [
+                    {
+                        "type": "ReprEntry",
+                        "data": {
+                            "reprfileloc": {
+                                "path": "tests/test_system.py",
+                                "lineno": 7,
+                                "message": "in test_false",
+                            },
+                        },
+                    },
+                    {
+                        "type": "ReprEntry",
+                        "data": {
+                            "reprfileloc": {
+                                "path": "tests/__init__.py",
+                                "lineno": 9,
+                                "message": "in helper",
+                            },
+                        },
+                    },
+                ],
+            },
+        },
+    },
+    {
+        "$report_type": "TestReport",
+        "nodeid": "tests/test_system.py::test_true",
+        "location": ["tests/test_system.py", 10, "test_true"],
+        "when": "call",
+        "outcome": "passed",
+        "longrepr": None,
+    },
+    {
+        "$report_type": "TestReport",
+        "nodeid": "tests/test_system.py::test_fixture",
+        "location": ["tests/test_system.py", 12, "test_fixture"],
+        "when": "setup",
+        "outcome": "failed",
+        "longrepr": "file /project/tests/test_system.py, line 13\n"
+                    "  def test_fixture(missing):\n"
+                    "E       fixture 'missing' not found\n"
+                    ">       available fixtures: capsys, tmpdir\n",
+    },
+    {
+        "$report_type": "SessionFinish",
+        "exitstatus": 1,
+    },
+]
+
+LOG = "".join(json.dumps(report) + "\n" for report in REPORTS).encode("utf-8")
+
+EXPECTED = [
+    Failure(
+        "tests/test_import.py",
+        "1",
+        "ImportError: No module named 'unknown'",
+    ),
+    Failure("tests/__init__.py", 9, "assert 1 == 2"),
+    Failure("tests/test_system.py", 13, "fixture 'missing' not found"),
+]
+
+
+class TestReportLogRunner(unittest.TestCase):
+
+    """Test case for runners.reportlog.py module"""
+
+    def test_parse_report_when_passed(self):
+        self.assertIsNone(parse_report(REPORTS[2]))
+
+    def test_parse_report_without_location(self):
+        report = {
+            "$report_type": "TestReport",
+            "nodeid": "tests/test_system.py::test_teardown",
+            "when": "teardown",
+            "outcome": "failed",
+            "longrepr": None,
+        }
+        self.assertEqual(
+            parse_report(report),
+            Failure(
+                "Unknown",
+                "Unknown",
+                "tests/test_system.py::test_teardown",
+            ),
+        )
+        failed = []
+        parser = ReportParser(failed)
+        self.assertEqual(
+            len(parser.feed(json.dumps(report).encode("utf-8") + b"\n")),
+            1,
+        )
+        self.assertEqual(failed, ["tests/test_system.py::test_teardown"])
+
+    def test_get_failed_test(self):
+        self.assertEqual(
+            [get_failed_test(report) for report in REPORTS[:2]],
+            [
+                "tests/test_import.py",
+                "tests/test_system.py::TestSystem::test_false",
+            ],
+        )
+
+    def test_iter_parse(self):
+        failed = []
+        self.assertEqual(
+            list(iter_parse(io.BytesIO(LOG), failed, size=7)),
+            EXPECTED,
+        )
+        self.assertEqual(
+            failed,
+            [
+                "tests/test_import.py",
+                "tests/test_system.py::TestSystem::test_false",
+                "tests/test_system.py::test_fixture",
+            ],
+        )
+
+    def test_feed_partial_lines(self):
+        parser = ReportParser()
+        middle = LOG.index(b"\n") + 10
+        self.assertEqual(parser.feed(LOG[:middle]), EXPECTED[:1])
+        self.assertEqual(parser.feed(LOG[middle:-1]), EXPECTED[1:])
+        self.assertEqual(parser.close(), [])
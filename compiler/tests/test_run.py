@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import io
+import json
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from run import (
+    CompactOutput,
+    MAX_ERROR_FORMAT_LENGTH,
+    OutputFilters,
+    OutputLimiter,
+    STATE_VERSION,
+    drop_seen_failures,
+    get_merge_arguments,
+    get_state_path,
+    load_state,
+    open_private_file,
+    parse_arguments,
+    read_lines,
+    read_mapped_lines,
+    read_output,
+    read_raw_lines,
+    save_state,
+    spawn,
+    terminate,
+)
+from runners import Failure
+from runners.pytest import BLOCK_START
+
+ERROR = Failure("a.py", "1", "error")
+
+
+class TestRun(unittest.TestCase):
+
+    """Test case for run.py module"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.project = tempfile.mkdtemp()
+        os.chdir(self.project)
+
+    def tearDown(self):
+        if os.path.exists(get_state_path()):
+            os.remove(get_state_path())
+        os.chdir(self.cwd)
+        shutil.rmtree(self.project)
+
+    def test_parse_arguments(self):
+        self.assertEqual(
+            parse_arguments(["pytest", "-x", "tests/test_one.py"]),
+            ("pytest", ["-x", "tests/test_one.py"], {}),
+        )
+
+    def test_parse_arguments_with_options(self):
+        self.assertEqual(
+            parse_arguments([
+                "--runner-shards=4",
+                "pytest",
+                "tests/test_one.py",
+                "--runner-flag",
+            ]),
+            ("pytest", ["tests/test_one.py"], {'shards': "4", 'flag': True}),
+        )
+
+    def test_load_state(self):
+        save_state("pytest", ["tests"], ["test_one"])
+        self.assertEqual(
+            load_state("pytest"),
+            {
+                'version': STATE_VERSION,
+                'runner': "pytest",
+                'args': ["tests"],
+                'failed': ["test_one"],
+            },
+        )
+
+    @unittest.skipUnless(hasattr(os, "getuid"), "requires a user id")
+    def test_state_path_is_private(self):
+        directory = os.path.dirname(get_state_path())
+        status = os.lstat(directory)
+        self.assertEqual(status.st_uid, os.getuid())
+        self.assertEqual(stat.S_IMODE(status.st_mode), 0o700)
+
+    @unittest.skipUnless(hasattr(os, "O_NOFOLLOW"), "requires O_NOFOLLOW")
+    def test_open_private_file(self):
+        path = os.path.join(self.project, "run.log")
+        with open_private_file(path) as f:
+            f.write(b"output")
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+        link = os.path.join(self.project, "link.log")
+        os.symlink(path, link)
+        with self.assertRaises(OSError):
+            open_private_file(link)
+
+    def test_load_state_of_another_version(self):
+        with open(get_state_path(), "w") as f:
+            json.dump({'runner': "pytest", 'args': [], 'failed': ["a.b"]}, f)
+        self.assertIsNone(load_state("pytest"))
+
+    def test_load_state_of_another_runner(self):
+        save_state("pytest", ["tests"], ["test_one"])
+        self.assertIsNone(load_state("nose"))
+
+    def test_load_state_when_not_saved(self):
+        self.assertIsNone(load_state("pytest"))
+
+    def test_read_lines_with_invalid_bytes(self):
+        stream = io.BytesIO(b"one\n\xfftwo\n")
+        self.assertEqual(
+            list(read_lines(stream)),
+            ["one", b"\xfftwo".decode("utf-8", "replace")]
+            if sys.version_info > (3, 0) else ["one", b"\xfftwo"],
+        )
+
+    def test_read_raw_lines(self):
+        stream = io.BufferedReader(io.BytesIO(b"one\r\ntwo\n\nthree\nfour"))
+        for size in (1, 3, 1024):
+            stream.seek(0)
+            self.assertEqual(
+                [line.tobytes() for line in read_raw_lines(stream, size)],
+                [b"one", b"two", b"", b"three", b"four"],
+            )
+
+    def test_read_mapped_lines(self):
+        with tempfile.TemporaryFile() as spool:
+            self.assertEqual(list(read_mapped_lines(spool)), [])
+            spool.write("one\r\ntwo\n\nthrée\nfour".encode("utf-8"))
+            self.assertEqual(
+                list(read_mapped_lines(spool)),
+                ["one", "two", "", u"thrée", "four"],
+            )
+
+    def test_read_mapped_lines_with_invalid_bytes(self):
+        with tempfile.TemporaryFile() as spool:
+            spool.write(b"one\n\xfftwo")
+            self.assertEqual(
+                list(read_mapped_lines(spool)),
+                ["one", b"\xfftwo".decode("utf-8", "replace")]
+                if sys.version_info > (3, 0) else ["one", b"\xfftwo"],
+            )
+
+    def test_read_merged_output(self):
+        script = (
+            "import sys\n"
+            "for i in range(3):\n"
+            "    print('out %d' % i)\n"
+            "    sys.stderr.write('err %d\\n' % i)\n"
+        )
+        with tempfile.TemporaryFile() as stderr:
+            capture, spooled, env = get_merge_arguments(True, stderr)
+            self.assertIsNone(spooled)
+            p = spawn(
+                [sys.executable, "-c", script],
+                subprocess.PIPE,
+                capture,
+                env,
+            )
+            self.assertEqual(
+                list(read_output(p, None, spooled)),
+                ["out 0", "err 0", "out 1", "err 1", "out 2", "err 2"],
+            )
+            p.stdout.close()
+
+    def test_drop_seen_failures(self):
+        seen = set([ERROR])
+        found = set()
+        error = Failure("a.py", "2", "error")
+        self.assertEqual(
+            list(drop_seen_failures(["one", ERROR, error], seen, found)),
+            ["one", error],
+        )
+        self.assertEqual(found, set([error]))
+
+    def test_terminate_runner_processes(self):
+        p = spawn(
+            [sys.executable, "-c", "import time; time.sleep(60)"],
+            subprocess.PIPE,
+            None,
+        )
+        with self.assertRaises(SystemExit) as context:
+            terminate(15, None)
+        self.assertEqual(context.exception.code, 143)
+        self.assertIsNotNone(p.wait())
+        p.stdout.close()
+
+    def test_output_limiter_max_lines(self):
+        limiter = OutputLimiter(max_lines=2)
+        lines = ["one", "two", "three", "four", ERROR, "five"]
+        output = [line_ for line in lines for line_ in limiter.feed(line)]
+        output.extend(limiter.close())
+        self.assertEqual(output, [
+            "one",
+            "two",
+            "vim-runners: 2 lines (9 bytes) elided.",
+            "a.py:1 <error>",
+            "five",
+        ])
+
+    def test_output_limiter_max_lines_per_block(self):
+        limiter = OutputLimiter(max_lines=2, block_start=BLOCK_START)
+        lines = [
+            "___ test_a ___", "    def test_a():", ">       assert 0",
+            "E       assert 0", ERROR, "--- Captured stdout call ---", "out",
+            "___ test_b ___", "    def test_b():", ">       assert 0",
+            Failure("a.py", "2", "error"),
+        ]
+        output = [line_ for line in lines for line_ in limiter.feed(line)]
+        output.extend(limiter.close())
+        self.assertEqual(output, [
+            "___ test_a ___",
+            "    def test_a():",
+            "vim-runners: 2 lines (32 bytes) elided.",
+            "a.py:1 <error>",
+            "--- Captured stdout call ---",
+            "out",
+            "___ test_b ___",
+            "    def test_b():",
+            "vim-runners: 1 lines (16 bytes) elided.",
+            "a.py:2 <error>",
+        ])
+
+    def test_output_limiter_ignores_error_format_strings(self):
+        limiter = OutputLimiter(max_lines=1)
+        lines = ["one", "DEBUG:root:created <User 0>", "two"]
+        output = [line_ for line in lines for line_ in limiter.feed(line)]
+        output.extend(limiter.close())
+        self.assertEqual(output, [
+            "one",
+            "vim-runners: 2 lines (30 bytes) elided.",
+        ])
+
+    def test_output_limiter_with_error_format_strings(self):
+        limiter = OutputLimiter(max_lines=1, strings=True)
+        lines = ["one", "two", "a.py:1 <error>", "three"]
+        output = [line_ for line in lines for line_ in limiter.feed(line)]
+        output.extend(limiter.close())
+        self.assertEqual(output, [
+            "one",
+            "vim-runners: 1 lines (3 bytes) elided.",
+            "a.py:1 <error>",
+            "three",
+        ])
+
+    def test_output_limiter_max_bytes(self):
+        limiter = OutputLimiter(max_bytes=6)
+        lines = ["one", "two", "three", ERROR, "four"]
+        output = [line_ for line in lines for line_ in limiter.feed(line)]
+        output.extend(limiter.close())
+        self.assertEqual(output, [
+            "one",
+            "two",
+            "vim-runners: Output limit of 6 bytes reached, only errors are "
+            "reported from now on.",
+            "vim-runners: 1 lines (5 bytes) elided.",
+            "a.py:1 <error>",
+            "vim-runners: 1 lines (4 bytes) elided.",
+        ])
+
+    def test_output_limiter_cuts_error_formats(self):
+        limiter = OutputLimiter(max_lines=1)
+        output = limiter.feed(
+            Failure("a.py", "1", "x" * MAX_ERROR_FORMAT_LENGTH),
+        )
+        self.assertEqual(len(output[0]), MAX_ERROR_FORMAT_LENGTH)
+        self.assertTrue(output[0].startswith("a.py:1 <xxx"))
+        self.assertTrue(output[0].endswith("...>"))
+
+    def test_compact_output(self):
+        log = io.BytesIO()
+        compact = CompactOutput(log, context=2)
+        lines = [
+            "one", "two", "three", ERROR, "four",
+            Failure("a.py", "2", "error"), memoryview(b"five"),
+        ]
+        output = [line_ for line in lines for line_ in compact.feed(line)]
+        output.extend(compact.close())
+        self.assertEqual(output, [
+            "two", "three", ERROR, "four", Failure("a.py", "2", "error"),
+        ])
+        self.assertEqual(
+            log.getvalue(),
+            b"one\ntwo\nthree\na.py:1 <error>\nfour\na.py:2 <error>\nfive\n",
+        )
+
+    def test_compact_output_ignores_error_format_strings(self):
+        compact = CompactOutput(io.BytesIO(), context=2)
+        lines = ["one", "DEBUG:root:created <User 0>", ERROR]
+        output = [line_ for line in lines for line_ in compact.feed(line)]
+        self.assertEqual(output, [
+            "one", "DEBUG:root:created <User 0>", ERROR,
+        ])
+
+    def test_output_filters(self):
+        log = io.BytesIO()
+        filters = OutputFilters([
+            CompactOutput(log, context=2),
+            OutputLimiter(max_lines=1),
+        ])
+        lines = ["one", "two", "three", ERROR, "four"]
+        output = [line_ for line in lines for line_ in filters.feed(line)]
+        output.extend(filters.close())
+        self.assertEqual(output, [
+            "two",
+            "vim-runners: 1 lines (5 bytes) elided.",
+            "a.py:1 <error>",
+        ])
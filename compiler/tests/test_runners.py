@@ -1,16 +1,36 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
+import types
 import unittest
 from platform import system
 
+import runners.pytest
+import runners.python
 from runners import (
+    Failure,
+    LineClassifier,
+    RUNNERS,
+    RunnerRegistry,
+    compile_pattern,
+    get_iter_parse_function,
     get_parse_function,
     get_command,
+    get_report_arguments,
+    get_report_parser,
+    is_error_format,
     make_error_format,
+    match_pattern,
+)
+from runners.pytest import (
+    iter_parse as pytest_iter_parse,
+    parse as pytest_parse,
+)
+from runners.reportlog import ReportParser as ReportLogParser
+from runners.nose import (
+    iter_parse as nose_iter_parse,
+    parse as nose_parse,
 )
-from runners.pytest import parse as pytest_parse
-from runners.nose import parse as nose_parse
 
 
 class TestRunners(unittest.TestCase):
@@ -29,6 +49,28 @@ class TestRunners(unittest.TestCase):
             nose_parse,
         )
 
+    def test_get_pytest_iter_parse_function(self):
+        self.assertEqual(
+            get_iter_parse_function('pytest'),
+            pytest_iter_parse,
+        )
+
+    def test_get_nose_iter_parse_function(self):
+        self.assertEqual(
+            get_iter_parse_function('nose'),
+            nose_iter_parse,
+        )
+
+    def test_get_iter_parse_function_of_parse_only_runner(self):
+        runner = types.ModuleType("legacy")
+        runner.parse = lambda lines: [line.upper() for line in lines]
+        RUNNERS.register("legacy", runner)
+        self.addCleanup(RUNNERS.runners.pop, "legacy")
+        failed = []
+        parse = get_iter_parse_function("legacy")
+        self.assertEqual(list(parse(iter(["a", "b"]), failed)), ["A", "B"])
+        self.assertEqual(failed, [])
+
     def test_nose_command(self):
         self.assertEqual(
             get_command('nose'),
@@ -39,12 +81,12 @@ class TestRunners(unittest.TestCase):
         if system().lower() == 'windows':
             self.assertEqual(
                 get_command('pytest'),
-                "py.test.exe --tb=short",
+                "py.test.exe --tb=short -rfE",
             )
         else:
             self.assertEqual(
                 get_command('pytest'),
-                "py.test --tb=short",
+                "py.test --tb=short -rfE",
             )
 
     def test_make_error_format(self):
@@ -52,3 +94,141 @@ class TestRunners(unittest.TestCase):
             make_error_format("/a/path", "10", "an error"),
             "/a/path:10 <an error>",
         )
+
+    def test_is_error_format(self):
+        self.assertTrue(
+            is_error_format(make_error_format("a", "1", "error"), True),
+        )
+        self.assertTrue(
+            is_error_format(
+                make_error_format("Unknown", "Unknown", "error"),
+                True,
+            ),
+        )
+        self.assertFalse(is_error_format("E   AssertionError", True))
+        self.assertFalse(is_error_format(memoryview(b"a:1 <error>"), True))
+
+    def test_is_error_format_only_matches_strings_as_fallback(self):
+        self.assertFalse(is_error_format("DEBUG:root:created <User 0>"))
+        self.assertFalse(is_error_format(make_error_format("a", "1", "error")))
+
+    def test_failure_renders_error_format(self):
+        failure = Failure("/a/path", "10", "an error", (2, 5))
+        self.assertEqual(failure.render(), "/a/path:10 <an error>")
+        self.assertEqual(str(failure), "/a/path:10 <an error>")
+        self.assertEqual(failure.span, (2, 5))
+        self.assertTrue(is_error_format(failure))
+        self.assertFalse(hasattr(failure, "__dict__"))
+
+    def test_failure_equality(self):
+        failure = Failure("/a/path", "10", "an error")
+        self.assertEqual(str(failure), "/a/path:10 <an error>")
+        self.assertEqual(failure, Failure("/a/path", "10", "an error", (0, 1)))
+        self.assertEqual(
+            hash(failure),
+            hash(Failure("/a/path", "10", "an error", (0, 1))),
+        )
+        self.assertNotEqual(failure, Failure("/a/path", "11", "an error"))
+        self.assertNotEqual(failure, "/a/path:10 <an error>")
+
+    def test_compile_pattern_is_compiled_once(self):
+        self.assertIs(
+            compile_pattern(r"(?P<name>\w+)"),
+            compile_pattern(r"(?P<name>\w+)"),
+        )
+
+    def test_match_pattern_with_compiled_pattern(self):
+        self.assertEqual(
+            match_pattern(compile_pattern(r"(?P<name>\w+)"), "word"),
+            {'name': "word"},
+        )
+
+    def test_line_classifier(self):
+        classifier = LineClassifier([
+            ('number', r"(?P<value>\d+)$"),
+            ('word', r"(?P<value>\w+)(\s\w+)*$"),
+        ])
+        self.assertEqual(classifier.classify("12"), 'number')
+        self.assertEqual(classifier.classify("a word"), 'word')
+        self.assertIsNone(classifier.classify("!"))
+
+    def test_get_report_parser(self):
+        self.assertIs(get_report_parser("reportlog"), ReportLogParser)
+
+    def test_get_report_arguments(self):
+        self.assertEqual(
+            get_report_arguments("pytest", "reportlog", "/tmp/report"),
+            [
+                "-p",
+                "python_tests_runner_reportlog",
+                "--python-tests-runner-report-log=/tmp/report",
+            ],
+        )
+
+    def test_get_report_arguments_when_not_supported(self):
+        self.assertIsNone(get_report_arguments("nose", "reportlog", "/tmp/r"))
+
+
+class EntryPoint(object):
+
+    def __init__(self, name, module):
+        self.name = name
+        self.module = module
+        self.loaded = False
+
+    def load(self):
+        self.loaded = True
+        return self.module
+
+
+class TestRunnerRegistry(unittest.TestCase):
+
+    """Test case for the runners registry."""
+
+    def setUp(self):
+        self.entry_points = [
+            EntryPoint("other", None),
+            EntryPoint("custom", runners.python),
+        ]
+        self.registry = RunnerRegistry(
+            entry_points=lambda group: self.entry_points,
+        )
+
+    def test_get(self):
+        self.assertIs(self.registry.get("python"), runners.python)
+        self.assertFalse(any(e.loaded for e in self.entry_points))
+
+    def test_get_from_entry_point(self):
+        self.assertIs(self.registry.get("custom"), runners.python)
+        self.assertEqual([e.loaded for e in self.entry_points], [False, True])
+
+    def test_get_unknown(self):
+        with self.assertRaises(ImportError):
+            self.registry.get("unknown")
+
+    def test_get_is_cached(self):
+        self.registry.get("custom")
+        self.entry_points = []
+        self.assertIs(self.registry.get("custom"), runners.python)
+
+    def test_attribute(self):
+        self.assertIs(
+            self.registry.attribute("python", "parse_traceback"),
+            runners.python.parse_traceback,
+        )
+        self.assertIsNone(self.registry.attribute("python", "COMMAND", None))
+        with self.assertRaises(AttributeError):
+            self.registry.attribute("python", "COMMAND")
+
+    def test_is_builtin(self):
+        self.assertTrue(self.registry.is_builtin("python"))
+        self.registry.register("other", unittest)
+        self.assertFalse(self.registry.is_builtin("other"))
+
+    def test_register(self):
+        self.assertIsNone(self.registry.attribute("python", "COMMAND", None))
+        self.registry.register("python", runners.pytest)
+        self.assertEqual(
+            self.registry.attribute("python", "COMMAND", None),
+            runners.pytest.COMMAND,
+        )
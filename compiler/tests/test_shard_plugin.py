@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import os
+import unittest
+
+from plugins.python_tests_runner_shard import (
+    ENVIRONMENT,
+    get_shard,
+    select_shard,
+)
+
+
+class TestShardPlugin(unittest.TestCase):
+
+    """Test case for plugins.python_tests_runner_shard.py module"""
+
+    def tearDown(self):
+        os.environ.pop(ENVIRONMENT, None)
+
+    def test_get_shard(self):
+        os.environ[ENVIRONMENT] = "1/3"
+        self.assertEqual(get_shard(), (1, 3))
+
+    def test_get_shard_when_not_set(self):
+        self.assertIsNone(get_shard())
+
+    def test_select_shard(self):
+        items = list(range(10))
+        self.assertEqual(
+            [select_shard(items, index, 3)[0] for index in range(3)],
+            [[0, 1, 2], [3, 4, 5], [6, 7, 8, 9]],
+        )
+        self.assertEqual(
+            select_shard(items, 1, 3)[1],
+            [0, 1, 2, 6, 7, 8, 9],
+        )
+
+    def test_select_shard_with_more_shards_than_items(self):
+        self.assertEqual(
+            [select_shard([0], index, 2)[0] for index in range(2)],
+            [[], [0]],
+        )
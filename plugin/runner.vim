@@ -20,6 +20,7 @@ function! s:set_run_commands()
         command! -buffer -bang RunTest :call runner#run_test(<bang>0)
         command! -buffer -bang RunCase :call runner#run_case(<bang>0)
         command! -buffer -bang RunModule :call runner#run_module(<bang>0)
+        command! -buffer RunBasketAdd :call runner#basket_add()
     else
         " For no-test files, run 'remembered' test.
         command! -buffer -bang RunTest :call runner#run_last_test(<bang>0)
@@ -27,7 +28,21 @@ function! s:set_run_commands()
         command! -buffer -bang RunModule :call runner#run_last_module(<bang>0)
     endif
     " RunAllTest is available everywhere
-    command! -bang RunAllTests :call tests#runner#run_all(<bang>0)
+    command! -bang RunAllTests :call runner#run_all(<bang>0)
+    " Tests queued in the basket are run at once from anywhere
+    command! -bang RunBasket :call runner#run_basket(<bang>0)
+    command! RunBasketList :call runner#basket_list()
+    command! RunBasketClear :call runner#basket_clear()
+    " Tests matching a pattern are found in the whole project
+    command! -bang -nargs=1 RunMatching
+                \ :call runner#run_matching(<bang>0, <q-args>)
+    " Tests importing the current module can be run from any python module
+    command! -buffer -bang RunImpactedTests :call runner#run_impacted(<bang>0)
+    " Failed tests of the last run can be run again from anywhere
+    command! RunFailed :call runner#run_failed()
+    command! RunFailedFirst :call runner#run_failed_first()
+    " A tests run in the background can be stopped from anywhere
+    command! RunCancel :call runner#cancel()
 endfunction
 
 " For python file, set commands relative to file being a test module or not.
@@ -35,3 +50,7 @@ endfunction
 " Note: Code is not located in ftplugin voluntary. The file pattern detection
 "       requires the logic to be ran in an autocmd.
 autocmd BufEnter *.py   call s:set_run_commands()
+
+" Saved modules are indexed again for the RunImpactedTests and RunMatching
+" commands.
+autocmd BufWritePost *.py   call runner#update_indexes(expand("<afile>:p"))
@@ -5,13 +5,58 @@ Tools to parse Python code.
 # import os
 import ast
 import _ast
+import hashlib
+import json
+import multiprocessing
 import re
 import os
+import stat
+import tempfile
+from bisect import bisect_right
+from collections import OrderedDict
 
 
 # Shamelessly copied from nose.
 testMatch = re.compile(r'(?:^|[\\b_\\.%s-])[Tt]est' % os.sep)
 
+MODULE_CACHE_SIZE = 32
+"""
+Maximum number of parsed modules kept in cache.
+"""
+
+IMPORT_INDEX_VERSION = 1
+"""
+Version of the persisted import index format. An index of another version is
+built again.
+"""
+
+TEST_INDEX_VERSION = 1
+"""
+Version of the persisted test index format.
+"""
+
+SCAN_CHUNK_SIZE = 16
+"""
+Number of modules handed at once to a scanning process.
+"""
+
+STATEMENT_FIELDS = ("body", "orelse", "finalbody", "handlers", "cases")
+"""
+Fields of the nodes holding nested statements (or exception handlers and
+match cases holding statements).
+"""
+
+IGNORED_FOLDERS = ("__pycache__", "node_modules", "site-packages")
+"""
+Folders never searched for modules by the import index, along with hidden
+folders and virtualenvs.
+"""
+
+# Parsed modules indexed by filename. Values are `(version, module, index)`
+# tuples where `index` is the module line index. Least recently used modules
+# come first.
+__modules = OrderedDict()
+
 
 def __get_line(node):
     """
@@ -20,41 +65,40 @@ def __get_line(node):
     return getattr(node, 'lineno', -1)
 
 
-def __get_best_matching_child(node, lineno):
+def __build_line_index(module):
     """
-    Get the best matching child of `node` for the given `lineno`.
-    """
-    # This can be a one-liner with reversed
-    # and next but way less readable...
-    childs = getattr(node, 'body', [])
-    result = next(iter(childs), None)
-    result_lineno = __get_line(result)
-
-    for child in childs[1:]:
-        child_lineno = __get_line(child)
-
-        if child_lineno > lineno:
-            break
-        elif child_lineno == lineno:
-            return child
-        elif child_lineno > result_lineno:
-            result = child
-            result_lineno = child_lineno
-
-    return result
+    Index the best matching chain of every line of `module`.
 
+    A node scope starts at its line and runs up to the line its next sibling
+    starts at, or up to its parent scope end for the last child. Lines following
+    a test, like blank lines, still belong to it. The chain of a line is then
+    the one of the last node, in source order, starting at or before it.
 
-def __get_best_matching_chain(node, lineno):
+    Returns a `(lines, chains)` tuple of lists in source order where `chains[i]`
+    is the chain of nodes, without the module, starting at `lines[i]`.
     """
-    Get the best matching chain.
+    lines = []
+    chains = []
+    stack = [(module, ())]
+    while stack:
+        node, chain = stack.pop()
+        if chain:
+            lines.append(__get_line(node))
+            chains.append(chain)
+        for child in reversed(getattr(node, 'body', [])):
+            stack.append((child, chain + (child,)))
+    return lines, chains
+
+
+def __get_best_matching_chain(module, index, lineno):
     """
-    result = []
-
-    while node and __get_line(node) <= lineno:
-        result.append(node)
-        node = __get_best_matching_child(node, lineno)
-
-    return result
+    Get the best matching chain with a binary search in the module line index.
+    """
+    lines, chains = index
+    position = bisect_right(lines, lineno)
+    if not position:
+        return [module]
+    return [module] + list(chains[position - 1])
 
 
 def __is_test_case(node):
@@ -79,19 +123,73 @@ def __is_test_function(node):
         return True
 
 
-def get_ast_branch_at(file_, position):
+def __get_indexed_module(file_, source, version):
+    """
+    Get the `(module, index)` tuple of a module from the cache. Parse and index
+    the module first if the cached version is outdated.
+    """
+    if version is None:
+        if callable(source):
+            source = source()
+        version = source if source is not None else os.path.getmtime(file_)
+
+    cached = __modules.pop(file_, None)
+    if cached and cached[0] == version:
+        module, index = cached[1:]
+    else:
+        if callable(source):
+            source = source()
+        if source is None:
+            with open(file_) as f:
+                source = f.read()
+        module = ast.parse(source)
+        index = __build_line_index(module)
+
+    __modules[file_] = (version, module, index)
+    while len(__modules) > MODULE_CACHE_SIZE:
+        __modules.popitem(last=False)
+    return module, index
+
+
+def get_module(file_, source=None, version=None):
+    """
+    Return the abstract syntax tree of a module. The last `MODULE_CACHE_SIZE`
+    parsed modules are cached and only parsed again when their version changes.
+
+    :param file_: Filename path.
+    :param source: Module source code (i.e. an edited buffer content) or a
+        callable returning it, only called when the module is parsed. Read
+        from `file_` if not specified.
+    :param version: Any value changing along with the module source (i.e. Vim
+        `b:changedtick`). Defaults to the file modification time when the source
+        is read from `file_` or to the source itself otherwise.
+    """
+    return __get_indexed_module(file_, source, version)[0]
+
+
+def clear_module_cache():
+    """
+    Forget all cached modules.
+    """
+    __modules.clear()
+
+
+def get_ast_branch_at(file_, position, source=None, version=None):
     """
     Return the full abstract syntax tree branch up to the root for the requested
     position inside the file.
 
     :param file_: Filename path.
     :param position: Cursor position. (line,column) tuple.
+    :param source: Module source code. See `get_module`.
+    :param version: Module source version. See `get_module`.
     """
-    module = ast.parse(open(file_).read())
-    return __get_best_matching_chain(module, position[0])
+    module, index = __get_indexed_module(file_, source, version)
+    return __get_best_matching_chain(module, index, position[0])
 
 
-def get_test_case_at(file_, position, separator="."):
+def get_test_case_at(file_, position, separator=".", source=None,
+                     version=None):
     """
     Get the dotted separated name of a test class at give `position` in `file_`.
     If no test case can be found, an empty string is returned.
@@ -99,8 +197,10 @@ def get_test_case_at(file_, position, separator="."):
     :param file_: Filename path.
     :param position: Cursor position. (line,column) tuple.
     :param separator: String separator to inject between scope.
+    :param source: Module source code. See `get_module`.
+    :param version: Module source version. See `get_module`.
     """
-    branch = get_ast_branch_at(file_, position)
+    branch = get_ast_branch_at(file_, position, source, version)
 
     # Remove module name
     chain = branch[1:]
@@ -115,7 +215,8 @@ def get_test_case_at(file_, position, separator="."):
     return separator.join([node.name for node in chain])
 
 
-def get_test_function_at(file_, position, separator="."):
+def get_test_function_at(file_, position, separator=".", source=None,
+                         version=None):
     """
     Get the dot-separated name of a test function at the given `position` in the
     specified `file_`. Stops at the test case, if current position is not inside
@@ -125,8 +226,10 @@ def get_test_function_at(file_, position, separator="."):
     :param file_: Filename path.
     :param position: Cursor position. (line,column) tuple.
     :param separator: String separator to inject between scope.
+    :param source: Module source code. See `get_module`.
+    :param version: Module source version. See `get_module`.
     """
-    branch = get_ast_branch_at(file_, position)
+    branch = get_ast_branch_at(file_, position, source, version)
 
     # Remove module name
     chain = branch[1:]
@@ -140,3 +243,492 @@ def get_test_function_at(file_, position, separator="."):
         chain.pop()
 
     return separator.join([node.name for node in chain])
+
+
+def __is_test_module(file_):
+    """ Return `True` if the file name match a test module.
+    """
+    name = os.path.splitext(os.path.basename(file_))[0]
+    return bool(testMatch.match(name)) or name.endswith("_test")
+
+
+def __get_relative_path(root, file_):
+    """
+    Return the path of a file relative to the project root, symbolic links
+    resolved.
+    """
+    return os.path.relpath(os.path.realpath(file_), os.path.realpath(root))
+
+
+def get_module_name(root, file_):
+    """
+    Return the dotted name of a module relative to the project root.
+
+    :param root: Project root folder.
+    :param file_: Filename path.
+    """
+    path = __get_relative_path(root, file_)
+    parts = os.path.splitext(path)[0].split(os.sep)
+    if parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+
+def __iter_statements(node):
+    """
+    Iterate on the statements nested in a node, the node excluded. Expressions
+    are not visited: statements are enough to find imports and scopes, and a
+    module holds many more expressions than statements.
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        for field in STATEMENT_FIELDS:
+            children = getattr(node, field, None)
+            if children:
+                stack.extend(reversed(children))
+                for child in children:
+                    yield child
+
+
+def __get_imports(module, name, is_package):
+    """
+    Return the sorted dotted names a module imports. Relative imports are
+    resolved against the module `name`. Names imported from a module are
+    listed too as they can be submodules.
+    """
+    package = name.split(".") if is_package else name.split(".")[:-1]
+    imports = set()
+    for node in __iter_statements(module):
+        if type(node) is _ast.Import:
+            for alias in node.names:
+                imports.add(alias.name)
+        elif type(node) is _ast.ImportFrom:
+            base = node.module or ""
+            if node.level:
+                parts = package[:max(0, len(package) - node.level + 1)]
+                if node.module:
+                    parts.append(node.module)
+                base = ".".join(parts)
+            if base:
+                imports.add(base)
+            for alias in node.names:
+                if alias.name != "*":
+                    imports.add(".".join(part for part in (base, alias.name)
+                                         if part))
+    return sorted(imports)
+
+
+def __iter_module_files(root):
+    """
+    Iterate on the python files of a project, skipping hidden folders,
+    virtualenvs and `IGNORED_FOLDERS`.
+    """
+    for folder, folders, files in os.walk(root):
+        folders[:] = [
+            name for name in folders
+            if not name.startswith(".") and name not in IGNORED_FOLDERS and
+            not os.path.exists(os.path.join(folder, name, "pyvenv.cfg"))
+        ]
+        for name in files:
+            if name.endswith(".py"):
+                yield os.path.join(folder, name)
+
+
+def __get_index_directory():
+    """
+    Return the directory indexes are persisted to, created if missing. It is
+    private to the user: an index planted by another user would select the
+    tests to run. It is the directory of the runner daemon sockets (see
+    `compiler/daemon.py`), in `$XDG_RUNTIME_DIR` if set, otherwise in the
+    temporary directory.
+
+    Raises `OSError` if the directory is not a directory owned by the user with
+    no access for anyone else.
+    """
+    path = os.environ.get("XDG_RUNTIME_DIR")
+    if path:
+        path = os.path.join(path, "vim-python-tests-runner")
+    elif hasattr(os, "getuid"):
+        path = os.path.join(
+            tempfile.gettempdir(),
+            "vim-python-tests-runner-{uid}".format(uid=os.getuid()),
+        )
+    else:
+        # The temporary directory of a Windows user is already private.
+        path = os.path.join(tempfile.gettempdir(), "vim-python-tests-runner")
+    try:
+        os.mkdir(path, 0o700)
+    except OSError:
+        pass
+    try:
+        status = os.lstat(path)
+    except OSError:
+        status = None
+    if status is None or not stat.S_ISDIR(status.st_mode) or (
+            hasattr(os, "getuid") and
+            (status.st_uid != os.getuid() or status.st_mode & 0o077)):
+        raise OSError(
+            "vim-runners: Directory {path} is not private to the "
+            "user.".format(path=path),
+        )
+    return path
+
+
+def __get_index_path(root, kind):
+    """
+    Return the path of the file an index of a project is persisted to.
+    """
+    digest = hashlib.md5(os.path.realpath(root).encode("utf-8")).hexdigest()
+    return os.path.join(
+        __get_index_directory(),
+        "{digest}.{kind}.json".format(
+            digest=digest,
+            kind=kind,
+        ),
+    )
+
+
+def __load_index(root, kind, version):
+    """
+    Load a persisted index of a project. An empty index is returned if none was
+    persisted or if it is of another version.
+    """
+    try:
+        with open(__get_index_path(root, kind)) as f:
+            index = json.load(f)
+    except (IOError, ValueError):
+        index = None
+    if not index or index.get('version') != version:
+        index = {'version': version, 'files': {}}
+    return index
+
+
+def __save_index(root, kind, index):
+    """
+    Persist an index of a project.
+    """
+    with open(__get_index_path(root, kind), "w") as f:
+        json.dump(index, f)
+
+
+def __analyze_file(task):
+    """
+    Parse a module and analyze it. Run by the scanning processes, so only the
+    analysis result is sent back, not the syntax tree.
+
+    `task` is a `(root, file_, analyze)` tuple. Returns a `(file_, result)`
+    tuple where `result` is what `analyze(root, file_, module)` returned or
+    `None` if the module cannot be read or parsed.
+    """
+    root, file_, analyze = task
+    try:
+        # Read as bytes so the module encoding declaration is honored.
+        with open(file_, "rb") as f:
+            source = f.read()
+        module = ast.parse(source)
+    except (IOError, OSError, SyntaxError, ValueError):
+        return file_, None
+    return file_, analyze(root, file_, module)
+
+
+def __analyze_files(root, files, analyze, processes=1):
+    """
+    Analyze modules with `__analyze_file`, in a pool of `processes` processes
+    if greater than 1 (all the CPUs if `None`). Results come in no particular
+    order.
+
+    Returns a list of `(file_, result)` tuples.
+    """
+    tasks = [(root, file_, analyze) for file_ in files]
+    if processes == 1 or len(tasks) < 2:
+        return [__analyze_file(task) for task in tasks]
+    pool = multiprocessing.Pool(processes)
+    try:
+        return list(pool.imap_unordered(__analyze_file, tasks, SCAN_CHUNK_SIZE))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def __find_stale_files(root, index, files, select, complete):
+    """
+    Find the modules of an index modified since they were indexed. Modules
+    which do not exist anymore are removed from the index, as well as the
+    modules not listed in `files` if `complete` is true (i.e. `files` are all
+    the project modules). Only the modules for which `select(file_)` is true
+    are indexed, if specified.
+
+    Returns a `(changed, mtimes)` tuple where `changed` tells if modules were
+    removed and `mtimes` maps the stale modules to their modification time.
+    """
+    changed = False
+    entries = index['files']
+    if select is not None:
+        files = [file_ for file_ in files if select(file_)]
+    if complete:
+        paths = set(__get_relative_path(root, file_) for file_ in files)
+        for path in [path for path in entries if path not in paths]:
+            del entries[path]
+            changed = True
+    mtimes = {}
+    for file_ in files:
+        path = __get_relative_path(root, file_)
+        try:
+            mtime = os.path.getmtime(file_)
+        except OSError:
+            changed = entries.pop(path, None) is not None or changed
+            continue
+        entry = entries.get(path)
+        if not entry or entry['mtime'] != mtime:
+            mtimes[file_] = mtime
+    return changed, mtimes
+
+
+def __analyze_imports(root, file_, module):
+    """
+    Return the import index entry of a module.
+    """
+    return {
+        'imports': __get_imports(
+            module,
+            get_module_name(root, file_),
+            os.path.basename(file_) == "__init__.py",
+        ),
+    }
+
+
+def get_impacted_tests(root, index, file_):
+    """
+    Return the test modules importing a module, directly or transitively. A
+    test module is impacted by its own changes and a `conftest.py` module
+    impacts all the test modules of its folder.
+
+    Imported names are matched against the modules dotted names relative to
+    `root` and against their trailing parts (i.e. `package.module` matches
+    `src/package/module.py`) since the project import path is unknown. A
+    module is then possibly reported as impacted while it is not, but an
+    impacted one is not missed.
+
+    :param root: Project root folder.
+    :param index: Import index. See `refresh_indexes`.
+    :param file_: Filename path of the changed module.
+
+    Returns the sorted paths of the impacted test modules.
+    """
+    modules = {}
+    for path in index['files']:
+        parts = get_module_name(root, os.path.join(root, path)).split(".")
+        for start in range(len(parts)):
+            modules.setdefault(".".join(parts[start:]), set()).add(path)
+
+    importers = {}
+    for path, entry in index['files'].items():
+        for name in entry['imports']:
+            parts = name.split(".")
+            # Importing a submodule runs its parent packages too.
+            for end in range(1, len(parts) + 1):
+                for imported in modules.get(".".join(parts[:end]), ()):
+                    importers.setdefault(imported, set()).add(path)
+
+    start = __get_relative_path(root, file_)
+    impacted = set([start])
+    pending = [start]
+    while pending:
+        path = pending.pop()
+        dependents = set(importers.get(path, ()))
+        if os.path.basename(path) == "conftest.py":
+            folder = os.path.dirname(path)
+            dependents.update(
+                other for other in index['files']
+                if other.startswith(os.path.join(folder, "") if folder else "")
+            )
+        for dependent in dependents - impacted:
+            impacted.add(dependent)
+            pending.append(dependent)
+
+    return sorted(
+        os.path.join(root, path) for path in impacted
+        if __is_test_module(path)
+    )
+
+
+def __iter_tests(module):
+    """
+    Iterate on the test cases and test functions of a module, in source order,
+    as `(name, node)` tuples where `name` is the dot-separated scope of the
+    test. Test functions are searched at the module level and in test cases
+    only.
+    """
+    stack = [(node, ()) for node in reversed(module.body)]
+    while stack:
+        node, scope = stack.pop()
+        if __is_test_case(node):
+            scope = scope + (node.name,)
+            yield ".".join(scope), node
+            stack.extend((child, scope) for child in reversed(node.body))
+        elif __is_test_function(node):
+            yield ".".join(scope + (node.name,)), node
+
+
+def iter_tests(root, index):
+    """
+    Iterate on the tests of a project, sorted by module path then in source
+    order.
+
+    :param root: Project root folder.
+    :param index: Test index. See `refresh_indexes`.
+
+    Returns a generator on `(file_, name, line)` tuples.
+    """
+    for path in sorted(index['files']):
+        file_ = os.path.join(root, path)
+        for name, line in index['files'][path]['tests']:
+            yield file_, name, line
+
+
+def find_tests(root, index, pattern):
+    """
+    Find the tests of a project whose name matches a regular expression. The
+    tests of a matching test case are not listed again.
+
+    :param root: Project root folder.
+    :param index: Test index. See `refresh_indexes`.
+    :param pattern: Regular expression searched in the tests names.
+
+    Returns a list of `(file_, name, line)` tuples.
+    """
+    regex = re.compile(pattern)
+    found = []
+    for file_, name, line in iter_tests(root, index):
+        if found and found[-1][0] == file_ and \
+                name.startswith(found[-1][1] + "."):
+            continue
+        if regex.search(name):
+            found.append((file_, name, line))
+    return found
+
+
+def summarize_module(root, file_, module):
+    """
+    Return a compact summary of a parsed module, small enough to be sent from
+    a scanning process.
+
+    :param root: Project root folder.
+    :param file_: Filename path.
+    :param module: Abstract syntax tree of the module.
+
+    Returns a dictionary holding the module test cases and test functions
+    (`tests`), in source order, as `[name, first_line, last_line]` lists and
+    the sorted dotted names it imports (`imports`).
+    """
+    tests = []
+    for name, node in __iter_tests(module):
+        # Only python 3.8+ nodes know where they end.
+        last_line = getattr(node, 'end_lineno', None) or max(
+            [node.lineno] +
+            [__get_line(child) for child in __iter_statements(node)]
+        )
+        tests.append([name, node.lineno, last_line])
+    summary = __analyze_imports(root, file_, module)
+    summary['tests'] = tests
+    return summary
+
+
+def scan_modules(root, files=None, processes=None):
+    """
+    Parse and summarize modules in parallel. Modules are handed by chunks to a
+    pool of processes which only send back their summary: the scan scales with
+    the number of CPUs and syntax trees are never held together in memory.
+
+    :param root: Project root folder.
+    :param files: Paths of the modules to scan. All the project modules if not
+        specified.
+    :param processes: Number of processes. All the CPUs if `None`. Modules are
+        parsed by the current process if `1`.
+
+    Returns a dictionary mapping the path of each module, relative to `root`,
+    to its summary (see `summarize_module`). Modules which cannot be parsed
+    are left out.
+    """
+    if files is None:
+        files = list(__iter_module_files(root))
+    return dict(
+        (__get_relative_path(root, file_), summary)
+        for file_, summary in __analyze_files(
+            root,
+            files,
+            summarize_module,
+            processes,
+        )
+        if summary is not None
+    )
+
+
+def refresh_indexes(root, files=None, create=True, processes=1):
+    """
+    Load, update and persist the import index and the test index of a project
+    in a single scan: a module stale in both indexes is parsed once and both
+    entries are taken from its summary (see `scan_modules`). Only the modules
+    modified since they were indexed are parsed again. Modules which cannot be
+    parsed keep their previous entry until they can.
+
+    Both indexes are dictionaries where `files` maps the path of a module,
+    relative to `root`, to a dictionary holding its modification time
+    (`mtime`). The import index lists every module with the sorted dotted
+    names it imports (`imports`). The test index lists the test modules with
+    their test cases and test functions (`tests`) as `[name, line]` pairs.
+
+    :param root: Project root folder.
+    :param files: Paths of the modules to update (i.e. saved files). All the
+        project modules are searched if not specified and the ones which do not
+        exist anymore are removed.
+    :param create: If `False`, an index is only updated if it was already
+        persisted. Saving a file should not index a whole project.
+    :param processes: Number of processes parsing the modules. See
+        `scan_modules`.
+
+    Returns an `(import_index, test_index)` tuple. An index is `None` if it was
+    not created.
+    """
+    complete = files is None
+    if complete:
+        files = list(__iter_module_files(root))
+    indexes = []
+    stale = {}
+    for kind, version, select in (
+            ("imports", IMPORT_INDEX_VERSION, None),
+            ("tests", TEST_INDEX_VERSION, __is_test_module)):
+        if not create and not os.path.exists(__get_index_path(root, kind)):
+            indexes.append(None)
+            continue
+        index = __load_index(root, kind, version)
+        changed, mtimes = __find_stale_files(
+            root,
+            index,
+            files,
+            select,
+            complete,
+        )
+        indexes.append((kind, index, changed, mtimes))
+        stale.update(mtimes)
+    summaries = scan_modules(root, list(stale), processes)
+    for item in indexes:
+        if item is None:
+            continue
+        kind, index, changed, mtimes = item
+        for file_, mtime in mtimes.items():
+            path = __get_relative_path(root, file_)
+            summary = summaries.get(path)
+            if summary is None:
+                continue
+            if kind == "imports":
+                entry = {'imports': summary['imports']}
+            else:
+                entry = {'tests': [test[:2] for test in summary['tests']]}
+            entry['mtime'] = mtime
+            index['files'][path] = entry
+            changed = True
+        if changed:
+            __save_index(root, kind, index)
+    return tuple(item and item[1] for item in indexes)
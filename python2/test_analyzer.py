@@ -2,6 +2,9 @@
 # encoding: utf-8
 
 import os
+import shutil
+import stat
+import tempfile
 import unittest
 
 import code_analyzer
@@ -16,7 +19,7 @@ class TestCodeAnalyzer(unittest.TestCase):
         self.source = os.path.join(os.path.dirname(__file__), "fixture", "code_template.py")
 
     def tearDown(self):
-        pass
+        code_analyzer.clear_module_cache()
 
     def test_get_test_function_at_on_definition(self):
         """ Test lookup for function name when the line number is set on the
@@ -91,3 +94,380 @@ class TestCodeAnalyzer(unittest.TestCase):
         module first line. """
         result = code_analyzer.get_test_case_at(self.source, (0, 0))
         self.assertEqual(result, '')
+
+    def test_get_module_is_cached(self):
+        """ Test a module is parsed once while its file does not change. """
+        module = code_analyzer.get_module(self.source)
+        self.assertIs(code_analyzer.get_module(self.source), module)
+
+    def test_get_module_with_source(self):
+        """ Test a module source is parsed again only when its version
+        changes. """
+        module = code_analyzer.get_module(self.source, "a = 1", 1)
+        self.assertIs(
+            code_analyzer.get_module(self.source, "a = 2", 1),
+            module,
+        )
+        self.assertIsNot(
+            code_analyzer.get_module(self.source, "a = 2", 2),
+            module,
+        )
+
+    def test_get_module_with_source_without_version(self):
+        """ Test a module source is parsed again when it changes if no version
+        is specified. """
+        module = code_analyzer.get_module(self.source, "a = 1")
+        self.assertIs(code_analyzer.get_module(self.source, "a = 1"), module)
+        self.assertIsNot(
+            code_analyzer.get_module(self.source, "a = 2"),
+            module,
+        )
+
+    def test_get_module_with_source_callable(self):
+        """ Test a module source callable is only called when the module is
+        parsed. """
+        calls = []
+
+        def source():
+            calls.append(None)
+            return "a = 1"
+
+        module = code_analyzer.get_module(self.source, source, 1)
+        self.assertIs(code_analyzer.get_module(self.source, source, 1), module)
+        self.assertEqual(len(calls), 1)
+
+    def test_get_module_evicts_least_recently_used(self):
+        """ Test the cache holds at most `MODULE_CACHE_SIZE` modules. """
+        first = code_analyzer.get_module("first.py", "a = 1", 1)
+        for index in range(code_analyzer.MODULE_CACHE_SIZE):
+            code_analyzer.get_module("%d.py" % index, "a = 1", 1)
+        self.assertIsNot(
+            code_analyzer.get_module("first.py", "a = 1", 1),
+            first,
+        )
+
+    def test_get_test_function_at_with_source(self):
+        """ Test lookup for function name in a source not saved on disk. """
+        source = "class TestCase(object):\n    def test_unsaved(self):\n" \
+            "        pass\n"
+        result = code_analyzer.get_test_function_at(
+            self.source,
+            (3, 0),
+            source=source,
+            version=1,
+        )
+        self.assertEqual(result, "TestCase.test_unsaved")
+
+    def test_get_test_function_at_between_functions(self):
+        """ Test lines following a test function down to the next one belong to
+        it. """
+        result = code_analyzer.get_test_function_at(self.source, (27, 0))
+        self.assertEqual(result, "MyTestClass.test_function_1")
+
+    def test_get_ast_branch_at(self):
+        """ Test the branch holds the module and every scope down to the
+        innermost one. """
+        branch = code_analyzer.get_ast_branch_at(self.source, (30, 0))
+        self.assertEqual(
+            [getattr(node, 'name', None) for node in branch],
+            [None, "MyTestClass", "test_function_2", "innner_function",
+             "inner_function2"],
+        )
+
+
+class IndexTestCase(unittest.TestCase):
+
+    """Base test case persisting the indexes to a temporary directory."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.runtime = tempfile.mkdtemp()
+        self.environ = dict(os.environ)
+        os.environ["XDG_RUNTIME_DIR"] = self.runtime
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.runtime)
+        shutil.rmtree(self.root)
+
+    def refresh(self, *args, **kwargs):
+        """ Refresh the indexes, recording the modules parsed to
+        `self.parsed`. """
+        self.parsed = []
+        summarize_module = code_analyzer.summarize_module
+
+        def summarize(root, file_, module):
+            self.parsed.append(os.path.relpath(file_, self.root))
+            return summarize_module(root, file_, module)
+
+        code_analyzer.summarize_module = summarize
+        try:
+            return code_analyzer.refresh_indexes(self.root, *args, **kwargs)
+        finally:
+            code_analyzer.summarize_module = summarize_module
+
+
+class TestImportIndex(IndexTestCase):
+
+    """Test 'code_analyzer.py' module import index."""
+
+    def setUp(self):
+        super(TestImportIndex, self).setUp()
+        self.write("pkg/__init__.py", "")
+        self.write("pkg/core.py", "VALUE = 1\n")
+        self.write("pkg/api.py", "from . import core\n")
+        self.write("tests/conftest.py", "")
+        self.write("tests/test_api.py", "from pkg.api import core\n")
+        self.write("tests/test_core.py", "import pkg.core\n")
+        self.write("tests/test_other.py", "import os\n")
+
+    def write(self, path, source):
+        path = os.path.join(self.root, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(source)
+        return path
+
+    def get_impacted_tests(self, path):
+        index, _ = self.refresh()
+        tests = code_analyzer.get_impacted_tests(
+            self.root,
+            index,
+            os.path.join(self.root, path),
+        )
+        return [os.path.relpath(test, self.root) for test in tests]
+
+    def test_get_module_name(self):
+        """ Test module names are dotted paths relative to the root. """
+        self.assertEqual(
+            code_analyzer.get_module_name(
+                self.root,
+                os.path.join(self.root, "pkg", "__init__.py"),
+            ),
+            "pkg",
+        )
+        self.assertEqual(
+            code_analyzer.get_module_name(
+                self.root,
+                os.path.join(self.root, "pkg", "core.py"),
+            ),
+            "pkg.core",
+        )
+
+    def test_relative_imports_are_resolved(self):
+        """ Test relative imports are indexed by their absolute name. """
+        index, _ = self.refresh()
+        self.assertEqual(
+            index['files'][os.path.join("pkg", "api.py")]['imports'],
+            ["pkg", "pkg.core"],
+        )
+
+    def test_get_impacted_tests(self):
+        """ Test the test modules importing a module directly or transitively
+        are impacted. """
+        self.assertEqual(
+            self.get_impacted_tests(os.path.join("pkg", "core.py")),
+            [
+                os.path.join("tests", "test_api.py"),
+                os.path.join("tests", "test_core.py"),
+            ],
+        )
+
+    def test_get_impacted_tests_of_test_module(self):
+        """ Test a test module is impacted by its own changes. """
+        self.assertEqual(
+            self.get_impacted_tests(os.path.join("tests", "test_other.py")),
+            [os.path.join("tests", "test_other.py")],
+        )
+
+    def test_get_impacted_tests_of_conftest(self):
+        """ Test a `conftest.py` module impacts the tests of its folder. """
+        self.assertEqual(
+            self.get_impacted_tests(os.path.join("tests", "conftest.py")),
+            [
+                os.path.join("tests", "test_api.py"),
+                os.path.join("tests", "test_core.py"),
+                os.path.join("tests", "test_other.py"),
+            ],
+        )
+
+    def test_refresh_indexes_is_incremental(self):
+        """ Test only modified modules are parsed again. """
+        self.refresh()
+        self.refresh()
+        self.assertEqual(self.parsed, [])
+        path = self.write("tests/test_other.py", "import pkg.core\n")
+        os.utime(path, (0, 0))
+        index, _ = self.refresh([path])
+        self.assertEqual(self.parsed, [os.path.join("tests", "test_other.py")])
+        self.assertEqual(
+            index['files'][os.path.join("tests", "test_other.py")]['imports'],
+            ["pkg.core"],
+        )
+
+    def test_refresh_indexes_removes_deleted_modules(self):
+        """ Test modules which do not exist anymore are removed. """
+        self.refresh()
+        os.remove(os.path.join(self.root, "tests", "test_other.py"))
+        import_index, test_index = self.refresh()
+        for index in (import_index, test_index):
+            self.assertNotIn(
+                os.path.join("tests", "test_other.py"),
+                index['files'],
+            )
+
+    @unittest.skipUnless(hasattr(os, "getuid"), "requires a user id")
+    def test_indexes_are_persisted_privately(self):
+        """ Test indexes are persisted to a directory only the user can
+        access. """
+        self.refresh()
+        directory = os.path.join(self.runtime, "vim-python-tests-runner")
+        self.assertEqual(len(os.listdir(directory)), 2)
+        status = os.lstat(directory)
+        self.assertEqual(status.st_uid, os.getuid())
+        self.assertEqual(stat.S_IMODE(status.st_mode), 0o700)
+
+    def test_refresh_indexes_is_persisted(self):
+        """ Test the indexes are persisted and only created when requested. """
+        self.assertEqual(self.refresh(create=False), (None, None))
+        indexes = self.refresh()
+        self.assertEqual(self.refresh(create=False), indexes)
+        self.assertEqual(self.parsed, [])
+
+
+class TestTestIndex(IndexTestCase):
+
+    """Test 'code_analyzer.py' module test index."""
+
+    def setUp(self):
+        super(TestTestIndex, self).setUp()
+        os.makedirs(os.path.join(self.root, "tests"))
+        self.test_module = os.path.join(self.root, "tests", "test_module.py")
+        with open(self.test_module, "w") as f:
+            f.write(
+                "import unittest\n"
+                "\n"
+                "def test_function():\n"
+                "    pass\n"
+                "\n"
+                "class MyTestCase(unittest.TestCase):\n"
+                "    def test_method(self):\n"
+                "        pass\n"
+                "\n"
+                "    def helper(self):\n"
+                "        pass\n"
+                "\n"
+                "class Helper(object):\n"
+                "    def test_ignored(self):\n"
+                "        pass\n"
+            )
+        with open(os.path.join(self.root, "tests", "helpers.py"), "w") as f:
+            f.write("def test_ignored():\n    pass\n")
+
+    def test_iter_tests(self):
+        """ Test test cases and test functions of test modules are indexed
+        with their line. """
+        _, index = self.refresh()
+        self.assertEqual(
+            list(code_analyzer.iter_tests(self.root, index)),
+            [
+                (self.test_module, "test_function", 3),
+                (self.test_module, "MyTestCase", 6),
+                (self.test_module, "MyTestCase.test_method", 7),
+            ],
+        )
+
+    def test_find_tests(self):
+        """ Test the tests of a matching test case are not listed again. """
+        _, index = self.refresh()
+        self.assertEqual(
+            code_analyzer.find_tests(self.root, index, "Case"),
+            [(self.test_module, "MyTestCase", 6)],
+        )
+        self.assertEqual(
+            code_analyzer.find_tests(self.root, index, "method$"),
+            [(self.test_module, "MyTestCase.test_method", 7)],
+        )
+
+    def test_refresh_indexes(self):
+        """ Test the import and test indexes are refreshed from a single scan
+        parsing each module once. """
+        import_index, test_index = self.refresh()
+        self.assertEqual(
+            sorted(self.parsed),
+            [
+                os.path.join("tests", "helpers.py"),
+                os.path.join("tests", "test_module.py"),
+            ],
+        )
+        self.assertEqual(
+            import_index['files'][os.path.join("tests", "test_module.py")]
+            ['imports'],
+            ["unittest"],
+        )
+        self.assertEqual(
+            sorted(test_index['files']),
+            [os.path.join("tests", "test_module.py")],
+        )
+
+    def test_refresh_indexes_is_incremental(self):
+        """ Test only modified test modules are parsed again. """
+        self.refresh()
+        with open(self.test_module, "w") as f:
+            f.write("def test_new():\n    pass\n")
+        os.utime(self.test_module, (0, 0))
+        _, index = self.refresh([self.test_module])
+        self.assertEqual(
+            self.parsed,
+            [os.path.join("tests", "test_module.py")],
+        )
+        self.assertEqual(
+            list(code_analyzer.iter_tests(self.root, index)),
+            [(self.test_module, "test_new", 1)],
+        )
+
+
+class TestScanModules(IndexTestCase):
+
+    """Test 'code_analyzer.py' module bulk scan."""
+
+    def setUp(self):
+        super(TestScanModules, self).setUp()
+        for index in range(4):
+            with open(os.path.join(self.root, "test_%d.py" % index), "w") as f:
+                f.write(
+                    "import os\n"
+                    "\n"
+                    "def test_%d():\n"
+                    "    if os:\n"
+                    "        pass\n" % index
+                )
+        with open(os.path.join(self.root, "broken.py"), "w") as f:
+            f.write("def broken(:\n")
+
+    def test_scan_modules(self):
+        """ Test modules are summarized with their tests line ranges and their
+        imports. Modules which cannot be parsed are left out. """
+        summaries = code_analyzer.scan_modules(self.root, processes=1)
+        self.assertEqual(sorted(summaries), ["test_%d.py" % i for i in range(4)])
+        self.assertEqual(
+            summaries["test_0.py"],
+            {'tests': [["test_0", 3, 5]], 'imports': ["os"]},
+        )
+
+    def test_scan_modules_in_parallel(self):
+        """ Test a scan by several processes gives the same summaries. """
+        self.assertEqual(
+            code_analyzer.scan_modules(self.root, processes=2),
+            code_analyzer.scan_modules(self.root, processes=1),
+        )
+
+    def test_refresh_indexes_in_parallel(self):
+        """ Test indexes can be refreshed by several processes. """
+        _, index = code_analyzer.refresh_indexes(self.root, processes=2)
+        self.assertEqual(
+            [name for _, name, _ in code_analyzer.iter_tests(self.root, index)],
+            ["test_%d" % i for i in range(4)],
+        )